@@ -101,7 +101,7 @@ if running_as_frozen or not debug_active:
 #   example:  --extension=params will instantiate Params() class from lib.extensions.
 
 # we need to import only after possible modification of sys.path, we disable here flake8 E402
-from lib import extensions  # noqa: E402  # import all supported extensions of institch
+from lib import extensions  # noqa: E402  # extensions are imported on demand, see lib/extensions/__init__.py
 
 parser = ArgumentParser()
 parser.add_argument("--extension")
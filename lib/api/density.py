@@ -0,0 +1,36 @@
+# Authors: see git history
+#
+# Copyright (c) 2024 Authors
+# Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
+
+from flask import Blueprint, g, jsonify, request
+
+from ..exceptions import InkstitchException, format_uncaught_exception
+from ..stitch_plan.density import StitchDensity
+from ..svg import PIXELS_PER_MM
+from .stitch_plan import generate_stitch_plan
+
+density = Blueprint('density', __name__)
+
+
+@density.route('')
+def get_density_histogram():
+    """Return the stitch density histogram of the document.
+
+    The radius (in mm) is passed as the query parameter "radius".  The
+    histogram lists how many stitches have 1, 2, 3, ... stitches (including
+    themselves) within that radius.
+    """
+
+    radius = request.args.get('radius', 0.5, type=float)
+
+    if not g.extension.get_elements():
+        return dict(radius=radius, num_stitches=0, histogram=[])
+
+    try:
+        stitch_density = StitchDensity(generate_stitch_plan())
+        return jsonify(dict(radius=radius, num_stitches=len(stitch_density), histogram=stitch_density.histogram(radius * PIXELS_PER_MM)))
+    except InkstitchException as exc:
+        return jsonify({"error_message": str(exc)}), 500
+    except Exception:
+        return jsonify({"error_message": format_uncaught_exception()}), 500
@@ -8,7 +8,7 @@ import logging
 import socket
 import sys
 import time
-from threading import Thread
+from threading import Lock, Thread
 from contextlib import closing
 
 import requests
@@ -16,6 +16,7 @@ from flask import Flask, g
 from werkzeug.serving import make_server
 
 from ..utils.json import InkStitchJSONProvider
+from .density import density
 from .simulator import simulator
 from .stitch_plan import stitch_plan
 from .page_specs import page_specs
@@ -33,6 +34,8 @@ class APIServer(Thread):
         self.host = None
         self.port = None
         self.ready = False
+        self.stitch_plan = None
+        self.stitch_plan_lock = Lock()
 
         self.__setup_app()
         self.flask_server = None
@@ -50,6 +53,7 @@ class APIServer(Thread):
         self.app.register_blueprint(simulator, url_prefix="/simulator")
         self.app.register_blueprint(stitch_plan, url_prefix="/stitch_plan")
         self.app.register_blueprint(page_specs, url_prefix="/page_specs")
+        self.app.register_blueprint(density, url_prefix="/density")
         self.app.register_blueprint(languages, url_prefix="/languages")
 
         @self.app.before_request
@@ -57,6 +61,7 @@ class APIServer(Thread):
             # make the InkstitchExtension object available to the view handling
             # this request
             g.extension = self.extension
+            g.server = self
 
         @self.app.route('/ping')
         def ping():
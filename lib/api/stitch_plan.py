@@ -11,18 +11,33 @@ from ..stitch_plan import stitch_groups_to_stitch_plan
 stitch_plan = Blueprint('stitch_plan', __name__)
 
 
+def generate_stitch_plan():
+    """Return the stitch plan of the document the server was started for.
+
+    The document doesn't change while the server is running, so the stitch
+    plan is generated once and shared by every endpoint that needs it.
+    """
+
+    # The server may handle requests in several threads.  Only one of them
+    # generates the stitch plan, the others wait for it.
+    with g.server.stitch_plan_lock:
+        if g.server.stitch_plan is None:
+            metadata = g.extension.get_inkstitch_metadata()
+            collapse_len = metadata['collapse_len_mm']
+            min_stitch_len = metadata['min_stitch_len_mm']
+            stitch_groups = g.extension.elements_to_stitch_groups(g.extension.elements)
+            g.server.stitch_plan = stitch_groups_to_stitch_plan(stitch_groups, collapse_len=collapse_len, min_stitch_len=min_stitch_len)
+
+    return g.server.stitch_plan
+
+
 @stitch_plan.route('')
 def get_stitch_plan():
     if not g.extension.get_elements():
         return dict(colors=[], stitch_blocks=[], commands=[])
 
     try:
-        metadata = g.extension.get_inkstitch_metadata()
-        collapse_len = metadata['collapse_len_mm']
-        min_stitch_len = metadata['min_stitch_len_mm']
-        stitch_groups = g.extension.elements_to_stitch_groups(g.extension.elements)
-        stitch_plan = stitch_groups_to_stitch_plan(stitch_groups, collapse_len=collapse_len, min_stitch_len=min_stitch_len)
-        return jsonify(stitch_plan)
+        return jsonify(generate_stitch_plan())
     except InkstitchException as exc:
         return jsonify({"error_message": str(exc)}), 500
     except Exception:
@@ -7,8 +7,10 @@ import os
 import sys
 from copy import deepcopy
 from random import random
+from weakref import WeakKeyDictionary
 
 import inkex
+from lxml import etree
 from shapely import geometry as shgeo
 
 from .i18n import N_, _
@@ -105,6 +107,10 @@ class BaseCommand(object):
 
         id = url[1:]
 
+        node = get_command_index(self.svg).get_node_by_id(id)
+        if node is not None:
+            return node
+
         try:
             return self.svg.xpath(".//*[@id='%s']" % id)[0]
         except (IndexError, AttributeError):
@@ -179,12 +185,139 @@ def get_command_description(command):
     return COMMANDS[command]
 
 
-def find_commands(node):
-    """Find the symbols this node is connected to and return them as Commands"""
+class CommandIndex(object):
+    """All command connectors and command symbols in a document.
+
+    Looking up the commands of an element used to mean an XPath search of the
+    whole document, for every element.  Instead we collect connectors, command
+    symbols and node ids in a single pass over the document and parse them
+    into Commands as they're asked for.
+
+    The index is kept until invalidate_command_index() is called.  Code that
+    adds, removes or retargets commands has to call it.
+    """
+
+    def __init__(self, svg):
+        self.svg = svg
+
+        self.nodes_by_id = {}
+        self.connectors = {}
+        self.uses = []
+
+        for node in svg.iterdescendants(etree.Element):
+            node_id = node.get('id')
+            if node_id is not None and node_id not in self.nodes_by_id:
+                self.nodes_by_id[node_id] = node
+
+            if CONNECTION_START in node.attrib or CONNECTION_END in node.attrib:
+                self._add_connector(node)
+
+            if node.tag == SVG_USE_TAG and node.get(XLINK_HREF, "").startswith('#inkstitch_'):
+                self.uses.append(node)
+
+        self.commands = {}
+        self._standalone_commands = None
+        self._layer_commands = None
+
+    def _add_connector(self, connector):
+        target_ids = []
+        for url in (connector.get(CONNECTION_START), connector.get(CONNECTION_END)):
+            if url is not None and url.startswith('#') and url[1:] not in target_ids:
+                target_ids.append(url[1:])
+
+        for target_id in target_ids:
+            self.connectors.setdefault(target_id, []).append(connector)
+
+    def knows(self, node):
+        """Return True if node was in the document when the index was built."""
+
+        node_id = node.get('id')
+        return node_id is not None and self.nodes_by_id.get(node_id) is node
+
+    def get_node_by_id(self, node_id):
+        node = self.nodes_by_id.get(node_id)
+        if node is not None and node.get('id') == node_id and self.contains(node):
+            return node
+        else:
+            return None
+
+    def contains(self, node):
+        # Nodes removed from the tree still report the document's root from
+        # getroottree(), so we have to walk up to it.
+        return any(ancestor is self.svg for ancestor in node.iterancestors())
+
+    def find_commands(self, node_id):
+        """Return the Commands connected to the node with this id."""
+
+        if node_id not in self.commands:
+            # try to turn the connectors into commands
+            commands = []
+            for connector in self.connectors.get(node_id, []):
+                try:
+                    commands.append(Command(connector))
+                except CommandParseError:
+                    # Parsing the connector failed, meaning it's not actually an Ink/Stitch command.
+                    pass
+
+            self.commands[node_id] = commands
+
+        return [command for command in self.commands[node_id]
+                if self.contains(command.connector) and _connects_to(command.connector, node_id)]
+
+    def standalone_commands(self):
+        """Return all unconnected command symbols in the document."""
+
+        if self._standalone_commands is None:
+            self._standalone_commands = []
+            for use in self.uses:
+                try:
+                    self._standalone_commands.append(StandaloneCommand(use))
+                except CommandParseError:
+                    pass
+
+        return [command for command in self._standalone_commands if self.contains(command.node)]
+
+    def layer_commands(self, layer):
+        """Return the unconnected command symbols inside this layer."""
+
+        if self._layer_commands is None:
+            self._layer_commands = {}
+            for command in self.standalone_commands():
+                for ancestor in command.node.iterancestors():
+                    self._layer_commands.setdefault(ancestor, []).append(command)
+
+        return [command for command in self._layer_commands.get(layer, []) if layer in command.node.iterancestors()]
 
+
+# svg root node -> CommandIndex
+_command_indexes = WeakKeyDictionary()
+
+
+def get_command_index(svg):
+    """Return the CommandIndex of the document with this root node."""
+
+    index = _command_indexes.get(svg)
+    if index is None:
+        index = _command_indexes[svg] = CommandIndex(svg)
+
+    return index
+
+
+def invalidate_command_index(node):
+    """Forget the CommandIndex of the document this node is part of."""
+
+    _command_indexes.pop(node.getroottree().getroot(), None)
+
+
+def _connects_to(connector, node_id):
+    url = '#' + node_id
+    return connector.get(CONNECTION_START) == url or connector.get(CONNECTION_END) == url
+
+
+def _search_commands(svg, node_id):
     # find all paths that have this object as a connection
-    xpath = ".//*[@inkscape:connection-start='#%(id)s' or @inkscape:connection-end='#%(id)s']" % dict(id=node.get('id'))
-    connectors = node.getroottree().getroot().xpath(xpath, namespaces=inkex.NSS)
+    xpath = ".//*[@inkscape:connection-start='#%(id)s' or @inkscape:connection-end='#%(id)s']" % dict(id=node_id)
+    connectors = svg.xpath(xpath, namespaces=inkex.NSS)
 
     # try to turn them into commands
     commands = []
@@ -198,18 +331,37 @@ def find_commands(node):
     return commands
 
 
+def find_commands(node):
+    """Find the symbols this node is connected to and return them as Commands"""
+
+    node_id = node.get('id')
+    if node_id is None:
+        return []
+
+    svg = node.getroottree().getroot()
+    index = get_command_index(svg)
+
+    if not index.knows(node):
+        # The node was added after the index was built, e.g. by resolving a
+        # clone.  It's cheaper to search for it than to index the document
+        # again.
+        return _search_commands(svg, node_id)
+
+    return index.find_commands(node_id)
+
+
 def layer_commands(layer, command):
     """Find standalone (unconnected) command symbols in this layer."""
 
-    for global_command in global_commands(layer.getroottree().getroot(), command):
-        if layer in global_command.node.iterancestors():
-            yield global_command
+    for layer_command in get_command_index(layer.getroottree().getroot()).layer_commands(layer):
+        if layer_command.command == command:
+            yield layer_command
 
 
 def global_commands(svg, command):
     """Find standalone (unconnected) command symbols anywhere in the document."""
 
-    for standalone_command in _standalone_commands(svg):
+    for standalone_command in get_command_index(svg).standalone_commands():
         if standalone_command.command == command:
             yield standalone_command
 
@@ -240,19 +392,6 @@ def global_command(svg, command):
         return None
 
 
-def _standalone_commands(svg):
-    """Find all unconnected command symbols in the SVG."""
-
-    xpath = ".//svg:use[starts-with(@xlink:href, '#inkstitch_')]"
-    symbols = svg.xpath(xpath, namespaces=inkex.NSS)
-
-    for symbol in symbols:
-        try:
-            yield StandaloneCommand(symbol)
-        except CommandParseError:
-            pass
-
-
 def is_command(node):
     return CONNECTION_START in node.attrib or CONNECTION_END in node.attrib
 
@@ -413,6 +552,8 @@ def add_commands(element, commands, pos=None):
         symbol = add_symbol(svg, group, command, position)
         add_connector(svg, symbol, command, element)
 
+    invalidate_command_index(svg)
+
 
 def add_layer_commands(layer, commands):
     svg = layer.root
@@ -441,3 +582,5 @@ def add_layer_commands(layer, commands):
             "y": "-10",
             "transform": correction_transform
         }))
+
+    invalidate_command_index(svg)
@@ -69,6 +69,15 @@ class Clone(EmbroideryElement):
         source_elements = self.clone_to_elements(source_node)
         return [element.get_cache_key(previous_stitch) for element in source_elements]
 
+    def uses_previous_stitch(self):
+        # The cloned elements are embroidered starting from our previous stitch
+        # group, so we depend on it if any of them does.
+        if not self.clone:
+            return False
+
+        source_elements = self.clone_to_elements(self.node.href)
+        return any(element.uses_previous_stitch() for element in source_elements)
+
     def clone_to_elements(self, node):
         from .utils import node_to_elements
         elements = []
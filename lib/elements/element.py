@@ -20,6 +20,7 @@ from ..stitch_plan.lock_stitch import (LOCK_DEFAULTS, AbsoluteLock, CustomLock,
                                        LockStitch, SVGLock)
 from ..svg import (PIXELS_PER_MM, apply_transforms, convert_length,
                    get_node_transform)
+from ..svg.fingerprint import get_node_fingerprint
 from ..svg.tags import INKSCAPE_LABEL, INKSTITCH_ATTRIBS
 from ..utils import Point, cache
 from ..utils.cache import get_stitch_plan_cache, is_cache_disabled, CacheKeyGenerator
@@ -525,17 +526,13 @@ class EmbroideryElement(object):
         if is_cache_disabled():
             return
 
-        stitch_plan_cache = get_stitch_plan_cache()
-        cache_key = self.get_cache_key(previous_stitch)
-        if cache_key not in stitch_plan_cache:
-            stitch_plan_cache[cache_key] = stitch_groups
-
+        aliases = []
         if previous_stitch is not None:
             # Also store it with None as the previous stitch, so that it can be used next time
             # if we don't care about the previous stitch
-            cache_key = self.get_cache_key(None)
-            if cache_key not in stitch_plan_cache:
-                stitch_plan_cache[cache_key] = stitch_groups
+            aliases.append(self.get_cache_key(None))
+
+        get_stitch_plan_cache().set(self.get_cache_key(previous_stitch), stitch_groups, aliases=aliases)
 
     def get_params_and_values(self):
         params = {}
@@ -544,6 +541,19 @@ class EmbroideryElement(object):
 
         return params
 
+    @classmethod
+    @cache
+    def _get_param_defaults_cache_key_data(cls):
+        # The node fingerprint only covers params that are set on the node.
+        return [(param.name, param.default) for param in cls.get_params()]
+
+    @cache
+    def _get_node_fingerprint(self):
+        # The raw path data, style, transforms and params of this node and its
+        # ancestors.  This is much cheaper than hashing the parsed path and the
+        # computed style, and it covers the same information.
+        return get_node_fingerprint(self.node)
+
     @cache
     def _get_patterns_cache_key_data(self):
         return get_patterns_cache_key_data(self.node)
@@ -569,9 +579,8 @@ class EmbroideryElement(object):
     def get_cache_key(self, previous_stitch):
         cache_key_generator = CacheKeyGenerator()
         cache_key_generator.update(self.__class__.__name__)
-        cache_key_generator.update(self.get_params_and_values())
-        cache_key_generator.update(self.parse_path())
-        cache_key_generator.update(list(self._get_specified_style().items()))
+        cache_key_generator.update(self._get_param_defaults_cache_key_data())
+        cache_key_generator.update(self._get_node_fingerprint())
         cache_key_generator.update(self._get_gradient_cache_key_data())
         cache_key_generator.update(previous_stitch)
         cache_key_generator.update([(c.command, c.target_point) for c in self.commands])
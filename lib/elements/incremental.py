@@ -0,0 +1,76 @@
+# Authors: see git history
+#
+# Copyright (c) 2024 Authors
+# Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
+
+from ..utils.threading import check_stop_flag
+
+
+class IncrementalEmbroiderer(object):
+    """Embroider the same set of elements over and over again.
+
+    This is meant for live previews, where the user changes a param or two
+    and we render everything again.  The stitch groups of every element are
+    kept in memory under the element's cache key.  The next time around,
+    only elements with a different cache key are embroidered.  That's the
+    elements that were edited, and those that start from the previous stitch
+    if the stitch before them moved.
+
+    Keys are based on the content of the SVG, not on node identity, so this
+    also works if the nodes are generated anew for every render (e.g. in the
+    lettering dialog).
+    """
+
+    def __init__(self):
+        # cache key -> stitch groups from the last run
+        self._stitch_groups = {}
+
+    def embroider(self, elements):
+        """Embroider elements in order and return all of their stitch groups.
+
+        Like embroider_serially(), each element starts from the last stitch
+        group of the elements before it.
+        """
+
+        stitch_groups = []
+        memo = {}
+
+        try:
+            for element in elements:
+                check_stop_flag()
+
+                if stitch_groups:
+                    last_stitch_group = stitch_groups[-1]
+                else:
+                    last_stitch_group = None
+
+                cache_key = self._get_cache_key(element, last_stitch_group)
+                element_stitch_groups = memo.get(cache_key)
+                if element_stitch_groups is None:
+                    element_stitch_groups = self._stitch_groups.get(cache_key)
+                if element_stitch_groups is None:
+                    element_stitch_groups = element.embroider(last_stitch_group)
+
+                memo[cache_key] = element_stitch_groups
+                stitch_groups.extend(element_stitch_groups)
+        except BaseException:
+            # Keep what we've done so far.  If we're interrupted because the
+            # user changed something again, the next run can use it.
+            self._stitch_groups.update(memo)
+            raise
+
+        # Forget elements that are gone or have changed.
+        self._stitch_groups = memo
+
+        return stitch_groups
+
+    def clear(self):
+        self._stitch_groups.clear()
+
+    def _get_cache_key(self, element, last_stitch_group):
+        previous_stitch = None
+        with element.handle_unexpected_exceptions():
+            if last_stitch_group and element.uses_previous_stitch():
+                previous_stitch = last_stitch_group.stitches[-1]
+
+            return element.get_cache_key(previous_stitch)
@@ -0,0 +1,230 @@
+# Authors: see git history
+#
+# Copyright (c) 2024 Authors
+# Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
+
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+
+from ..debug import debug
+from ..utils.cache import reset_stitch_plan_cache
+from ..utils.threading import check_stop_flag
+
+# Starting worker processes and shipping stitch groups back to the main
+# process isn't free.  For small documents it's faster to just do the work
+# here.
+MIN_PARALLEL_ELEMENTS = 16
+
+# How often (in seconds) we wake up to look for a cancellation request while
+# waiting for the worker processes.
+STOP_FLAG_INTERVAL = 0.1
+
+
+def embroider_elements(elements):
+    """Embroider a list of elements and return their stitch groups in order.
+
+    This is equivalent to calling embroider() on each element in turn and
+    passing in the last stitch group generated so far.  If the platform
+    allows it, independent elements are embroidered concurrently in a pool
+    of worker processes.
+    """
+
+    if can_embroider_in_parallel(elements):
+        try:
+            return ParallelEmbroiderer(elements).embroider()
+        except WorkerDied:
+            # e.g. killed for running out of memory.  One process needs less
+            # memory than several, so give it another try here.
+            debug.log("a worker process died, embroidering serially")
+
+    return embroider_serially(elements)
+
+
+def embroider_serially(elements):
+    stitch_groups = []
+    for element in elements:
+        if stitch_groups:
+            last_stitch_group = stitch_groups[-1]
+        else:
+            last_stitch_group = None
+
+        stitch_groups.extend(element.embroider(last_stitch_group))
+
+    return stitch_groups
+
+
+def can_embroider_in_parallel(elements):
+    if len(elements) < MIN_PARALLEL_ELEMENTS:
+        return False
+
+    if (os.cpu_count() or 1) < 2:
+        return False
+
+    # Worker processes inherit the elements (and the SVG tree they point to)
+    # through fork().  lxml nodes can't be pickled, so on platforms without
+    # fork() we'd have to re-parse the whole document in every worker.
+    # macOS offers fork() but system frameworks aren't safe to use after it.
+    if 'fork' not in multiprocessing.get_all_start_methods() or sys.platform == 'darwin':
+        return False
+
+    # Forking a process that runs other threads (GUI, API server) can leave
+    # locks held by those threads locked forever in the child.
+    if threading.active_count() > 1:
+        return False
+
+    # Debug output (log and debug.svg) is collected in this process only.
+    if debug.enabled:
+        return False
+
+    return True
+
+
+class WorkerDied(Exception):
+    """A worker process exited before finishing its element."""
+    pass
+
+
+_worker_elements = None
+
+
+def _init_worker(elements):
+    global _worker_elements
+    _worker_elements = elements
+
+    # The stitch plan cache's SQLite connection (and its lock) came along
+    # with fork().  Make this worker open a connection of its own.
+    reset_stitch_plan_cache()
+
+
+def _embroider_in_worker(index, last_stitch_group):
+    return index, _worker_elements[index].embroider(last_stitch_group)
+
+
+class ParallelEmbroiderer:
+    """Embroider elements in a pool of worker processes.
+
+    Elements that don't care about the previous stitch can be embroidered
+    right away.  An element that does use the previous stitch has to wait
+    until every element before it back to the last one that produced stitches
+    is finished.  It is then submitted to the pool along with that element's
+    last stitch group, so the result is identical to embroidering in order.
+    """
+
+    def __init__(self, elements, processes=None):
+        self.elements = elements
+        self.processes = processes or min(os.cpu_count(), len(elements))
+
+        # None means "not finished yet".  Finished elements have a (possibly
+        # empty) list of stitch groups.
+        self.results = [None] * len(elements)
+        self.dependent = [element.uses_previous_stitch() for element in elements]
+        self.submitted = [False] * len(elements)
+        self.errors = {}
+        self.pending = 0
+
+        self.finished = queue.Queue()
+
+    def embroider(self):
+        context = multiprocessing.get_context('fork')
+        other_children = set(multiprocessing.active_children())
+        pool = context.Pool(self.processes, initializer=_init_worker, initargs=(self.elements,))
+
+        # The pool replaces a worker that dies, but the element it was working
+        # on is lost and would never finish.
+        workers = set(multiprocessing.active_children()) - other_children
+
+        try:
+            for index, dependent in enumerate(self.dependent):
+                if not dependent:
+                    self.submit(pool, index, None)
+            self.submit_ready_dependents(pool, -1)
+
+            while self.pending:
+                check_stop_flag()
+
+                try:
+                    index, result = self.finished.get(timeout=STOP_FLAG_INTERVAL)
+                except queue.Empty:
+                    if not all(worker.is_alive() for worker in workers):
+                        raise WorkerDied()
+                    continue
+
+                self.pending -= 1
+                if isinstance(result, BaseException):
+                    # Elements that depend on this one will never be
+                    # submitted, so the loop still ends.
+                    self.errors[index] = result
+                    self.raise_first_error(finished_only=True)
+                    continue
+
+                self.results[index] = result
+                self.submit_ready_dependents(pool, index)
+
+            self.raise_first_error()
+        finally:
+            # Stops any workers that are still busy, e.g. if we were cancelled.
+            pool.terminate()
+
+        stitch_groups = []
+        for result in self.results:
+            stitch_groups.extend(result)
+
+        return stitch_groups
+
+    def raise_first_error(self, finished_only=False):
+        """Raise the error of the first failed element in document order.
+
+        This is the error embroidering serially would have raised.  With
+        finished_only, only raise it if every element before it is finished,
+        so that no earlier element can fail anymore.
+        """
+
+        if not self.errors:
+            return
+
+        first_index = min(self.errors)
+        if finished_only and any(result is None for result in self.results[:first_index]):
+            return
+
+        raise self.errors[first_index]
+
+    def submit(self, pool, index, last_stitch_group):
+        self.submitted[index] = True
+        self.pending += 1
+        pool.apply_async(_embroider_in_worker, (index, last_stitch_group),
+                         callback=self.finished.put,
+                         error_callback=lambda error: self.finished.put((index, error)))
+
+    def submit_ready_dependents(self, pool, finished_index):
+        # Only elements following the one that just finished can have become
+        # ready, and we only need to look past elements that produced no
+        # stitches, because everything after a non-empty result only looks
+        # back that far.
+        for index in range(finished_index + 1, len(self.elements)):
+            if self.dependent[index] and not self.submitted[index]:
+                ready, last_stitch_group = self.get_last_stitch_group(index)
+                if ready:
+                    self.submit(pool, index, last_stitch_group)
+
+            if self.results[index] is None or self.results[index]:
+                break
+
+    def get_last_stitch_group(self, index):
+        """Find the stitch group that the element at index would start from.
+
+        Returns a tuple (ready, last_stitch_group).  If ready is False, an
+        earlier element hasn't finished yet.
+        """
+
+        for previous_index in range(index - 1, -1, -1):
+            previous_result = self.results[previous_index]
+
+            if previous_result is None:
+                return False, None
+            elif previous_result:
+                return True, previous_result[-1]
+
+        return True, None
@@ -5,14 +5,15 @@
 
 import itertools
 import typing
+from bisect import bisect_right
 from copy import deepcopy
 from itertools import chain
 
 import numpy as np
+import shapely
 from inkex import paths
 from shapely import affinity as shaffinity
 from shapely import geometry as shgeo
-from shapely.ops import nearest_points
 
 from ..debug import debug
 from ..i18n import _
@@ -20,7 +21,7 @@ from ..metadata import InkStitchMetadata
 from ..stitch_plan import StitchGroup
 from ..stitches import running_stitch
 from ..svg import line_strings_to_csp, point_lists_to_csp
-from ..utils import Point, cache, cut, cut_multiple, prng
+from ..utils import Point, cache, prng, split_line_coords
 from ..utils.param import ParamOption
 from ..utils.threading import check_stop_flag
 from .element import PIXELS_PER_MM, EmbroideryElement, param
@@ -685,25 +686,25 @@ class SatinColumn(EmbroideryElement):
         """Flatten the rails, cut with the rungs, and return the sections in pairs."""
 
         rails = list(self.flattened_rails)
-        rungs = self.flattened_rungs
+        rungs = np.array(self.flattened_rungs, dtype=object)
         cut_points = [[], []]
 
-        for rung in rungs:
-            intersections = rung.intersection(shgeo.MultiLineString(rails))
+        if len(rungs):
             # ignore the rungs that are cutting a rail multiple times
-            if isinstance(intersections, shgeo.MultiPoint) and len(intersections.geoms) > 2:
-                continue
+            intersections = shapely.intersection(rungs, shgeo.MultiLineString(rails))
+            multiple = (shapely.get_type_id(intersections) == shapely.GeometryType.MULTIPOINT) & (shapely.get_num_geometries(intersections) > 2)
+            rungs = rungs[~multiple]
+
+            # Each rung cuts each rail where it is closest to it (usually where
+            # they cross).  This is nearest_points() and project() for all rungs
+            # at once.
             for i, rail in enumerate(rails):
-                point_on_rung, point_on_rail = nearest_points(rung, rail)
-                cut_points[i].append(rail.project(point_on_rail))
+                points_on_rail = shapely.get_point(shapely.shortest_line(rungs, rail), 1)
+                cut_points[i] = shapely.line_locate_point(rail, points_on_rail)
 
         for i, rail in enumerate(rails):
-            rails[i] = cut_multiple(rail, cut_points[i])
-
-        for rail in rails:
-            for i in range(len(rail)):
-                if rail[i] is not None:
-                    rail[i] = [Point(*coord) for coord in rail[i].coords]
+            rails[i] = [None if coords is None else [Point(*coord) for coord in coords.tolist()]
+                        for coords in split_line_coords(rail, cut_points[i])]
 
         # Clean out empty segments.  Consider an old-style satin like this:
         #
@@ -866,19 +867,21 @@ class SatinColumn(EmbroideryElement):
 
         rails_to_reverse = self._get_rails_to_reverse()
 
+        # project both cut points onto their rails at once
+        distances = shapely.line_locate_point(rails, shapely.points(np.array(cut_points, dtype=float)))
+        pieces = [[None if coords is None else shgeo.LineString(coords) for coords in split_line_coords(rail, [distance])]
+                  for rail, distance in zip(rails, distances)]
+
         if rails_to_reverse[0] == rails_to_reverse[1]:
-            for i, rail in enumerate(rails):
-                before, after = cut(rail, rail.project(shgeo.Point(cut_points[i])))
+            for before, after in pieces:
                 path_lists[0].append(before)
                 path_lists[1].append(after)
         else:
             # rails have opposite direction
-            rail = rails[0]
-            before, after = cut(rail, rail.project(shgeo.Point(cut_points[0])))
+            before, after = pieces[0]
             path_lists[0].append(before)
             path_lists[1].append(after)
-            rail = rails[1]
-            before, after = cut(rail, rail.project(shgeo.Point(cut_points[1])))
+            before, after = pieces[1]
             path_lists[1].append(before)
             path_lists[0].append(after)
 
@@ -1028,11 +1031,22 @@ class SatinColumn(EmbroideryElement):
 
         return out1, out2
 
+    @property
+    @cache
+    def rail_samplers(self):
+        """RailSamplers for each pair of flattened sections."""
+        return [(RailSampler(section0), RailSampler(section1)) for section0, section1 in self.flattened_sections]
+
     def _stitch_distance(self, pos0, pos1, previous_pos0, previous_pos1):
-        """Return the distance from one stitch to the next."""
+        """Return the distance from one stitch to the next.
+
+        The positions are (x, y) tuples.
+        """
 
-        previous_stitch = previous_pos1 - previous_pos0
-        if previous_stitch.length() < 0.01:
+        previous_x = previous_pos1[0] - previous_pos0[0]
+        previous_y = previous_pos1[1] - previous_pos0[1]
+        previous_length = (previous_x ** 2 + previous_y ** 2) ** 0.5
+        if previous_length < 0.01:
             return shgeo.LineString((pos0, pos1)).distance(shgeo.Point(previous_pos0))
         else:
             # Measure the distance at a right angle to the previous stitch, at
@@ -1045,10 +1059,11 @@ class SatinColumn(EmbroideryElement):
             # separation between them.
             #  _________
             #  \_______/
-            normal = previous_stitch.unit().rotate_left()
-            d0 = pos0 - previous_pos0
-            d1 = pos1 - previous_pos1
-            return max(abs(d0 * normal), abs(d1 * normal))
+            normal_x = -(previous_y / previous_length)
+            normal_y = previous_x / previous_length
+            d0 = (pos0[0] - previous_pos0[0]) * normal_x + (pos0[1] - previous_pos0[1]) * normal_y
+            d1 = (pos1[0] - previous_pos1[0]) * normal_x + (pos1[1] - previous_pos1[1]) * normal_y
+            return max(abs(d0), abs(d1))
 
     @debug.time
     def plot_points_on_rails(self, spacing, offset_px=(0, 0), offset_proportional=(0, 0), use_random=False
@@ -1056,30 +1071,39 @@ class SatinColumn(EmbroideryElement):
         # Take a section from each rail in turn, and plot out an equal number
         # of points on both rails.  Return the points plotted. The points will
         # be contracted or expanded by offset using self.offset_points().
+        #
+        # The rails are sampled through RailSampler and positions are plain
+        # (x, y) tuples while we go.  The offsets are applied to all points at
+        # once at the end.
 
         processor = SatinProcessor(self, offset_px, offset_proportional, use_random)
 
-        pairs = []
+        # points on the rails before offsetting, with their proportional offsets
+        points0 = []
+        points1 = []
+        offsets_proportional = []
+
+        def add_pair(pos0, pos1):
+            points0.append(pos0)
+            points1.append(pos1)
+            offsets_proportional.append(processor.get_offset_proportional())
 
-        for i, (section0, section1) in enumerate(self.flattened_sections):
+        for i, (rail0, rail1) in enumerate(self.rail_samplers):
             check_stop_flag()
 
             if i == 0:
-                old_pos0 = section0[0]
-                old_pos1 = section1[0]
-                pairs.append(processor.process_points(old_pos0, old_pos1))
-
-            path0 = shgeo.LineString(section0)
-            path1 = shgeo.LineString(section1)
+                old_pos0 = rail0.start
+                old_pos1 = rail1.start
+                add_pair(old_pos0, old_pos1)
 
             # Base the number of stitches in each section on the _longer_ of
             # the two sections. Otherwise, things could get too sparse when one
             # side is significantly longer (e.g. when going around a corner).
-            num_points = max(path0.length, path1.length, 0.01) / spacing
+            num_points = max(rail0.length, rail1.length, 0.01) / spacing
 
             # Section stitch spacing and the cursor are expressed as a fraction
-            # of the total length of the path, because we use normalized=True
-            # below.
+            # of the total length of the path, because RailSampler.interpolate()
+            # works on relative distances.
             section_stitch_spacing = 1.0 / num_points
 
             # current_spacing, however, is in pixels.
@@ -1088,7 +1112,7 @@ class SatinColumn(EmbroideryElement):
 
             # In all sections after the first, we need to figure out how far to
             # travel before placing the first stitch.
-            distance = self._stitch_distance(section0[0], section1[0], old_pos0, old_pos1)
+            distance = self._stitch_distance(rail0.start, rail1.start, old_pos0, old_pos1)
             to_travel = (1 - min(distance / spacing, 1.0)) * section_stitch_spacing * spacing_multiple
             debug.log(f"num_points: {num_points}, section_stitch_spacing: {section_stitch_spacing}, distance: {distance}, to_travel: {to_travel}")
 
@@ -1096,8 +1120,8 @@ class SatinColumn(EmbroideryElement):
             iterations = 0
             while cursor + to_travel <= 1:
                 iterations += 1
-                pos0 = Point.from_shapely_point(path0.interpolate(cursor + to_travel, normalized=True))
-                pos1 = Point.from_shapely_point(path1.interpolate(cursor + to_travel, normalized=True))
+                pos0 = rail0.interpolate(cursor + to_travel)
+                pos1 = rail1.interpolate(cursor + to_travel)
 
                 # If the rails are parallel, then our stitch spacing will be
                 # perfect.  If the rails are coming together or spreading apart,
@@ -1151,16 +1175,57 @@ class SatinColumn(EmbroideryElement):
 
                 old_pos0 = pos0
                 old_pos1 = pos1
-                pairs.append(processor.process_points(pos0, pos1))
+                add_pair(pos0, pos1)
                 iterations = 0
 
         # Add one last stitch at the end unless our previous stitch is already
         # really close to the end.
-        if pairs and section0 and section1:
-            if self._stitch_distance(section0[-1], section1[-1], old_pos0, old_pos1) > 0.1 * PIXELS_PER_MM:
-                pairs.append(processor.process_points(section0[-1], section1[-1]))
+        if points0:
+            if self._stitch_distance(rail0.end, rail1.end, old_pos0, old_pos1) > 0.1 * PIXELS_PER_MM:
+                add_pair(rail0.end, rail1.end)
+
+        return self._offset_point_pairs(points0, points1, offset_px, offsets_proportional)
+
+    def _offset_point_pairs(self, points0, points1, offset_px, offsets_proportional):
+        """Apply offset_points() to many pairs of (x, y) tuples at once.
+
+        Returns a list of pairs of Points.
+        """
+
+        if not points0:
+            return []
+
+        pos0 = np.array(points0, dtype=float)
+        pos1 = np.array(points1, dtype=float)
+        offsets_proportional = np.array(offsets_proportional, dtype=float)
 
-        return pairs
+        difference = pos0 - pos1
+        distance = (difference[:, 0] ** 2 + difference[:, 1] ** 2) ** 0.5
+
+        offset_a = offset_px[0] + (distance * offsets_proportional[:, 0])
+        offset_b = offset_px[1] + (distance * offsets_proportional[:, 1])
+        offset_total = offset_a + offset_b
+
+        # don't contract beyond the midpoint, or we'll start expanding
+        contract = offset_total < -distance
+        scale = -distance[contract] / offset_total[contract]
+        offset_a[contract] *= scale
+        offset_b[contract] *= scale
+
+        # if they're the same point, we don't know which direction to offset
+        # in, so we leave them alone
+        same = distance < 0.0001
+        distance[same] = 1.0
+        offset_a[same] = 0.0
+        offset_b[same] = 0.0
+
+        unit = difference / distance[:, np.newaxis]
+        out0 = pos0 + unit * offset_a[:, np.newaxis]
+        out1 = pos1 + -unit * offset_b[:, np.newaxis]
+        out0[same] = pos0[same]
+        out1[same] = pos1[same]
+
+        return [(Point(*a), Point(*b)) for a, b in zip(out0.tolist(), out1.tolist())]
 
     def do_contour_underlay(self):
         # "contour walk" underlay: do stitches up one side and down the
@@ -1626,26 +1691,68 @@ class SatinProcessor:
         self.random_zigzag_spacing = satin.random_zigzag_spacing
 
         if use_random:
-            self.seed = prng.join_args(satin.random_seed, "satin-points")
+            self.rolls = prng.iter_uniform_float_blocks(satin.random_seed, "satin-points")
             self.offset_proportional_min = np.array(offset_proportional) - satin.random_width_decrease
             self.offset_range = (satin.random_width_increase + satin.random_width_decrease)
-            self.cycle = 0
 
-    def process_points(self, pos0, pos1):
+    def get_offset_proportional(self):
         if self.use_random:
-            roll = prng.uniform_floats(self.seed, self.cycle)
-            self.cycle += 1
-            offset_prop = self.offset_proportional_min + roll[0:2] * self.offset_range
+            roll = next(self.rolls)
+            return self.offset_proportional_min + roll[0:2] * self.offset_range
         else:
-            offset_prop = self.offset_proportional
-
-        a, b = self.satin.offset_points(pos0, pos1, self.offset_px, offset_prop)
-        return a, b
+            return self.offset_proportional
 
     def get_stitch_spacing_multiple(self):
         if self.use_random:
-            roll = prng.uniform_floats(self.seed, self.cycle)
-            self.cycle += 1
+            roll = next(self.rolls)
             return max(1.0 + ((roll[0] - 0.5) * 2) * self.random_zigzag_spacing, 0.01)
         else:
             return 1.0
+
+
+class RailSampler:
+    """Find points on a rail section by their relative distance along it.
+
+    This gives the same results as shapely's interpolate(distance,
+    normalized=True), but the cumulative lengths of the segments are only
+    calculated once.  Satins sample every rail section hundreds of times.
+    """
+
+    def __init__(self, points):
+        coords = np.array([(point.x, point.y) for point in points], dtype=float)
+        segment_lengths = np.sqrt(np.sum(np.diff(coords, axis=0) ** 2, axis=1))
+
+        self.coords = [tuple(coord) for coord in coords.tolist()]
+        self.segment_lengths = segment_lengths.tolist()
+        self.cumulative_lengths = np.concatenate(([0.0], np.cumsum(segment_lengths))).tolist()
+        self.length = self.cumulative_lengths[-1]
+
+    @property
+    def start(self):
+        return self.coords[0]
+
+    @property
+    def end(self):
+        return self.coords[-1]
+
+    def interpolate(self, fraction):
+        """Return the point at fraction of the length of the rail as an (x, y) tuple."""
+
+        distance = fraction * self.length
+        index = bisect_right(self.cumulative_lengths, distance)
+
+        if index == 0:
+            return self.start
+        elif index == len(self.cumulative_lengths):
+            return self.end
+
+        segment_fraction = (distance - self.cumulative_lengths[index - 1]) / self.segment_lengths[index - 1]
+        x0, y0 = self.coords[index - 1]
+        x1, y1 = self.coords[index]
+
+        if segment_fraction <= 0:
+            return (x0, y0)
+        elif segment_fraction >= 1:
+            return (x1, y1)
+        else:
+            return ((x1 - x0) * segment_fraction + x0, (y1 - y0) * segment_fraction + y0)
@@ -3,8 +3,8 @@
 # Copyright (c) 2010 Authors
 # Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
 
-from ..commands import is_command
-from ..marker import has_marker
+from ..commands import invalidate_command_index, is_command
+from ..marker import has_marker, invalidate_marker_indexes
 from ..svg.tags import (EMBROIDERABLE_TAGS, SVG_IMAGE_TAG, SVG_PATH_TAG,
                         SVG_POLYGON_TAG, SVG_POLYLINE_TAG, SVG_TEXT_TAG)
 from .clone import Clone, is_clone
@@ -60,6 +60,15 @@ def node_to_elements(node, clone_to_element=False):  # noqa: C901
 
 
 def nodes_to_elements(nodes):
+    nodes = list(nodes)
+
+    # The document may have changed since elements were last created from it
+    # (e.g. by the lettering preview), so new elements mustn't see stale
+    # commands or markers.
+    if nodes:
+        invalidate_command_index(nodes[0])
+    invalidate_marker_indexes()
+
     elements = []
     for node in nodes:
         elements.extend(node_to_elements(node))
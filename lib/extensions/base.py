@@ -11,6 +11,7 @@ from lxml.etree import Comment
 from ..commands import is_command, layer_commands
 from ..elements import EmbroideryElement, nodes_to_elements
 from ..elements.clone import is_clone
+from ..elements.parallel import embroider_elements
 from ..i18n import _
 from ..marker import has_marker
 from ..metadata import InkStitchMetadata
@@ -124,16 +125,7 @@ class InkstitchExtension(inkex.EffectExtension):
         return False
 
     def elements_to_stitch_groups(self, elements):
-        stitch_groups = []
-        for element in elements:
-            if stitch_groups:
-                last_stitch_group = stitch_groups[-1]
-            else:
-                last_stitch_group = None
-
-            stitch_groups.extend(element.embroider(last_stitch_group))
-
-        return stitch_groups
+        return embroider_elements(elements)
 
     def get_inkstitch_metadata(self):
         return InkStitchMetadata(self.svg)
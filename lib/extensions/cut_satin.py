@@ -5,6 +5,7 @@
 
 import inkex
 
+from ..commands import invalidate_command_index
 from ..elements import SatinColumn
 from ..i18n import _
 from ..svg import get_correction_transform
@@ -47,3 +48,5 @@ class CutSatin(InkstitchExtension):
                     new_satin.node.set('transform', transform)
                     parent.insert(index, new_satin.node)
                     index += 1
+
+        invalidate_command_index(self.svg)
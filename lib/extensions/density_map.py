@@ -3,15 +3,18 @@
 # Copyright (c) 2010 Authors
 # Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
 
+from base64 import b64encode
+
 import inkex
-import numpy as np
-from scipy.spatial import KDTree
 
 from ..commands import add_layer_commands
 from ..i18n import _
 from ..stitch_plan import stitch_groups_to_stitch_plan
+from ..stitch_plan.density import (GREEN, RED, YELLOW, StitchDensity,
+                                   cells_to_path_data, cells_to_png)
 from ..svg import PIXELS_PER_MM
-from ..svg.tags import INKSCAPE_GROUPMODE, INKSCAPE_LABEL, SVG_GROUP_TAG
+from ..svg.tags import (INKSCAPE_GROUPMODE, INKSCAPE_LABEL, SVG_GROUP_TAG,
+                        XLINK_HREF)
 from ..svg.units import get_viewbox_transform
 from ..utils import cache
 from .base import InkstitchExtension
@@ -26,6 +29,8 @@ class DensityMap(InkstitchExtension):
         self.arg_parser.add_argument("-m", "--num-neighbors-yellow", type=int, default=3, dest="num_neighbors_yellow")
         self.arg_parser.add_argument("-s", "--density-radius-yellow", type=float, default=0.5, dest="radius_yellow")
         self.arg_parser.add_argument("-i", "--indicator-size", type=float, default=0.5, dest="indicator_size")
+        self.arg_parser.add_argument("-t", "--output-type", type=str, default="cells", dest="output_type")
+        self.arg_parser.add_argument("-c", "--cell-size", type=float, default=1, dest="cell_size")
 
     def effect(self):
         # delete old stitch plan
@@ -44,9 +49,18 @@ class DensityMap(InkstitchExtension):
 
         layer = svg.find(".//*[@id='__inkstitch_density_plan__']")
         color_groups = create_color_groups(layer)
-        density_options = [{'max_neighbors': self.options.num_neighbors_red, 'radius': self.options.radius_red},
-                           {'max_neighbors': self.options.num_neighbors_yellow, 'radius': self.options.radius_yellow}]
-        color_block_to_density_markers(svg, color_groups, stitch_plan, density_options, self.options.indicator_size)
+        density_options = [{'max_neighbors': self.options.num_neighbors_red, 'radius': self.options.radius_red * PIXELS_PER_MM},
+                           {'max_neighbors': self.options.num_neighbors_yellow, 'radius': self.options.radius_yellow * PIXELS_PER_MM}]
+        density = StitchDensity(stitch_plan)
+        levels = density.levels(density_options)
+        cell_size = self.options.cell_size * PIXELS_PER_MM
+
+        if self.options.output_type == "markers":
+            density_to_markers(svg, color_groups, density, levels, self.options.indicator_size)
+        elif self.options.output_type == "heatmap":
+            density_to_heatmap(svg, layer, density, levels, cell_size)
+        else:
+            density_to_cells(svg, color_groups, density, levels, cell_size)
 
         # update layer visibility 0 = unchanged, 1 = hidden, 2 = lower opacity
         groups = self.document.getroot().findall(SVG_GROUP_TAG)
@@ -94,22 +108,13 @@ def create_color_groups(layer):
     return color_groups
 
 
-def color_block_to_density_markers(svg, groups, stitch_plan, density_options, indicator_size):
-    num_neighbors = []
-    for option in density_options:
-        radius = option['radius'] * PIXELS_PER_MM
-        num_neighbors.append(get_stitch_density(stitch_plan, radius))
+def density_to_markers(svg, groups, density, levels, indicator_size):
+    """Add a circle for every stitch, colored by its density."""
 
     red_group, yellow_group, green_group = groups
-    for red_neighbors, yellow_neighbors, coord in zip(num_neighbors[0][0], num_neighbors[1][0], num_neighbors[0][1]):
-        color = "green"  # green
-        group = green_group
-        if density_options[0]['max_neighbors'] <= red_neighbors:
-            color = "red"
-            group = red_group
-        elif density_options[1]['max_neighbors'] <= yellow_neighbors:
-            color = "yellow"
-            group = yellow_group
+    colors = {RED: ("red", red_group), YELLOW: ("yellow", yellow_group), GREEN: ("green", green_group)}
+    for level, coord in zip(levels.tolist(), density.coords.tolist()):
+        color, group = colors[level]
         density_marker = inkex.Circle(attrib={
             'id': svg.get_unique_id("density_marker"),
             'style': "fill: %s; stroke: #7e7e7e; stroke-width: 0.02%%;" % color,
@@ -121,18 +126,49 @@ def color_block_to_density_markers(svg, groups, stitch_plan, density_options, in
         group.append(density_marker)
 
 
-def get_stitch_density(stitch_plan, radius):
-    stitches = []
-    for color_block in stitch_plan:
-        for stitch in color_block:
-            stitches.append((stitch.x, stitch.y))
+def density_to_cells(svg, groups, density, levels, cell_size):
+    """Add one path per color with a square for each grid cell.
+
+    Each cell is colored by the densest stitch in it.  Unlike
+    density_to_markers(), the size of the output only depends on the area
+    of the design, not on the number of stitches.
+    """
 
-    # get density per stitch
-    tree = KDTree(np.array(stitches))
-    neighbors = tree.query_ball_tree(tree, radius)
-    density = [len(i) for i in neighbors], stitches
+    cells, origin = density.grid(cell_size, levels)
 
-    return density
+    red_group, yellow_group, green_group = groups
+    for level, color, group in [(RED, "red", red_group), (YELLOW, "yellow", yellow_group), (GREEN, "green", green_group)]:
+        path_data = cells_to_path_data(cells, origin, cell_size, level)
+        if not path_data:
+            continue
+
+        group.append(inkex.PathElement(attrib={
+            'id': svg.get_unique_id("density_cells"),
+            'style': "fill: %s; fill-opacity: 0.6; stroke: none;" % color,
+            'd': path_data,
+            'transform': get_correction_transform(svg)
+        }))
+
+
+def density_to_heatmap(svg, layer, density, levels, cell_size):
+    """Add a single raster image with one pixel per grid cell."""
+
+    cells, origin = density.grid(cell_size, levels)
+    if cells.size == 0:
+        return
+
+    height, width = cells.shape
+    layer.append(inkex.Image(attrib={
+        'id': svg.get_unique_id("density_heatmap"),
+        XLINK_HREF: "data:image/png;base64,%s" % b64encode(cells_to_png(cells)).decode(),
+        'x': str(origin[0]),
+        'y': str(origin[1]),
+        'width': str(width * cell_size),
+        'height': str(height * cell_size),
+        'preserveAspectRatio': 'none',
+        'style': 'image-rendering: pixelated',
+        'transform': get_correction_transform(svg)
+    }))
 
 
 @cache
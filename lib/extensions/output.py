@@ -5,9 +5,8 @@
 
 import os
 import sys
-import tempfile
 
-from ..output import write_embroidery_file
+from ..output import write_embroidery_stream
 from ..stitch_plan import stitch_groups_to_stitch_plan
 from ..threads import ThreadCatalog
 from .base import InkstitchExtension
@@ -59,25 +58,13 @@ class Output(InkstitchExtension):
                                                    min_stitch_len=min_stitch_len)
         ThreadCatalog().match_and_apply_palette(stitch_plan, self.metadata['thread-palette'])
 
-        temp_file = tempfile.NamedTemporaryFile(suffix=".%s" % self.file_extension, delete=False)
-
-        # in windows, failure to close here will keep the file locked
-        temp_file.close()
-
-        write_embroidery_file(temp_file.name, stitch_plan, self.document.getroot(), self.settings)
-
         if sys.platform == "win32":
             import msvcrt
             msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
 
         # inkscape will read the file contents from stdout and copy
         # to the destination file that the user chose
-        with open(temp_file.name, "rb") as output_file:
-            sys.stdout.buffer.write(output_file.read())
-            sys.stdout.flush()
-
-        # clean up the temp file
-        os.remove(temp_file.name)
+        write_embroidery_stream(sys.stdout.buffer, self.file_extension, stitch_plan, self.document.getroot(), self.settings)
 
         # don't let inkex output the SVG!
         sys.exit(0)
@@ -514,7 +514,6 @@ class SettingsPanel(wx.Panel):
         self.preview_renderer.update()
 
     def render_stitch_plan(self):
-        stitch_groups = []
         nodes = []
 
         for tab in self.tabs:
@@ -529,14 +528,10 @@ class SettingsPanel(wx.Panel):
 
         try:
             wx.CallAfter(self._hide_warning)
-            for node in nodes:
-                # Making a copy of the embroidery element is an easy
-                # way to drop the cache in the @cache decorators used
-                # for many params in embroider.py.
-
-                stitch_groups.extend(copy(node).embroider(None))
-
-                check_stop_flag()
+            # Making a copy of the embroidery element is an easy
+            # way to drop the cache in the @cache decorators used
+            # for many params in embroider.py.
+            stitch_groups = self.preview_renderer.embroider([copy(node) for node in nodes])
 
             if stitch_groups:
                 return stitch_groups_to_stitch_plan(
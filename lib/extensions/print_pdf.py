@@ -3,6 +3,7 @@
 # Copyright (c) 2010 Authors
 # Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
 
+import gzip
 import json
 import logging
 import os
@@ -10,14 +11,16 @@ import socket
 import sys
 import time
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
 from copy import deepcopy
 from datetime import date
-from threading import Thread
+from threading import Lock, Thread
 
 import appdirs
 import wx
-from flask import Flask, Response, jsonify, request, send_from_directory
+from flask import (Flask, Response, abort, jsonify, request,
+                   send_from_directory)
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from lxml import etree
 from werkzeug.serving import make_server
@@ -28,7 +31,7 @@ from ..i18n import _, get_languages
 from ..i18n import translation as inkstitch_translation
 from ..stitch_plan import stitch_groups_to_stitch_plan
 from ..svg import render_stitch_plan
-from ..svg.tags import INKSCAPE_GROUPMODE
+from ..svg.tags import INKSCAPE_GROUPMODE, INKSCAPE_LABEL, SVG_GROUP_TAG
 from ..threads import ThreadCatalog
 
 
@@ -95,13 +98,107 @@ def open_url(url):
     os.close(old_stdout)
 
 
+def strip_namespaces(svg):
+    # namespace prefixes seem to trip up HTML, so get rid of them
+    for element in svg.iter():
+        if isinstance(element.tag, str) and element.tag[0] == '{':
+            element.tag = element.tag[element.tag.index('}', 1) + 1:]
+
+
+class RealisticPreviews(object):
+    """Realistic renderings of the stitch plan for the print preview.
+
+    Realistic rendering is slow for large designs and the user may never
+    look at it, so nothing is rendered until the browser asks for it.  Each
+    rendering (the overview or a single color block) runs in a pool of
+    worker threads and is kept gzip-compressed.
+    """
+
+    OVERVIEW = 'overview'
+
+    def __init__(self, document, stitch_plan, max_workers=2):
+        self.document = document
+        self.stitch_plan = stitch_plan
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = Lock()
+        self.futures = {}
+        self._template = None
+
+    def get(self, item):
+        """Return the gzip-compressed SVG for OVERVIEW or a color block index."""
+
+        with self.lock:
+            future = self.futures.get(item)
+            if future is None:
+                future = self.futures[item] = self.executor.submit(self.render, item)
+
+        try:
+            return future.result()
+        except Exception:
+            # don't keep the failure around, so the next request tries again
+            with self.lock:
+                if self.futures.get(item) is future:
+                    del self.futures[item]
+            raise
+
+    def clear(self):
+        """Forget all renderings, e.g. because the colors have changed."""
+
+        with self.lock:
+            self.futures.clear()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_template(self):
+        # A copy of the document with the stitch plan layer as the only
+        # layer, so that every rendering only needs to copy what it keeps.
+        with self.lock:
+            if self._template is None:
+                svg = deepcopy(self.document).getroot()
+
+                stitch_plan_layer = svg.findone(".//*[@id='__inkstitch_stitch_plan__']")
+                if stitch_plan_layer is not None:
+                    svg.append(stitch_plan_layer)
+
+                    # Make sure there is no leftover translation from stitch plan preview
+                    stitch_plan_layer.pop('transform')
+
+                for layer in svg.findall("./%s[@%s='layer']" % (SVG_GROUP_TAG, INKSCAPE_GROUPMODE)):
+                    if layer is not stitch_plan_layer:
+                        svg.remove(layer)
+
+                # objects outside of the viewbox are invisible
+                svg.set('style', 'overflow:visible;')
+
+                self._template = svg
+
+            return deepcopy(self._template)
+
+    def render(self, item):
+        svg = self.get_template()
+
+        if item == self.OVERVIEW:
+            render_stitch_plan(svg, self.stitch_plan, realistic=True, visual_commands=False)
+        else:
+            layer = render_stitch_plan(svg, [self.stitch_plan.color_blocks[item]], realistic=True, visual_commands=False)
+
+            # render_stitch_plan() numbers the color blocks it was given
+            group = layer[0]
+            group.set('id', '__color_block_%d__' % item)
+            group.set(INKSCAPE_LABEL, "color block %d" % (item + 1))
+
+        strip_namespaces(svg)
+
+        return gzip.compress(etree.tostring(svg))
+
+
 class PrintPreviewServer(Thread):
     def __init__(self, *args, **kwargs):
         self.html = kwargs.pop('html')
         self.metadata = kwargs.pop('metadata')
         self.stitch_plan = kwargs.pop('stitch_plan')
-        self.realistic_overview_svg = kwargs.pop('realistic_overview_svg')
-        self.realistic_color_block_svgs = kwargs.pop('realistic_color_block_svgs')
+        self.realistic_previews = kwargs.pop('realistic_previews')
         Thread.__init__(self, *args, **kwargs)
         self.daemon = True
         self.last_request_time = None
@@ -110,6 +207,11 @@ class PrintPreviewServer(Thread):
         self.server_thread = None
         self.started = False
 
+        # Requests are served by several threads (see run()).  This lock
+        # guards the metadata and the stitch plan's colors, which requests
+        # may change.
+        self.lock = Lock()
+
         self.__setup_app()
 
     def __set_resources_path(self):
@@ -159,18 +261,21 @@ class PrintPreviewServer(Thread):
 
         @self.app.route('/settings/<field_name>', methods=['POST'])
         def set_field(field_name):
-            self.metadata[field_name] = request.json['value']
+            with self.lock:
+                self.metadata[field_name] = request.json['value']
             return "OK"
 
         @self.app.route('/settings/<field_mame>', methods=['GET'])
         def get_field(field_name):
-            return jsonify(self.metadata[field_name])
+            with self.lock:
+                return jsonify(self.metadata[field_name])
 
         @self.app.route('/settings', methods=['GET'])
         def get_settings():
             settings = {}
             settings.update(load_defaults())
-            settings.update(self.metadata)
+            with self.lock:
+                settings.update(self.metadata)
             return jsonify(settings)
 
         @self.app.route('/defaults', methods=['POST'])
@@ -183,37 +288,45 @@ class PrintPreviewServer(Thread):
             name = request.json['name']
             catalog = ThreadCatalog()
             palette = catalog.get_palette_by_name(name)
-            catalog.apply_palette(self.stitch_plan, palette)
 
-            # clear any saved color or thread names
-            for field in self.metadata:
-                if field.startswith('color-') or field.startswith('thread-'):
-                    del self.metadata[field]
+            with self.lock:
+                catalog.apply_palette(self.stitch_plan, palette)
+
+                # clear any saved color or thread names
+                for field in self.metadata:
+                    if field.startswith('color-') or field.startswith('thread-'):
+                        del self.metadata[field]
 
-            self.metadata['thread-palette'] = name
+                self.metadata['thread-palette'] = name
+
+                # realistic previews need to be rendered in the new colors
+                self.realistic_previews.clear()
 
             return "OK"
 
         @self.app.route('/threads', methods=['GET'])
         def get_threads():
             threads = []
-            for color_block in self.stitch_plan:
-                threads.append({
-                    'hex': color_block.color.hex_digits,
-                    'name': color_block.color.name,
-                    'manufacturer': color_block.color.manufacturer,
-                    'number': color_block.color.number,
-                })
+            with self.lock:
+                for color_block in self.stitch_plan:
+                    threads.append({
+                        'hex': color_block.color.hex_digits,
+                        'name': color_block.color.name,
+                        'manufacturer': color_block.color.manufacturer,
+                        'number': color_block.color.number,
+                    })
 
             return jsonify(threads)
 
         @self.app.route('/realistic/block<int:index>', methods=['GET'])
         def get_realistic_block(index):
-            return Response(self.realistic_color_block_svgs[index], mimetype='image/svg+xml')
+            if index >= len(self.stitch_plan):
+                abort(404)
+            return self.realistic_response(index)
 
         @self.app.route('/realistic/overview', methods=['GET'])
         def get_realistic_overview():
-            return Response(self.realistic_overview_svg, mimetype='image/svg+xml')
+            return self.realistic_response(RealisticPreviews.OVERVIEW)
 
         @self.app.route('/printing/start')
         def printing_start():
@@ -227,7 +340,20 @@ class PrintPreviewServer(Thread):
             # nothing to do here -- request_started() will restart the watcher
             return "OK"
 
+    def realistic_response(self, item):
+        svg = self.realistic_previews.get(item)
+
+        if 'gzip' in request.accept_encodings:
+            response = Response(svg, mimetype='image/svg+xml')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(svg), mimetype='image/svg+xml')
+        response.headers['Vary'] = 'Accept-Encoding'
+
+        return response
+
     def stop(self):
+        self.realistic_previews.shutdown()
         self.flask_server.shutdown()
         self.server_thread.join()
 
@@ -267,7 +393,9 @@ class PrintPreviewServer(Thread):
         # exporting the port number for languages to work in electron vuejs part of inkstitch
         os.environ['FLASKPORT'] = str(self.port)
 
-        self.flask_server = make_server(self.host, self.port, self.app)
+        # Realistic previews are rendered while the request waits, so other
+        # requests (especially the pings) must be served in parallel.
+        self.flask_server = make_server(self.host, self.port, self.app, threaded=True)
         self.server_thread = Thread(target=self.flask_server.serve_forever)
         self.server_thread.start()
         self.started = True
@@ -349,17 +477,11 @@ class Print(InkstitchExtension):
 
         return env
 
-    def strip_namespaces(self, svg):
-        # namespace prefixes seem to trip up HTML, so get rid of them
-        for element in svg.iter():
-            if isinstance(element.tag, str) and element.tag[0] == '{':
-                element.tag = element.tag[element.tag.index('}', 1) + 1:]
-
     def render_svgs(self, stitch_plan, realistic=False):
         svg = deepcopy(self.document).getroot()
         render_stitch_plan(svg, stitch_plan, realistic, visual_commands=False)
 
-        self.strip_namespaces(svg)
+        strip_namespaces(svg)
 
         # Now the stitch plan layer will contain a set of groups, each
         # corresponding to a color block.  We'll create a set of SVG files
@@ -451,7 +573,6 @@ class Print(InkstitchExtension):
         palette = ThreadCatalog().match_and_apply_palette(stitch_plan, self.get_inkstitch_metadata()['thread-palette'])
 
         overview_svg, color_block_svgs = self.render_svgs(stitch_plan, realistic=False)
-        realistic_overview_svg, realistic_color_block_svgs = self.render_svgs(stitch_plan, realistic=True)
 
         for i, svg in enumerate(color_block_svgs):
             stitch_plan.color_blocks[i].svg_preview = svg
@@ -462,8 +583,7 @@ class Print(InkstitchExtension):
             html=html,
             metadata=self.get_inkstitch_metadata(),
             stitch_plan=stitch_plan,
-            realistic_overview_svg=realistic_overview_svg,
-            realistic_color_block_svgs=realistic_color_block_svgs
+            realistic_previews=RealisticPreviews(self.document, stitch_plan)
         )
         print_server.start()
 
@@ -5,7 +5,8 @@
 
 from inkex import NSS, Boolean, ShapeElement
 
-from ..commands import OBJECT_COMMANDS, find_commands
+from ..commands import (OBJECT_COMMANDS, find_commands,
+                        invalidate_command_index)
 from ..svg.svg import find_elements
 from .base import InkstitchExtension
 
@@ -92,6 +93,8 @@ class RemoveEmbroiderySettings(InkstitchExtension):
         else:
             self.remove_specific_commands(self.options.del_commands)
 
+        invalidate_command_index(self.svg)
+
     def get_selected_elements(self):
         return self.svg.selection.get(ShapeElement)
 
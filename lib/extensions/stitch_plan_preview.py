@@ -30,6 +30,7 @@ class StitchPlanPreview(InkstitchExtension):
         self.arg_parser.add_argument("-c", "--visual-commands", type=Boolean, default="symbols", dest="visual_commands")
         self.arg_parser.add_argument("-o", "--overwrite", type=Boolean, default=True, dest="overwrite")
         self.arg_parser.add_argument("-m", "--render-mode", type=str, default="simple", dest="mode")
+        self.arg_parser.add_argument("-e", "--merge-realistic-stitches", type=Boolean, default=False, dest="merge_realistic_stitches")
 
     def effect(self):
         realistic, raster_mult = self.parse_mode()
@@ -49,7 +50,7 @@ class StitchPlanPreview(InkstitchExtension):
         stitch_groups = self.elements_to_stitch_groups(self.elements)
         stitch_plan = stitch_groups_to_stitch_plan(stitch_groups, collapse_len=collapse_len, min_stitch_len=min_stitch_len)
 
-        layer = render_stitch_plan(svg, stitch_plan, realistic, visual_commands)
+        layer = render_stitch_plan(svg, stitch_plan, realistic, visual_commands, self.options.merge_realistic_stitches)
         layer = self.rasterize(svg, layer, raster_mult)
 
         # update layer visibility (unchanged, hidden, lower opacity)
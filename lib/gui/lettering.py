@@ -18,7 +18,7 @@ from ..lettering.categories import FONT_CATEGORIES, FontCategory
 from ..stitch_plan import stitch_groups_to_stitch_plan
 from ..svg.tags import INKSCAPE_LABEL, INKSTITCH_LETTERING, SVG_PATH_TAG
 from ..utils import DotDict, cache
-from ..utils.threading import ExitThread, check_stop_flag
+from ..utils.threading import ExitThread
 from . import PresetsPanel, PreviewRenderer, info_dialog
 
 
@@ -342,16 +342,10 @@ class LetteringPanel(wx.Panel):
             destination_group.attrib['transform'] = 'scale(%s)' % (self.settings.scale / 100.0)
 
     def render_stitch_plan(self):
-        stitch_groups = []
-
         try:
             self.update_lettering()
             elements = nodes_to_elements(self.group.iterdescendants(SVG_PATH_TAG))
-
-            for element in elements:
-                check_stop_flag()
-
-                stitch_groups.extend(element.embroider(None))
+            stitch_groups = self.preview_renderer.embroider(elements)
 
             if stitch_groups:
                 return stitch_groups_to_stitch_plan(
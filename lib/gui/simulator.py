@@ -14,6 +14,7 @@ from lib.debug import debug
 from lib.utils import get_resource_dir
 from lib.utils.settings import global_settings
 from lib.utils.threading import ExitThread
+from ..elements.incremental import IncrementalEmbroiderer
 from ..i18n import _
 from ..stitch_plan import stitch_plan_from_file
 from ..svg import PIXELS_PER_MM
@@ -1191,6 +1192,9 @@ class PreviewRenderer(Thread):
         # generation.
         self.stop = Event()
 
+        # stitch groups of the elements we rendered last time
+        self.embroiderer = IncrementalEmbroiderer()
+
     def update(self):
         """Request to render a new stitch plan.
 
@@ -1204,6 +1208,16 @@ class PreviewRenderer(Thread):
         self.stop.set()
         self.refresh_needed.set()
 
+    def embroider(self, elements):
+        """Embroider elements for the stitch plan, reusing the last results.
+
+        Call this from render_stitch_plan_hook().  Only elements that changed
+        since the last render (or that start from a stitch that moved) are
+        embroidered again.
+        """
+
+        return self.embroiderer.embroider(elements)
+
     def run(self):
         while True:
             self.refresh_needed.wait()
@@ -10,12 +10,13 @@ from random import randint
 
 import inkex
 
-from ..commands import add_commands, ensure_symbol
+from ..commands import add_commands, ensure_symbol, invalidate_command_index
 from ..elements import SatinColumn, Stroke, nodes_to_elements
 from ..exceptions import InkstitchException
 from ..extensions.lettering_custom_font_dir import get_custom_font_dir
 from ..i18n import _, get_languages
-from ..marker import MARKER, ensure_marker, has_marker
+from ..marker import (MARKER, ensure_marker, has_marker,
+                      invalidate_marker_indexes)
 from ..stitches.auto_satin import auto_satin
 from ..svg.tags import (CONNECTION_END, CONNECTION_START, EMBROIDERABLE_TAGS,
                         INKSCAPE_LABEL, INKSTITCH_ATTRIBS, SVG_GROUP_TAG,
@@ -345,6 +346,8 @@ class Font(object):
                 c.set(CONNECTION_END, "#%s" % new_element_id)
                 c.set(CONNECTION_START, "#%s" % new_symbol_id)
 
+        invalidate_command_index(node)
+
     def _add_trims(self, destination_group, text, trim_option, use_trim_symbols, back_and_forth):
         """
         trim_option == 0  --> no trims
@@ -416,6 +419,7 @@ class Font(object):
                 ensure_marker(group.getroottree().getroot(), marker)
                 for element in marked_elements:
                     element.style['marker-start'] = "url(#inkstitch-%s-marker)" % marker
+                invalidate_marker_indexes()
 
     def _apply_auto_satin(self, group):
         """Apply Auto-Satin to an SVG XML node tree with an svg:g at its root.
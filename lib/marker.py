@@ -5,11 +5,13 @@
 
 from copy import deepcopy
 from os import path
+from weakref import WeakKeyDictionary
 
-from inkex import NSS, Style, load_svg
+from inkex import Style, load_svg
 from shapely import geometry as shgeo
 
-from .svg.tags import EMBROIDERABLE_TAGS
+from .svg.fingerprint import get_node_fingerprint
+from .svg.tags import EMBROIDERABLE_TAGS, SVG_GROUP_TAG
 from .utils import cache, get_bundled_dir
 
 MARKER = ['pattern', 'guide-line']
@@ -36,53 +38,160 @@ def set_marker(node, position, marker):
     style += Style(f'marker-{ position }:url(#inkstitch-{ marker }-marker)')
     node.set('style', style)
 
+    invalidate_marker_indexes()
 
-def get_marker_elements(node, marker, get_fills=True, get_strokes=True, get_satins=False):
-    from .elements import EmbroideryElement
-    from .elements.fill_stitch import FillStitch
-    from .elements.satin_column import SatinColumn
-    from .elements.stroke import Stroke
 
+class MarkerIndex(object):
+    """The marker elements in one group.
+
+    Markers apply to their siblings, so every element in a group used to
+    search the group for markers and then parse every marker it found.
+    The index scans the group's children once per marker type.  It's kept
+    until invalidate_marker_indexes() is called.
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self.markers = {}
+
+    def get_markers(self, marker):
+        if marker not in self.markers:
+            # do not close marker-start:url(
+            # if the marker group has been copied and pasted in Inkscape it may have been duplicated with an updated id (e.g. -4)
+            style = "marker-start:url(#inkstitch-%s-marker" % marker
+            self.markers[marker] = [child for child in self.group
+                                    if child.tag in EMBROIDERABLE_TAGS and style in (child.get('style') or '')]
+
+        return self.markers[marker]
+
+
+class MarkerShapes(object):
+    """The parsed geometry of a marker element, computed as needed."""
+
+    def __init__(self, node, fingerprint):
+        from .elements import EmbroideryElement
+
+        self.node = node
+        self.fingerprint = fingerprint
+
+        element = EmbroideryElement(node)
+        self.has_fill = element.get_style('fill') is not None
+        self.has_stroke = element.get_style('stroke') is not None
+
+        self._values = {}
+
+    def _get(self, name, compute):
+        if name not in self._values:
+            self._values[name] = compute()
+        return self._values[name]
+
+    @property
+    def fill(self):
+        from .elements.fill_stitch import FillStitch
+        return self._get('fill', lambda: FillStitch(self.node).shape)
+
+    @property
+    def fill_wkt(self):
+        return self._get('fill_wkt', lambda: self.fill.wkt)
+
+    @property
+    def stroke(self):
+        from .elements.stroke import Stroke
+        return self._get('stroke', lambda: shgeo.MultiLineString([shgeo.LineString(path) for path in Stroke(self.node).paths]))
+
+    @property
+    def stroke_wkt(self):
+        return self._get('stroke_wkt', lambda: self.stroke.wkt)
+
+    @property
+    def satin(self):
+        """The marker as a SatinColumn, or None if it doesn't have two rails."""
+        return self._get('satin', self._get_satin)
+
+    def _get_satin(self):
+        from .elements.satin_column import SatinColumn
+
+        satin = SatinColumn(self.node)
+        if len(satin.rails) == 2:
+            return satin
+        else:
+            return None
+
+
+# group -> MarkerIndex
+_marker_indexes = WeakKeyDictionary()
+
+# marker node -> MarkerShapes
+_marker_shapes = WeakKeyDictionary()
+
+
+def invalidate_marker_indexes():
+    """Forget which elements are markers.
+
+    Call this after adding or removing markers.  The parsed marker shapes
+    are kept as long as the marker elements don't change.
+    """
+
+    _marker_indexes.clear()
+
+
+def _get_markers(node, marker):
+    group = node.getparent()
+    if group is None or group.tag != SVG_GROUP_TAG:
+        return []
+
+    index = _marker_indexes.get(group)
+    if index is None:
+        index = _marker_indexes[group] = MarkerIndex(group)
+
+    return index.get_markers(marker)
+
+
+def _get_marker_shapes(node):
+    fingerprint = get_node_fingerprint(node)
+
+    shapes = _marker_shapes.get(node)
+    if shapes is None or shapes.fingerprint != fingerprint:
+        shapes = _marker_shapes[node] = MarkerShapes(node, fingerprint)
+
+    return shapes
+
+
+def get_marker_elements(node, marker, get_fills=True, get_strokes=True, get_satins=False):
     fills = []
     strokes = []
     satins = []
-    # do not close marker-start:url(
-    # if the marker group has been copied and pasted in Inkscape it may have been duplicated with an updated id (e.g. -4)
-    xpath = "./parent::svg:g/*[contains(@style, 'marker-start:url(#inkstitch-%s-marker')]" % marker
-    markers = node.xpath(xpath, namespaces=NSS)
-    for marker in markers:
-        if marker.tag not in EMBROIDERABLE_TAGS:
-            continue
-
-        element = EmbroideryElement(marker)
-        fill = element.get_style('fill')
-        stroke = element.get_style('stroke')
-
-        if get_fills and fill is not None:
-            fill = FillStitch(marker).shape
-            fills.append(fill)
-
-        if get_strokes and stroke is not None:
-            stroke = Stroke(marker).paths
-            line_strings = [shgeo.LineString(path) for path in stroke]
-            strokes.append(shgeo.MultiLineString(line_strings))
-
-        if get_satins and stroke is not None:
-            satin = SatinColumn(marker)
-            if len(satin.rails) == 2:
-                satins.append(satin)
+    for marker_node in _get_markers(node, marker):
+        shapes = _get_marker_shapes(marker_node)
+
+        if get_fills and shapes.has_fill:
+            fills.append(shapes.fill)
+
+        if get_strokes and shapes.has_stroke:
+            strokes.append(shapes.stroke)
+
+        if get_satins and shapes.has_stroke and shapes.satin is not None:
+            satins.append(shapes.satin)
 
     return {'fill': fills, 'stroke': strokes, 'satin': satins}
 
 
 def get_marker_elements_cache_key_data(node, marker):
-    marker_elements = get_marker_elements(node, marker, True, True, True)
+    fills = []
+    strokes = []
+    satins = []
+    for marker_node in _get_markers(node, marker):
+        shapes = _get_marker_shapes(marker_node)
 
-    marker_elements['fill'] = [shape.wkt for shape in marker_elements['fill']]
-    marker_elements['stroke'] = [shape.wkt for shape in marker_elements['stroke']]
-    marker_elements['satin'] = [satin.csp for satin in marker_elements['satin']]
+        if shapes.has_fill:
+            fills.append(shapes.fill_wkt)
 
-    return marker_elements
+        if shapes.has_stroke:
+            strokes.append(shapes.stroke_wkt)
+            if shapes.satin is not None:
+                satins.append(shapes.satin.csp)
+
+    return {'fill': fills, 'stroke': strokes, 'satin': satins}
 
 
 def has_marker(node, marker=list()):
@@ -5,28 +5,35 @@
 
 import os
 import sys
+from io import BytesIO, TextIOWrapper
 
 import inkex
+import numpy as np
 import pyembroidery
 
 from .commands import global_command
 from .i18n import _
-from .stitch_plan import Stitch
+from .stitch_plan.color_block import COLOR_CHANGE, JUMP, STOP, TRIM
 from .svg import PIXELS_PER_MM
 from .utils import Point
 
+# pyembroidery writes these formats front to back without seeking, so they can
+# be streamed.
+SEQUENTIAL_FORMATS = ('dst', 'exp', 'jef')
 
-def get_command(stitch):
-    if stitch.jump:
-        return pyembroidery.JUMP
-    elif stitch.trim:
-        return pyembroidery.TRIM
-    elif stitch.color_change:
-        return pyembroidery.COLOR_CHANGE
-    elif stitch.stop:
-        return pyembroidery.STOP
-    else:
-        return pyembroidery.NEEDLE_AT
+
+def get_commands(color_block):
+    """Get the pyembroidery command for each stitch of a ColorBlock."""
+
+    flags = color_block.flags
+    commands = np.full(len(flags), pyembroidery.NEEDLE_AT, dtype=np.int64)
+
+    # lowest priority first, so that e.g. a jump wins over a trim
+    for flag, command in ((STOP, pyembroidery.STOP), (COLOR_CHANGE, pyembroidery.COLOR_CHANGE),
+                          (TRIM, pyembroidery.TRIM), (JUMP, pyembroidery.JUMP)):
+        commands[(flags & flag) != 0] = command
+
+    return commands
 
 
 def _string_to_floats(string):
@@ -46,37 +53,47 @@ def get_origin(svg, bounding_box):
         return default
 
 
-def jump_to_stop_point(pattern, svg):
-    stop_position = global_command(svg, "stop_position")
-    if stop_position:
-        pattern.add_stitch_absolute(pyembroidery.JUMP, stop_position.point.x, stop_position.point.y)
-
-
-def write_embroidery_file(file_path, stitch_plan, svg, settings={}):
-    # convert from pixels to millimeters
-    # also multiply by 10 to get tenths of a millimeter as required by pyembroidery
-    scale = 10 / PIXELS_PER_MM
+def get_pattern(stitch_plan, svg):
+    """Convert a StitchPlan into a pyembroidery EmbPattern.
 
-    origin = get_origin(svg, stitch_plan.bounding_box)
-    # origin = origin * scale
+    The stitches are taken straight from the ColorBlocks' coordinate and
+    flag arrays rather than going through a Stitch object and an
+    add_stitch_absolute() call for each one.
+    """
 
     pattern = pyembroidery.EmbPattern()
 
     # For later use when writing .dst header title field.
     pattern.extras['name'] = os.path.splitext(svg.name)[0]
 
-    stitch = Stitch(0, 0)
+    stop_position = global_command(svg, "stop_position")
+    last_x, last_y = 0, 0
 
     for color_block in stitch_plan:
         pattern.add_thread(color_block.color.pyembroidery_thread)
 
-        for stitch in color_block:
-            if stitch.stop:
-                jump_to_stop_point(pattern, svg)
-            command = get_command(stitch)
-            pattern.add_stitch_absolute(command, stitch.x, stitch.y)
+        if not len(color_block):
+            continue
+
+        coordinates = color_block.coordinates.tolist()
+        commands = get_commands(color_block).tolist()
+        stitches = [[x, y, command] for (x, y), command in zip(coordinates, commands)]
+
+        if stop_position:
+            stops = np.flatnonzero(color_block.flags & STOP).tolist()
+            for index in reversed(stops):
+                stitches.insert(index, [stop_position.point.x, stop_position.point.y, pyembroidery.JUMP])
+
+        pattern.stitches.extend(stitches)
+        last_x, last_y = coordinates[-1]
 
-    pattern.add_stitch_absolute(pyembroidery.END, stitch.x, stitch.y)
+    pattern.add_stitch_absolute(pyembroidery.END, last_x, last_y)
+
+    return pattern
+
+
+def get_settings(file_format, origin, settings):
+    scale = 10 / PIXELS_PER_MM
 
     settings.update({
         # correct for the origin
@@ -91,20 +108,36 @@ def write_embroidery_file(file_path, stitch_plan, svg, settings={}):
         "full_jump": True,
     })
 
-    if not file_path.endswith(('.col', '.edr', '.inf')):
+    if file_format not in ('col', 'edr', 'inf'):
         settings['encode'] = True
 
-    if file_path.endswith('.csv'):
+    if file_format == 'csv':
         # Special treatment for CSV: instruct pyembroidery not to do any post-
         # processing.  This will allow the user to match up stitch numbers seen
         # in the simulator with commands in the CSV.
         settings['max_stitch'] = float('inf')
         settings['max_jump'] = float('inf')
         settings['explicit_trim'] = False
-    elif file_path.endswith('.png'):
+    elif file_format == 'png':
         settings['linewidth'] = 1
         settings['background'] = 'white'
 
+    return settings
+
+
+def get_writer(file_format):
+    for file_type in pyembroidery.supported_formats():
+        if file_type['extension'] == file_format and file_type.get('writer'):
+            return file_type['writer']
+
+    raise IOError("Conversion to file type '%s' is not supported" % file_format)
+
+
+def write_embroidery_file(file_path, stitch_plan, svg, settings={}):
+    file_format = os.path.splitext(file_path)[1][1:].lower()
+    pattern = get_pattern(stitch_plan, svg)
+    settings = get_settings(file_format, get_origin(svg, stitch_plan.bounding_box), settings)
+
     try:
         pyembroidery.write(pattern, file_path, settings)
     except IOError as e:
@@ -113,3 +146,79 @@ def write_embroidery_file(file_path, stitch_plan, svg, settings={}):
         msg = _("Error writing to %(path)s: %(error)s") % dict(path=file_path, error=e.strerror)
         inkex.errormsg(msg)
         sys.exit(1)
+
+
+class PositionTrackingStream:
+    """Keeps track of the position in a write-only stream, e.g. a pipe.
+
+    Some writers look at tell() to pad headers.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+
+    def write(self, data):
+        self.position += len(data)
+        return self.stream.write(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        self.stream.flush()
+
+
+def write_embroidery_stream(stream, file_format, stitch_plan, svg, settings={}):
+    """Write the stitch plan to a binary stream, such as sys.stdout.buffer.
+
+    Formats written strictly front to back (see SEQUENTIAL_FORMATS) go
+    straight to the stream.  All others need to seek back to fill in headers,
+    so they're encoded into memory first if the stream can't seek.
+    """
+
+    try:
+        writer = get_writer(file_format)
+    except IOError as e:
+        inkex.errormsg(str(e))
+        sys.exit(1)
+
+    pattern = get_pattern(stitch_plan, svg)
+    settings = get_settings(file_format, get_origin(svg, stitch_plan.bounding_box), settings)
+
+    text_mode = getattr(writer, 'WRITE_FILE_IN_TEXT_MODE', False)
+
+    buffered = False
+    if file_format in SEQUENTIAL_FORMATS:
+        # TextIOWrapper needs a real binary stream, not our wrapper.
+        assert not text_mode, "sequential formats must be binary formats"
+        output = PositionTrackingStream(stream)
+    elif not stream.seekable():
+        output = BytesIO()
+        buffered = True
+    else:
+        output = stream
+
+    try:
+        if text_mode:
+            text_output = TextIOWrapper(output)
+            pyembroidery.EmbPattern.write_embroidery(writer, pattern, text_output, settings)
+            text_output.detach()
+        else:
+            pyembroidery.EmbPattern.write_embroidery(writer, pattern, output, settings)
+
+        if buffered:
+            stream.write(output.getvalue())
+
+        stream.flush()
+    except IOError as e:
+        if isinstance(e, BrokenPipeError) and stream is sys.stdout.buffer:
+            # Python would try to flush stdout again on exit and fail the
+            # same way.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+        # L10N low-level file error.  %(error)s is (hopefully?) translated by
+        # the user's system automatically.
+        msg = _("Error writing to %(path)s: %(error)s") % dict(path=getattr(stream, 'name', stream), error=e.strerror)
+        inkex.errormsg(msg)
+        sys.exit(1)
@@ -3,6 +3,8 @@
 # Copyright (c) 2010 Authors
 # Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
 
+import numpy as np
+import shapely
 from shapely import geometry as shgeo
 
 from .marker import get_marker_elements
@@ -27,29 +29,37 @@ def apply_patterns(stitch_groups, node):
 
 def _apply_stroke_patterns(patterns, stitch_groups):
     for pattern in patterns:
+        shapely.prepare(pattern)
         for stitch_group in stitch_groups:
+            if len(stitch_group.stitches) < 2:
+                continue
+
+            intersection_points = _get_pattern_points(stitch_group.stitches, pattern)
             stitch_group_points = []
             for i, stitch in enumerate(stitch_group.stitches):
                 stitch_group_points.append(stitch)
-                if i == len(stitch_group.stitches) - 1:
-                    continue
-                intersection_points = _get_pattern_points(stitch, stitch_group.stitches[i + 1], pattern)
-                for point in intersection_points:
+                for point in intersection_points.get(i, []):
                     stitch_group_points.append(Stitch(point, tags=('pattern_point',)))
             stitch_group.stitches = stitch_group_points
 
 
 def _apply_fill_patterns(patterns, stitch_groups):
     for pattern in patterns:
+        shapely.prepare(pattern)
         for stitch_group in stitch_groups:
+            if not stitch_group.stitches:
+                continue
+
+            coords = np.array([(stitch.x, stitch.y) for stitch in stitch_group.stitches])
+            inside = shapely.contains_xy(pattern, coords[:, 0], coords[:, 1])
+            # keep start and end points
+            inside[0] = inside[-1] = False
+
             stitch_group_points = []
-            for i, stitch in enumerate(stitch_group.stitches):
-                if not shgeo.Point(stitch).within(pattern):
+            for stitch, stitch_inside in zip(stitch_group.stitches, inside.tolist()):
+                if not stitch_inside:
                     # keep points outside the fill pattern
                     stitch_group_points.append(stitch)
-                elif i - 1 < 0 or i >= len(stitch_group.stitches) - 1:
-                    # keep start and end points
-                    stitch_group_points.append(stitch)
                 elif stitch.has_tag('fill_row_start') or stitch.has_tag('fill_row_end'):
                     # keep points if they are the start or end of a fill stitch row
                     stitch_group_points.append(stitch)
@@ -65,14 +75,34 @@ def _apply_fill_patterns(patterns, stitch_groups):
             stitch_group.stitches = stitch_group_points
 
 
-def _get_pattern_points(first, second, pattern):
-    points = []
-    intersection = shgeo.LineString([first, second]).intersection(pattern)
-    if isinstance(intersection, shgeo.Point):
-        points.append(Point(intersection.x, intersection.y))
-    if isinstance(intersection, shgeo.MultiPoint):
-        for point in intersection.geoms:
-            points.append(Point(point.x, point.y))
-    # sort points after their distance to first
-    points.sort(key=lambda point: point.distance(first))
+def _get_pattern_points(stitches, pattern):
+    """Find where each stitch crosses the pattern.
+
+    Returns a dict mapping the index of a stitch to the points where the
+    line to the next stitch crosses the pattern, sorted by their distance to
+    the stitch.  Stitches without intersections are left out.
+    """
+
+    coords = np.array([(stitch.x, stitch.y) for stitch in stitches])
+    segments = shapely.linestrings(np.stack((coords[:-1], coords[1:]), axis=1))
+
+    # only compute the (much more expensive) intersections for those
+    # segments that actually touch the pattern
+    indices = np.flatnonzero(shapely.intersects(pattern, segments))
+    intersections = shapely.intersection(segments[indices], pattern)
+
+    points = {}
+    for i, intersection in zip(indices.tolist(), intersections):
+        segment_points = []
+        if isinstance(intersection, shgeo.Point):
+            segment_points.append(Point(intersection.x, intersection.y))
+        if isinstance(intersection, shgeo.MultiPoint):
+            for point in intersection.geoms:
+                segment_points.append(Point(point.x, point.y))
+
+        if segment_points:
+            # sort points after their distance to first
+            segment_points.sort(key=lambda point: point.distance(stitches[i]))
+            points[i] = segment_points
+
     return points
@@ -3,39 +3,112 @@
 # Copyright (c) 2010 Authors
 # Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
 
+from collections.abc import Sequence
+from math import sqrt
 from typing import List
 
+import numpy as np
+
 from ..svg import PIXELS_PER_MM
 from ..threads import ThreadColor
 from ..utils.geometry import Point
 from .stitch import Stitch
 
+# Bits in ColorBlock's command flags array
+JUMP = 1
+TRIM = 2
+STOP = 4
+COLOR_CHANGE = 8
+
+TERMINATOR = TRIM | STOP | COLOR_CHANGE
+
 
 class ColorBlock(object):
-    """Holds a set of stitches, all with the same thread color."""
+    """Holds a set of stitches, all with the same thread color.
+
+    Large designs have hundreds of thousands of stitches, so we don't keep a
+    Stitch object for each of them.  Instead the stitches are stored in
+    columns:
+
+      * an Nx2 array of coordinates
+      * an array of command flags (JUMP, TRIM, STOP, COLOR_CHANGE)
+      * an array of minimum stitch lengths (NaN for None)
+      * ids into interned tables of tag sets and stitch colors
+
+    Stitch objects are only created when someone asks for them, e.g. by
+    iterating over the ColorBlock or through the stitches attribute.  These
+    are copies: changing them won't change the ColorBlock.
+    """
 
     def __init__(self, color=None, stitches=None):
         self.color = color
-        self.stitches = stitches or []
+        self._clear()
+
+        if stitches:
+            self.add_stitches(stitches)
+
+    def _clear(self, capacity=16):
+        self._length = 0
+        self._coordinates = np.empty((capacity, 2), dtype=np.float64)
+        self._flags = np.empty(capacity, dtype=np.uint8)
+        self._min_stitch_lengths = np.empty(capacity, dtype=np.float64)
+        self._tag_ids = np.empty(capacity, dtype=np.uint32)
+        self._color_ids = np.empty(capacity, dtype=np.uint32)
+
+        self._tag_sets = []
+        self._tag_set_ids = {}
+        self._stitch_colors = []
+        self._stitch_color_ids = {}
 
     def __iter__(self):
-        return iter(self.stitches)
+        stitch_colors = self._stitch_colors
+        tag_sets = self._tag_sets
+        coordinates = self.coordinates.tolist()
+        flags = self.flags.tolist()
+        min_stitch_lengths = self.min_stitch_lengths.tolist()
+        tag_ids = self._tag_ids[:self._length].tolist()
+        color_ids = self._color_ids[:self._length].tolist()
+
+        for i in range(self._length):
+            yield _make_stitch(coordinates[i], flags[i], min_stitch_lengths[i], tag_sets[tag_ids[i]], stitch_colors[color_ids[i]])
+
+    def __reversed__(self):
+        for i in range(self._length - 1, -1, -1):
+            yield self._get_stitch(i)
 
     def __len__(self):
-        return len(self.stitches)
+        return self._length
 
     def __repr__(self):
-        return "ColorBlock(%s, %s)" % (self.color, self.stitches)
+        return "ColorBlock(%s, %s)" % (self.color, list(self))
 
     def __getitem__(self, item):
-        return self.stitches[item]
+        if isinstance(item, slice):
+            return [self._get_stitch(i) for i in range(*item.indices(self._length))]
+        else:
+            return self._get_stitch(self._normalize_index(item))
 
     def __delitem__(self, item):
-        del self.stitches[item]
+        if isinstance(item, slice):
+            keep = np.ones(self._length, dtype=bool)
+            keep[item] = False
+        else:
+            keep = np.ones(self._length, dtype=bool)
+            keep[self._normalize_index(item)] = False
+
+        self._apply_mask(keep)
 
     def __json__(self):
         return dict(color=self.color, stitches=self.stitches)
 
+    def __getstate__(self):
+        # Don't pickle the unused capacity at the end of the arrays.
+        state = dict(vars(self))
+        for name in ('_coordinates', '_flags', '_min_stitch_lengths', '_tag_ids', '_color_ids'):
+            state[name] = state[name][:self._length].copy()
+
+        return state
+
     def has_color(self):
         return self._color is not None
 
@@ -52,43 +125,71 @@ class ColorBlock(object):
         else:
             self._color = ThreadColor(value)
 
+    @property
+    def stitches(self):
+        """A read-only sequence of Stitch objects for this ColorBlock."""
+        return ColorBlockStitches(self)
+
+    @stitches.setter
+    def stitches(self, stitches):
+        self.replace_stitches(stitches)
+
+    @property
+    def coordinates(self):
+        """An Nx2 array of the stitch coordinates.  Treat as read-only."""
+        return self._coordinates[:self._length]
+
+    @property
+    def flags(self):
+        """An array of command flags (JUMP, TRIM, STOP, COLOR_CHANGE).  Treat as read-only."""
+        return self._flags[:self._length]
+
+    @property
+    def min_stitch_lengths(self):
+        """An array of each stitch's minimum stitch length, NaN if not set.  Treat as read-only."""
+        return self._min_stitch_lengths[:self._length]
+
+    def has_tag(self, tag):
+        """Return a boolean array that is True for each stitch tagged with tag."""
+        tagged_ids = [tag_id for tag_id, tag_set in enumerate(self._tag_sets) if tag in tag_set]
+        return np.isin(self._tag_ids[:self._length], tagged_ids)
+
     @property
     def last_stitch(self):
-        if self.stitches:
-            return self.stitches[-1]
+        if self._length:
+            return self._get_stitch(self._length - 1)
         else:
             return None
 
     @property
     def num_stitches(self):
         """Number of stitches in this color block."""
-        return len(self.stitches)
+        return self._length
 
     @property
     def estimated_thread(self):
-        previous_stitch = self.stitches[0]
-        length = 0
-        for stitch in self.stitches[1:]:
-            length += (stitch - previous_stitch).length()
-            previous_stitch = stitch
-        return length
+        if self._length < 2:
+            return 0.0
+
+        deltas = np.diff(self.coordinates, axis=0)
+        return float(np.sqrt(np.sum(deltas * deltas, axis=1)).sum())
 
     @property
     def num_trims(self):
         """Number of trims in this color block."""
 
-        return sum(1 for stitch in self if stitch.trim)
+        return int(np.count_nonzero(self.flags & TRIM))
 
     @property
     def num_jumps(self):
         """Number of jumps in this color block."""
 
-        return sum(1 for stitch in self if stitch.jump)
+        return int(np.count_nonzero(self.flags & JUMP))
 
     @property
     def stop_after(self):
-        if self.last_stitch is not None:
-            return self.last_stitch.stop
+        if self._length:
+            return bool(self._flags[self._length - 1] & STOP)
         else:
             return False
 
@@ -96,10 +197,10 @@ class ColorBlock(object):
     def trim_after(self):
         # If there's a STOP, it will be at the end.  We still want to return
         # True.
-        for stitch in reversed(self.stitches):
-            if stitch.stop or stitch.jump:
+        for flags in reversed(self.flags.tolist()):
+            if flags & (STOP | JUMP):
                 continue
-            elif stitch.trim:
+            elif flags & TRIM:
                 return True
             else:
                 break
@@ -107,47 +208,93 @@ class ColorBlock(object):
         return False
 
     def filter_duplicate_stitches(self, min_stitch_len=0.1):
-        if not self.stitches:
+        if not self._length:
             return
 
         if min_stitch_len is None:
             min_stitch_len = 0.1
         min_stitch_len *= PIXELS_PER_MM
 
-        stitches = [self.stitches[0]]
-        for stitch in self.stitches[1:]:
-            if stitches[-1].jump or stitch.stop or stitch.trim or stitch.color_change:
-                # Don't consider jumps, stops, color changes, or trims as candidates for filtering
-                pass
-            elif 'lock_stitch' in stitch.tags:
-                # do not filter specific stitches
-                pass
-            else:
-                length = (stitch - stitches[-1]).length()
-                min_length = stitch.min_stitch_length or min_stitch_len
-                if length <= min_length:
-                    # duplicate stitch, skip this one
-                    continue
+        flags = self.flags
+        min_lengths = self.min_stitch_lengths
+        min_lengths = np.where(np.isnan(min_lengths) | (min_lengths == 0), min_stitch_len, min_lengths)
+
+        # Jumps, stops, color changes, trims and lock stitches are never
+        # candidates for filtering.
+        protected = (flags & TERMINATOR).astype(bool) | self.has_tag('lock_stitch')
+        follows_jump = np.zeros(self._length, dtype=bool)
+        follows_jump[1:] = (flags[:-1] & JUMP).astype(bool)
+
+        # A stitch is a duplicate if it is too close to the last stitch we
+        # kept.  As long as nothing has been removed, that's simply the
+        # previous stitch, so we can check all of them at once.
+        deltas = np.diff(self.coordinates, axis=0)
+        lengths = np.sqrt(np.sum(deltas * deltas, axis=1))
+        too_short = np.zeros(self._length, dtype=bool)
+        too_short[1:] = lengths <= min_lengths[1:]
+        candidates = np.flatnonzero(too_short & ~protected & ~follows_jump)
+
+        if not len(candidates):
+            return
+
+        # Once we remove a stitch, the next ones have to be compared to an
+        # earlier stitch.  Walk through them one by one until we keep a stitch,
+        # then skip ahead to the next candidate.
+        keep = np.ones(self._length, dtype=bool)
+        coordinates = self.coordinates.tolist()
+        jumps = (flags & JUMP).astype(bool).tolist()
+        protected = protected.tolist()
+        min_lengths = min_lengths.tolist()
+        candidates = candidates.tolist()
+
+        next_candidate = 0
+        while next_candidate < len(candidates):
+            i = candidates[next_candidate]
+            last_kept = i - 1
+
+            while i < self._length:
+                if not jumps[last_kept] and not protected[i]:
+                    dx = coordinates[i][0] - coordinates[last_kept][0]
+                    dy = coordinates[i][1] - coordinates[last_kept][1]
+                    if sqrt(dx * dx + dy * dy) <= min_lengths[i]:
+                        keep[i] = False
+                        i += 1
+                        continue
+
+                last_kept = i
+                break
 
-            stitches.append(stitch)
+            while next_candidate < len(candidates) and candidates[next_candidate] <= i:
+                next_candidate += 1
 
-        self.stitches = stitches
+        self._apply_mask(keep)
 
     def add_stitch(self, *args, **kwargs):
         if not args:
             # They're adding a command, e.g. `color_block.add_stitch(stop=True)``.
             # Use the position from the last stitch.
-            if self.last_stitch:
-                args = (self.last_stitch.x, self.last_stitch.y)
+            if self._length:
+                x, y = self._coordinates[self._length - 1]
+                self._append_stitch(Stitch(float(x), float(y), **kwargs))
             else:
                 raise ValueError("internal error: can't add a command to an empty stitch block")
-            self.stitches.append(Stitch(*args, **kwargs))
-        if isinstance(args[0], Stitch):
-            self.stitches.append(Stitch(*args, **kwargs))
+        elif isinstance(args[0], Stitch):
+            if len(args) == 1 and not kwargs:
+                self._append_stitch(args[0])
+            else:
+                self._append_stitch(Stitch(*args, **kwargs))
         elif isinstance(args[0], Point):
-            self.stitches.append(Stitch(args[0].x, args[0].y, *args[1:], **kwargs))
+            self._append_stitch(Stitch(args[0].x, args[0].y, *args[1:], **kwargs))
+        else:
+            self._append_stitch(Stitch(*args, **kwargs))
 
     def add_stitches(self, stitches, *args, **kwargs):
+        if not args and not kwargs:
+            stitches = list(stitches)
+            if all(isinstance(stitch, Stitch) for stitch in stitches):
+                self._append_stitches(stitches)
+                return
+
         for stitch in stitches:
             if isinstance(stitch, (Stitch, Point)):
                 self.add_stitch(stitch, *args, **kwargs)
@@ -155,30 +302,172 @@ class ColorBlock(object):
                 self.add_stitch(*stitch, *args, **kwargs)
 
     def replace_stitches(self, stitches):
-        self.stitches = stitches
+        self._clear()
+        self.add_stitches(stitches)
 
     @property
     def bounding_box(self):
-        minx = min(stitch.x for stitch in self)
-        miny = min(stitch.y for stitch in self)
-        maxx = max(stitch.x for stitch in self)
-        maxy = max(stitch.y for stitch in self)
+        minx, miny = self.coordinates.min(axis=0).tolist()
+        maxx, maxy = self.coordinates.max(axis=0).tolist()
 
         return minx, miny, maxx, maxy
 
     def make_offsets(self, offsets: List[Point]):
-        first_final_stitch = len(self.stitches)
-        while (first_final_stitch > 0 and self.stitches[first_final_stitch-1].is_terminator):
+        first_final_stitch = self._length
+        while (first_final_stitch > 0 and self._flags[first_final_stitch - 1] & TERMINATOR):
             first_final_stitch -= 1
         if first_final_stitch == 0:
             return self
-        final_stitches = self.stitches[first_final_stitch:]
-        block_stitches = self.stitches[:first_final_stitch]
 
         out = ColorBlock(self.color)
         for i, offset in enumerate(offsets):
-            out.add_stitches([s.offset(offset) for s in block_stitches])
+            out._extend(self, 0, first_final_stitch, offset=(offset.x, offset.y))
             if i != len(offsets) - 1:
                 out.add_stitch(trim=True)
-        out.add_stitches(final_stitches)
+        out._extend(self, first_final_stitch, self._length)
         return out
+
+    def _normalize_index(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("ColorBlock index out of range")
+        return index
+
+    def _get_stitch(self, index):
+        return _make_stitch(self._coordinates[index].tolist(),
+                            int(self._flags[index]),
+                            float(self._min_stitch_lengths[index]),
+                            self._tag_sets[self._tag_ids[index]],
+                            self._stitch_colors[self._color_ids[index]])
+
+    def _reserve(self, count):
+        capacity = len(self._flags)
+        if self._length + count <= capacity:
+            return
+
+        capacity = max(capacity * 2, self._length + count)
+        for name in ('_coordinates', '_flags', '_min_stitch_lengths', '_tag_ids', '_color_ids'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._length] = old[:self._length]
+            setattr(self, name, new)
+
+    def _intern_tags(self, tags):
+        tags = frozenset(tags)
+        tag_id = self._tag_set_ids.get(tags)
+        if tag_id is None:
+            tag_id = self._tag_set_ids[tags] = len(self._tag_sets)
+            self._tag_sets.append(tags)
+        return tag_id
+
+    def _intern_stitch_color(self, color):
+        # Thread colors compare equal to other kinds of colors (and even None)
+        # so we intern them by identity.
+        color_id = self._stitch_color_ids.get(id(color))
+        if color_id is None:
+            color_id = self._stitch_color_ids[id(color)] = len(self._stitch_colors)
+            self._stitch_colors.append(color)
+        return color_id
+
+    def _append_stitch(self, stitch):
+        self._reserve(1)
+        i = self._length
+
+        self._coordinates[i] = (stitch.x, stitch.y)
+        self._flags[i] = ((JUMP if stitch.jump else 0) |
+                          (TRIM if stitch.trim else 0) |
+                          (STOP if stitch.stop else 0) |
+                          (COLOR_CHANGE if stitch.color_change else 0))
+        self._min_stitch_lengths[i] = np.nan if stitch.min_stitch_length is None else stitch.min_stitch_length
+        self._tag_ids[i] = self._intern_tags(stitch.tags)
+        self._color_ids[i] = self._intern_stitch_color(stitch.color)
+
+        self._length += 1
+
+    def _append_stitches(self, stitches):
+        count = len(stitches)
+        if count == 0:
+            return
+
+        self._reserve(count)
+        new = slice(self._length, self._length + count)
+
+        self._coordinates[new] = [(stitch.x, stitch.y) for stitch in stitches]
+        self._flags[new] = [((JUMP if stitch.jump else 0) |
+                             (TRIM if stitch.trim else 0) |
+                             (STOP if stitch.stop else 0) |
+                             (COLOR_CHANGE if stitch.color_change else 0)) for stitch in stitches]
+        self._min_stitch_lengths[new] = [np.nan if stitch.min_stitch_length is None else stitch.min_stitch_length
+                                         for stitch in stitches]
+        self._tag_ids[new] = [self._intern_tags(stitch.tags) for stitch in stitches]
+        self._color_ids[new] = [self._intern_stitch_color(stitch.color) for stitch in stitches]
+
+        self._length += count
+
+    def _extend(self, other, start, end, offset=None):
+        """Append stitches start through end - 1 of another ColorBlock."""
+
+        count = end - start
+        self._reserve(count)
+        new = slice(self._length, self._length + count)
+
+        self._coordinates[new] = other._coordinates[start:end]
+        if offset is not None:
+            self._coordinates[new] += offset
+        self._flags[new] = other._flags[start:end]
+        self._min_stitch_lengths[new] = other._min_stitch_lengths[start:end]
+
+        tag_ids = np.array([self._intern_tags(tag_set) for tag_set in other._tag_sets], dtype=np.uint32)
+        self._tag_ids[new] = tag_ids[other._tag_ids[start:end]]
+        color_ids = np.array([self._intern_stitch_color(color) for color in other._stitch_colors], dtype=np.uint32)
+        self._color_ids[new] = color_ids[other._color_ids[start:end]]
+
+        self._length += count
+
+    def _apply_mask(self, keep):
+        count = int(np.count_nonzero(keep))
+        for name in ('_coordinates', '_flags', '_min_stitch_lengths', '_tag_ids', '_color_ids'):
+            column = getattr(self, name)
+            column[:count] = column[:self._length][keep]
+        self._length = count
+
+
+class ColorBlockStitches(Sequence):
+    """A read-only list-like view of the stitches in a ColorBlock."""
+
+    def __init__(self, color_block):
+        self.color_block = color_block
+
+    def __len__(self):
+        return len(self.color_block)
+
+    def __getitem__(self, item):
+        return self.color_block[item]
+
+    def __iter__(self):
+        return iter(self.color_block)
+
+    def __reversed__(self):
+        return reversed(self.color_block)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __json__(self):
+        return list(self)
+
+
+def _make_stitch(coordinates, flags, min_stitch_length, tags, color):
+    # This is much faster than going through Stitch.__init__().
+    stitch = Stitch.__new__(Stitch)
+    stitch.x, stitch.y = coordinates
+    stitch.color = color
+    stitch.jump = bool(flags & JUMP)
+    stitch.trim = bool(flags & TRIM)
+    stitch.stop = bool(flags & STOP)
+    stitch.color_change = bool(flags & COLOR_CHANGE)
+    stitch.min_stitch_length = None if min_stitch_length != min_stitch_length else min_stitch_length
+    stitch.tags = set(tags)
+
+    return stitch
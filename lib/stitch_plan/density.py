@@ -0,0 +1,128 @@
+# Authors: see git history
+#
+# Copyright (c) 2024 Authors
+# Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
+
+import struct
+import zlib
+
+import numpy as np
+from scipy.spatial import KDTree
+
+# density levels of a stitch
+GREEN = 0
+YELLOW = 1
+RED = 2
+
+# RGBA colors of the density levels in the heatmap
+HEATMAP_COLORS = np.array([[0, 128, 0, 160], [255, 255, 0, 192], [255, 0, 0, 224]], dtype=np.uint8)
+
+
+class StitchDensity(object):
+    """Stitch density analysis of a stitch plan.
+
+    The density of a stitch is the number of stitches (including itself)
+    within a given radius.  Neighbors are only counted, never collected, so
+    this scales to designs with hundreds of thousands of stitches.
+
+    All coordinates and distances are in pixels.
+    """
+
+    def __init__(self, stitch_plan):
+        self.coords = np.concatenate([color_block.coordinates for color_block in stitch_plan] + [np.zeros((0, 2))])
+        self._tree = None
+        self._neighbor_counts = {}
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = KDTree(self.coords)
+        return self._tree
+
+    def neighbor_counts(self, radius):
+        """Return the number of stitches within radius of every stitch."""
+
+        if radius not in self._neighbor_counts:
+            if len(self.coords) == 0:
+                counts = np.zeros(0, dtype=int)
+            else:
+                counts = np.asarray(self.tree.query_ball_point(self.coords, radius, return_length=True))
+            self._neighbor_counts[radius] = counts
+
+        return self._neighbor_counts[radius]
+
+    def levels(self, density_options):
+        """Classify every stitch as GREEN, YELLOW or RED.
+
+        density_options is a list of two dicts with the keys max_neighbors and
+        radius (in pixels), for red and yellow respectively.
+        """
+
+        red, yellow = density_options
+        levels = np.full(len(self.coords), GREEN, dtype=np.int8)
+        levels[self.neighbor_counts(yellow['radius']) >= yellow['max_neighbors']] = YELLOW
+        levels[self.neighbor_counts(red['radius']) >= red['max_neighbors']] = RED
+        return levels
+
+    def histogram(self, radius):
+        """Return how many stitches have 1, 2, 3, ... neighbors within radius.
+
+        Element i of the returned list is the number of stitches with
+        i + 1 stitches (including themselves) within the radius.
+        """
+
+        counts = self.neighbor_counts(radius)
+        if len(counts) == 0:
+            return []
+        return np.bincount(counts)[1:].tolist()
+
+    def grid(self, cell_size, levels):
+        """Aggregate stitch levels on a square grid.
+
+        Returns a tuple (cells, origin).  cells is a 2D array (rows, columns)
+        holding the highest level of the stitches in each cell, or -1 for
+        cells without stitches.  origin is the top left corner of the grid.
+        """
+
+        if len(self.coords) == 0:
+            return np.full((0, 0), -1, dtype=np.int8), (0.0, 0.0)
+
+        origin = self.coords.min(axis=0)
+        columns, rows = (np.floor((self.coords - origin) / cell_size)).astype(int).T
+        cells = np.full((rows.max() + 1, columns.max() + 1), -1, dtype=np.int8)
+        np.maximum.at(cells, (rows, columns), levels)
+
+        return cells, (float(origin[0]), float(origin[1]))
+
+
+def cells_to_path_data(cells, origin, cell_size, level):
+    """Return SVG path data with a square for each grid cell of this level."""
+
+    rows, columns = np.nonzero(cells == level)
+    xs = origin[0] + columns * cell_size
+    ys = origin[1] + rows * cell_size
+    return " ".join("M %s,%s h %s v %s h -%s z" % (x, y, cell_size, cell_size, cell_size) for x, y in zip(xs.tolist(), ys.tolist()))
+
+
+def cells_to_png(cells):
+    """Render grid cells as a PNG image with one pixel per cell."""
+
+    height, width = cells.shape
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    occupied = cells >= 0
+    pixels[occupied] = HEATMAP_COLORS[cells[occupied]]
+
+    # each row of a PNG image starts with its filter type (0 = none)
+    raw = np.concatenate((np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, width * 4)), axis=1)
+
+    return (b'\x89PNG\r\n\x1a\n' +
+            _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) +
+            _png_chunk(b'IDAT', zlib.compress(raw.tobytes())) +
+            _png_chunk(b'IEND', b''))
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
@@ -6,10 +6,15 @@
 # -*- coding: UTF-8 -*-
 
 import math
-from itertools import chain, groupby
+from heapq import heappop, heappush
+from itertools import chain, count, groupby, islice
 from typing import Iterator
+from weakref import WeakKeyDictionary
 
 import networkx
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
 from shapely import geometry as shgeo
 from shapely import segmentize
 from shapely.ops import snap
@@ -114,14 +119,24 @@ def which_outline(shape, coords):
     outlines of the holes.
     """
 
+    return which_outlines(shape, [coords])[0]
+
+
+def which_outlines(shape, coords_list):
+    """return the outline index for each of the points (see which_outline())"""
+
     # I'd use an intersection check, but floating point errors make it
     # fail sometimes.
 
-    point = shgeo.Point(*coords)
-    outlines, outline_indices = get_shape_outlines_and_indices(shape)
-    closest = min(outline_indices,
-                  key=lambda index: outlines[index].distance(point))
-    return closest
+    points = shapely.points(np.array(coords_list, dtype=float).reshape(-1, 2))
+    outline_tree = get_shape_outline_tree(shape)
+
+    # When a point is equally close to several outlines, pick the first one.
+    point_indices, outline_indices = outline_tree.query_nearest(points, all_matches=True)
+    closest = np.full(len(points), np.iinfo(np.int64).max)
+    np.minimum.at(closest, point_indices, outline_indices)
+
+    return closest.tolist()
 
 
 @cache
@@ -131,6 +146,12 @@ def get_shape_outlines_and_indices(shape):
     return outlines, outline_indices
 
 
+@cache
+def get_shape_outline_tree(shape):
+    outlines, outline_indices = get_shape_outlines_and_indices(shape)
+    return shapely.STRtree(list(outlines))
+
+
 def project(shape, coords, outline_index):
     """project the point onto the specified outline
 
@@ -217,7 +238,7 @@ def insert_node(graph, shape, point):
             edges.append(((start, end), data))
 
     if len(edges) > 0:
-        edge, data = min(edges, key=lambda edge_data: shgeo.LineString(edge_data[0]).distance(projected_point))
+        edge, data = nearest_edge(edges, projected_point)
         graph.remove_edge(*edge, key="outline")
         graph.add_edge(edge[0], node, key="outline", **data)
         graph.add_edge(node, edge[1], key="outline", **data)
@@ -228,7 +249,7 @@ def insert_node(graph, shape, point):
         for start, end, key, data in graph.edges(keys=True, data=True):
             if key == "outline":
                 edges.append(((start, end), data))
-        edge, data = min(edges, key=lambda edge_data: shgeo.LineString(edge_data[0]).distance(projected_point))
+        edge, data = nearest_edge(edges, projected_point)
         line_segment = shgeo.LineString([edge[0], node])
         if line_segment.length > 10:
             line_segment = segmentize(line_segment, 10)
@@ -238,14 +259,32 @@ def insert_node(graph, shape, point):
     tag_nodes_with_outline_and_projection(graph, shape, nodes=[node])
 
 
+def nearest_edge(edges, point):
+    """Find the (edge, data) tuple whose edge is closest to the point.
+
+    Ties go to the first edge in the list.
+    """
+
+    lines = shapely.linestrings(np.array([edge for edge, data in edges], dtype=float))
+    distances = shapely.distance(lines, point)
+
+    return edges[int(np.argmin(distances))]
+
+
 def tag_nodes_with_outline_and_projection(graph, shape, nodes):
-    for node in nodes:
-        outline_index = which_outline(shape, node)
-        outline_projection = project(shape, node, outline_index)
+    nodes = list(nodes)
+    if not nodes:
+        return
 
-        graph.add_node(node, outline=outline_index, projection=outline_projection)
+    outline_indices = which_outlines(shape, nodes)
+    outlines, _ = get_shape_outlines_and_indices(shape)
+    points = shapely.points(np.array(nodes, dtype=float))
+    projections = shapely.line_locate_point(np.array(list(outlines), dtype=object)[outline_indices], points).tolist()
 
-        check_stop_flag()
+    check_stop_flag()
+
+    for node, outline_index, outline_projection in zip(nodes, outline_indices, projections):
+        graph.add_node(node, outline=outline_index, projection=outline_projection)
 
 
 def add_boundary_travel_nodes(graph, shape):
@@ -386,6 +425,7 @@ def build_travel_graph(fill_stitch_graph, shape, fill_stitch_angle, underpath):
         process_travel_edges(graph, fill_stitch_graph, shape, travel_edges)
 
     debug.log_graph(graph, "travel graph")
+    reset_travel_router(graph)
 
     return graph
 
@@ -529,11 +569,103 @@ def build_travel_edges(shape, fill_angle):
     return endpoints, chain(diagonal_edges.geoms, vertical_edges.geoms)
 
 
+class NodeIndex(object):
+    """A KD-tree over node coordinates for fast nearest node lookups.
+
+    Nodes added after the tree was built are kept in a short list and checked
+    separately, until there are enough of them to make rebuilding the tree
+    worthwhile.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self.extra_nodes = []
+
+        if self.nodes:
+            self.tree = cKDTree(np.array(self.nodes, dtype=float))
+        else:
+            self.tree = None
+
+    def __len__(self):
+        return len(self.nodes) + len(self.extra_nodes)
+
+    def add_nodes(self, nodes):
+        self.extra_nodes.extend(nodes)
+
+        if len(self.extra_nodes) > max(32, len(self.nodes) // 8):
+            self.__init__(self.nodes + self.extra_nodes)
+
+    def nearest(self, point):
+        """Return the node closest to point.
+
+        Ties go to the node that was added first, just like min() would do
+        on the list of nodes.
+        """
+
+        if len(self) == 0:
+            raise ValueError("no nodes to search")
+
+        point = tuple(point)
+
+        candidates = []
+        if self.tree is not None:
+            # The tree's distances may be off in the last bit compared to
+            # shapely's, so we take everything that's about as close as the
+            # nearest node and let shapely decide.
+            distance, index = self.tree.query(point)
+            nearby = self.tree.query_ball_point(point, distance * (1 + 1e-9) + 1e-9)
+            candidates.extend(self.nodes[index] for index in sorted(nearby))
+        candidates.extend(self.extra_nodes)
+
+        point = shgeo.Point(*point)
+        return min(candidates, key=lambda node: shgeo.Point(*node).distance(point))
+
+
+# graph -> NodeIndex.  This is keyed on the graph object itself, so copies of
+# a graph don't share the index.
+_node_indices = WeakKeyDictionary()
+
+
+def get_node_index(graph):
+    """Get the NodeIndex for a graph, creating or updating it as necessary.
+
+    networkx keeps nodes in insertion order, so nodes added since the index
+    was built are at the end and can be added to the index incrementally.
+    The index is rebuilt if the graph has fewer nodes than the index.
+    """
+
+    node_index = _node_indices.get(graph)
+
+    if node_index is None or len(node_index) > len(graph):
+        node_index = _node_indices[graph] = NodeIndex(graph)
+    elif len(node_index) < len(graph):
+        node_index.add_nodes(islice(graph, len(node_index), None))
+
+    return node_index
+
+
 def nearest_node(nodes, point, attr=None):
-    point = shgeo.Point(*point)
-    nearest = min(nodes, key=lambda node: shgeo.Point(*node).distance(point))
+    """Find the node closest to point.
 
-    return nearest
+    nodes may be a graph or a list of nodes.  If attr is given, only graph
+    nodes that have that attribute are considered.
+    """
+
+    if isinstance(nodes, networkx.Graph) and attr is None:
+        node = get_node_index(nodes).nearest(point)
+        if node not in nodes:
+            # Nodes were removed and others added since the index was built.
+            node_index = _node_indices[nodes] = NodeIndex(nodes)
+            node = node_index.nearest(point)
+
+        return node
+
+    if isinstance(nodes, networkx.Graph):
+        nodes = [node for node, value in nodes.nodes(data=attr) if value is not None]
+
+    # For a single query, building a KD-tree costs more than it saves.
+    point = shgeo.Point(*point)
+    return min(nodes, key=lambda node: shgeo.Point(*node).distance(point))
 
 
 @debug.time
@@ -559,11 +691,11 @@ def find_stitch_path(graph, travel_graph, starting_point=None, ending_point=None
     the order of most-recently-visited first.
     """
 
-    graph = graph.copy()
-
     if not starting_point:
         starting_point = list(graph.nodes.keys())[0]
 
+    # Look these up before copying the graph, so that we can use its
+    # NodeIndex.
     starting_node = nearest_node(graph, starting_point)
 
     if ending_point:
@@ -572,6 +704,8 @@ def find_stitch_path(graph, travel_graph, starting_point=None, ending_point=None
         ending_point = starting_point
         ending_node = starting_node
 
+    graph = graph.copy()
+
     # The algorithm below is adapted from networkx.eulerian_circuit().
     path = []
     vertex_stack = [(ending_node, None)]
@@ -615,8 +749,7 @@ def find_stitch_path(graph, travel_graph, starting_point=None, ending_point=None
     # relevant in the case that the user specifies an underlay with an inset
     # value, because the starting point (and possibly ending point) can be
     # inside the shape.
-    outline_nodes = [node for node, outline in travel_graph.nodes(data="outline") if outline is not None]
-    real_end = nearest_node(outline_nodes, ending_point)
+    real_end = nearest_node(travel_graph, ending_point, attr="outline")
     path.append(PathEdge((ending_node, real_end), key="outline"))
 
     check_stop_flag()
@@ -682,11 +815,193 @@ def collapse_sequential_outline_edges(path, graph):
     return new_path
 
 
+class TravelRouter:
+    """Find shortest paths through a travel graph.
+
+    The graph is converted once into compact CSR-style adjacency lists: the
+    neighbors of node i are indices[indptr[i]:indptr[i + 1]], and the
+    weights list holds the weight of each of these entries.  Parallel edges
+    are merged into one entry with the smallest weight, and an entry whose
+    edges have all been removed has a weight of None.
+
+    The search is the same bidirectional Dijkstra that
+    networkx.shortest_path() runs.  It visits neighbors in the same order and
+    breaks ties the same way, so it finds exactly the same paths.  That
+    matters, because travel graphs without underpathing aren't weighted at
+    all and have lots of paths of equal length.  It just doesn't have to look
+    up edge data dicts and call a weight function for every edge.
+    """
+
+    def __init__(self, graph):
+        self.nodes = list(graph)
+        self.node_indices = {node: index for index, node in enumerate(self.nodes)}
+
+        self.indptr = [0]
+        self.indices = []
+        self.weights = []
+
+        # (node index, node index) -> position in indices
+        self.positions = {}
+
+        # (node index, node index) -> {edge key: weight}, shared by both
+        # directions of an edge
+        self.parallel_edges = {}
+
+        for node, neighbors in graph.adjacency():
+            node_index = self.node_indices[node]
+
+            for neighbor, edges in neighbors.items():
+                neighbor_index = self.node_indices[neighbor]
+
+                edge_weights = self.parallel_edges.get((neighbor_index, node_index))
+                if edge_weights is None:
+                    edge_weights = {key: data.get('weight', 1) for key, data in edges.items()}
+                self.parallel_edges[node_index, neighbor_index] = edge_weights
+
+                self.positions[node_index, neighbor_index] = len(self.indices)
+                self.indices.append(neighbor_index)
+                self.weights.append(min(edge_weights.values()))
+
+            self.indptr.append(len(self.indices))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def remove_edges(self, edges):
+        """Remove (start, end, key) edges, like graph.remove_edges_from() does."""
+
+        for start, end, key in edges:
+            start_index = self.node_indices.get(start)
+            end_index = self.node_indices.get(end)
+            edge_weights = self.parallel_edges.get((start_index, end_index))
+
+            if edge_weights is None or key not in edge_weights:
+                continue
+
+            del edge_weights[key]
+            weight = min(edge_weights.values()) if edge_weights else None
+            self.weights[self.positions[start_index, end_index]] = weight
+            self.weights[self.positions[end_index, start_index]] = weight
+
+    def shortest_path(self, start, end):
+        source = self._get_node_index(start)
+        target = self._get_node_index(end)
+
+        if source == target:
+            return [start]
+
+        indptr = self.indptr
+        indices = self.indices
+        weights = self.weights
+
+        # This is a bidirectional Dijkstra search, just like networkx's.
+        # Index 0 is the search forward from the source and index 1 is the
+        # search backward from the target.
+        distances = ({}, {})
+        predecessors = ({source: None}, {target: None})
+        seen = ({source: 0}, {target: 0})
+        counter = count()
+        fringes = ([(0, next(counter), source)], [(0, next(counter), target)])
+
+        shortest_distance = None
+        meeting_node = None
+        direction = 1
+
+        while fringes[0] and fringes[1]:
+            direction = 1 - direction
+            distance, _, node = heappop(fringes[direction])
+            if node in distances[direction]:
+                continue
+
+            distances[direction][node] = distance
+            if node in distances[1 - direction]:
+                return self._get_path(predecessors, meeting_node)
+
+            first = indptr[node]
+            last = indptr[node + 1]
+            for neighbor, weight in zip(indices[first:last], weights[first:last]):
+                if weight is None or neighbor in distances[direction]:
+                    continue
+
+                neighbor_distance = distance + weight
+                if neighbor not in seen[direction] or neighbor_distance < seen[direction][neighbor]:
+                    seen[direction][neighbor] = neighbor_distance
+                    heappush(fringes[direction], (neighbor_distance, next(counter), neighbor))
+                    predecessors[direction][neighbor] = node
+
+                    if neighbor in seen[1 - direction]:
+                        total_distance = neighbor_distance + seen[1 - direction][neighbor]
+                        if shortest_distance is None or shortest_distance > total_distance:
+                            shortest_distance = total_distance
+                            meeting_node = neighbor
+
+        raise networkx.NetworkXNoPath(f"No path between {start} and {end}.")
+
+    def _get_node_index(self, node):
+        try:
+            return self.node_indices[node]
+        except KeyError:
+            raise networkx.NodeNotFound(f"Node {node} not found in graph")
+
+    def _get_path(self, predecessors, meeting_node):
+        path = []
+        node = meeting_node
+        while node is not None:
+            path.append(node)
+            node = predecessors[0][node]
+        path.reverse()
+
+        node = predecessors[1][meeting_node]
+        while node is not None:
+            path.append(node)
+            node = predecessors[1][node]
+
+        return [self.nodes[index] for index in path]
+
+
+# travel graph -> TravelRouter
+_travel_routers = WeakKeyDictionary()
+
+
+def get_travel_router(travel_graph):
+    """Get the TravelRouter for a travel graph.
+
+    build_travel_graph() builds the router along with the graph.  Travel
+    graphs don't change after that, except for edges removed through
+    remove_travel_edges(), which keeps the router in sync.  A graph that
+    was changed some other way must be passed to reset_travel_router().
+    """
+
+    router = _travel_routers.get(travel_graph)
+
+    if router is None or len(router) != len(travel_graph):
+        router = reset_travel_router(travel_graph)
+
+    return router
+
+
+def reset_travel_router(travel_graph):
+    """Build a new TravelRouter for a travel graph that was changed."""
+
+    router = _travel_routers[travel_graph] = TravelRouter(travel_graph)
+    return router
+
+
+def remove_travel_edges(travel_graph, edges):
+    """Remove edges from the travel graph and its TravelRouter."""
+
+    travel_graph.remove_edges_from(edges)
+
+    router = _travel_routers.get(travel_graph)
+    if router is not None:
+        router.remove_edges(edges)
+
+
 def travel(shape, travel_graph, edge, running_stitch_length, running_stitch_tolerance, skip_last, underpath):
     """Create stitches to get from one point on an outline of the shape to another."""
 
     start, end = edge
-    path = networkx.shortest_path(travel_graph, start, end, weight='weight')
+    path = get_travel_router(travel_graph).shortest_path(start, end)
     if underpath and path != (start, end):
         path = smooth_path(path, 2)
     else:
@@ -730,7 +1045,7 @@ def path_to_stitches(shape, path, travel_graph, fill_stitch_graph, angle, row_sp
     for edge in path:
         if edge.is_segment():
             stitch_row(stitches, edge[0], edge[1], angle, row_spacing, max_stitch_length, staggers, skip_last)
-            travel_graph.remove_edges_from(fill_stitch_graph[edge[0]][edge[1]]['segment'].get('underpath_edges', []))
+            remove_travel_edges(travel_graph, fill_stitch_graph[edge[0]][edge[1]]['segment'].get('underpath_edges', []))
         else:
             stitches.extend(travel(shape, travel_graph, edge, running_stitch_length, running_stitch_tolerance, skip_last, underpath))
 
@@ -18,7 +18,7 @@ from ..svg import PIXELS_PER_MM, generate_unique_id, line_strings_to_csp
 from ..svg.tags import (INKSCAPE_LABEL, INKSTITCH_ATTRIBS, ORIGINAL_D,
                         PATH_EFFECT)
 from ..utils import Point as InkstitchPoint
-from ..utils import cache, cut
+from ..utils import cache, cut_multiple
 from ..utils.threading import check_stop_flag
 from .utils.autoroute import (add_elements_to_group, add_jumps,
                               create_new_group, find_path,
@@ -114,14 +114,8 @@ class SatinSegment(object):
 
     @property
     def center_line(self):
-        center_line = self.satin.center_line
-
-        if self.start < 1.0:
-            before, center_line = cut(center_line, self.start, normalized=True)
-
-        if self.end > 0.0:
-            center_line, after = cut(
-                center_line, (self.end - self.start) / (1.0 - self.start), normalized=True)
+        # cut at both ends in a single pass over the center line
+        before, center_line, after = cut_multiple(self.satin.center_line, [self.start, self.end], normalized=True)
 
         if self.reverse:
             center_line = shgeo.LineString(reversed(center_line.coords))
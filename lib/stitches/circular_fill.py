@@ -6,7 +6,8 @@ from ..stitch_plan import Stitch
 from ..utils.geometry import reverse_line_string
 from .auto_fill import (build_fill_stitch_graph, build_travel_graph,
                         collapse_sequential_outline_edges, fallback,
-                        find_stitch_path, graph_make_valid, travel)
+                        find_stitch_path, graph_make_valid,
+                        remove_travel_edges, travel)
 from .contour_fill import _make_fermat_spiral
 from .running_stitch import bean_stitch, running_stitch
 
@@ -145,7 +146,7 @@ def path_to_stitches(shape, path, travel_graph, fill_stitch_graph, running_stitc
 
             stitches.extend(new_stitches)
 
-            travel_graph.remove_edges_from(fill_stitch_graph[edge[0]][edge[1]]['segment'].get('underpath_edges', []))
+            remove_travel_edges(travel_graph, fill_stitch_graph[edge[0]][edge[1]]['segment'].get('underpath_edges', []))
         else:
             stitches.extend(travel(shape, travel_graph, edge, running_stitch_length, running_stitch_tolerance, skip_last, underpath))
 
@@ -3,7 +3,6 @@ from itertools import chain
 
 import networkx as nx
 import numpy as np
-import trimesh
 from shapely import offset_curve
 from shapely.geometry import (GeometryCollection, LineString, MultiPolygon,
                               Point, Polygon)
@@ -430,7 +429,44 @@ def _reorder_linear_ring(ring, start):
     return np.roll(ring, -start_index, axis=0)
 
 
-def _interpolate_linear_rings(ring1, ring2, max_stitch_length, start=None):
+def _resample_rings(rings, counts):
+    """Resample LinearRings to evenly spaced points along their length.
+
+    All rings are resampled at once: their coordinates are laid out one after
+    the other along a single arc length axis, with a gap between rings so that
+    no sample falls between two of them.
+
+    Arguments:
+        rings -- list of LinearRings
+        counts -- number of points to sample from each ring, including both
+                  the start and the (identical) end point
+
+    Return value: list of numpy arrays of shape (count, 2), one per ring
+    """
+
+    coords = [np.asarray(ring.coords)[:, :2] for ring in rings]
+    all_coords = np.concatenate(coords)
+
+    segment_lengths = np.linalg.norm(np.diff(all_coords, axis=0), axis=1)
+    ring_ends = np.cumsum([len(ring_coords) for ring_coords in coords])
+    segment_lengths[ring_ends[:-1] - 1] = 1.0
+    arc_lengths = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+
+    ring_starts = np.concatenate(([0], ring_ends[:-1]))
+    samples = np.concatenate([np.linspace(arc_lengths[start], arc_lengths[end - 1], count)
+                              for start, end, count in zip(ring_starts, ring_ends, counts)])
+
+    resampled = np.column_stack((np.interp(samples, arc_lengths, all_coords[:, 0]),
+                                 np.interp(samples, arc_lengths, all_coords[:, 1])))
+
+    return np.split(resampled, np.cumsum(counts)[:-1])
+
+
+def _num_interpolation_points(ring, max_stitch_length):
+    return int(20 * ring.length / max_stitch_length)
+
+
+def _interpolate_resampled_rings(ring1_resampled, ring2_resampled, start=None):
     """
     Interpolate between two LinearRings
 
@@ -441,30 +477,27 @@ def _interpolate_linear_rings(ring1, ring2, max_stitch_length, start=None):
     Inspired by interpolate() from https://github.com/mikedh/pocketing/blob/master/pocketing/polygons.py
 
     Arguments:
-        ring1 -- LinearRing start point will lie on
-        ring2 -- LinearRing end point will lie on
-        max_stitch_length -- maximum stitch length (used to calculate resampling accuracy)
+        ring1_resampled -- coordinates of the ring the start point will lie on,
+                           as returned by _resample_rings()
+        ring2_resampled -- coordinates of the ring the end point will lie on,
+                           with the same number of points as ring1_resampled
         start -- Point on ring1 to start at, as a tuple
 
     Return value: Path interpolated between two LinearRings, as a LineString.
     """
 
-    # Resample the two LinearRings so that they are the same number of points
-    # long.  Then take the corresponding points in each ring and interpolate
-    # between them, gradually going more toward ring2.
+    # The two rings have been resampled so that they are the same number of
+    # points long.  Now take the corresponding points in each ring and
+    # interpolate between them, gradually going more toward ring2.
     #
     # This is a little less accurate than the method in interpolate(), but several
     # orders of magnitude faster because we're not building and querying a KDTree.
 
-    num_points = int(20 * ring1.length / max_stitch_length)
-    ring1_resampled = trimesh.path.traversal.resample_path(np.array(ring1.coords), count=num_points)
-    ring2_resampled = trimesh.path.traversal.resample_path(np.array(ring2.coords), count=num_points)
-
     if start is not None:
         ring1_resampled = _reorder_linear_ring(ring1_resampled, start)
         ring2_resampled = _reorder_linear_ring(ring2_resampled, start)
 
-    weights = np.linspace(0.0, 1.0, num_points).reshape((-1, 1))
+    weights = np.linspace(0.0, 1.0, len(ring1_resampled)).reshape((-1, 1))
     points = (ring1_resampled * (1.0 - weights)) + (ring2_resampled * weights)
     result = LineString(points)
 
@@ -561,26 +594,62 @@ def _get_spiral_rings(tree):
 
 
 def _make_fermat_spiral(rings, stitch_length, starting_point):
-    forward = _make_spiral(rings[::2], stitch_length, starting_point)
-    back = _make_spiral(rings[1::2], stitch_length, starting_point)
+    # resample the rings of both directions in one go
+    forward_rings = rings[::2]
+    back_rings = rings[1::2]
+    forward_parts, back_parts = _interpolate_spiral_parts([forward_rings, back_rings], stitch_length, starting_point)
+
+    forward = _join_spiral_parts(forward_parts)
+    back = _join_spiral_parts(back_parts)
     back.reverse()
 
     return chain(forward, back)
 
 
 def _make_spiral(rings, stitch_length, starting_point):
-    path = []
-    spiral_part = None
+    parts, = _interpolate_spiral_parts([rings], stitch_length, starting_point)
+
+    return _join_spiral_parts(parts)
+
+
+def _interpolate_spiral_parts(spirals, stitch_length, starting_point):
+    """Interpolate between each pair of consecutive rings of several spirals.
+
+    Every ring is resampled with a single call to _resample_rings().
+
+    Return value: for each spiral, a list of LineStrings, one per ring pair
+    """
 
-    for ring1, ring2 in zip(rings[:-1], rings[1:]):
+    ring_pairs = [list(zip(rings[:-1], rings[1:])) for rings in spirals]
+    all_pairs = list(chain.from_iterable(ring_pairs))
+    if not all_pairs:
+        return [[] for rings in spirals]
+
+    counts = [_num_interpolation_points(ring1, stitch_length) for ring1, ring2 in all_pairs]
+    resampled = _resample_rings([ring1 for ring1, ring2 in all_pairs] + [ring2 for ring1, ring2 in all_pairs], counts + counts)
+
+    parts = []
+    for ring1_resampled, ring2_resampled in zip(resampled[:len(all_pairs)], resampled[len(all_pairs):]):
         check_stop_flag()
+        parts.append(_interpolate_resampled_rings(ring1_resampled, ring2_resampled, starting_point))
+
+    spiral_parts = []
+    for pairs in ring_pairs:
+        spiral_parts.append(parts[:len(pairs)])
+        parts = parts[len(pairs):]
+
+    return spiral_parts
+
+
+def _join_spiral_parts(spiral_parts):
+    path = []
 
-        spiral_part = _interpolate_linear_rings(ring1, ring2, stitch_length, starting_point)
+    for spiral_part in spiral_parts:
         # skip last to avoid duplicated points
         path.extend(spiral_part.coords[:-1])
 
-    if spiral_part:
+    if spiral_parts and not spiral_parts[-1].is_empty:
         # at the end add last point
-        path.append(spiral_part.coords[-1])
+        path.append(spiral_parts[-1].coords[-1])
 
     return path
@@ -5,6 +5,7 @@
 
 import math
 
+import numpy as np
 import shapely
 
 from ..stitch_plan import Stitch
@@ -140,41 +141,83 @@ def intersect_region_with_grating(shape, angle, row_spacing, end_row_spacing=Non
     # fill regions at the same angle and spacing always line up nicely.
     start -= (start + normal * center) % row_spacing
 
-    current_row_y = start
+    row_offsets = _get_row_offsets(start, end, height, row_spacing, end_row_spacing)
+
     rows = []
-    while current_row_y < end:
+    for chunk_start in range(0, len(row_offsets), GRATING_CHUNK_SIZE):
         check_stop_flag()
 
-        p0 = center + normal * current_row_y + direction * half_length
-        p1 = center + normal * current_row_y - direction * half_length
-        endpoints = [p0.as_tuple(), p1.as_tuple()]
-        grating_line = shapely.geometry.LineString(endpoints)
+        chunk = row_offsets[chunk_start:chunk_start + GRATING_CHUNK_SIZE]
+        for runs in _intersect_rows(shape, chunk, center, direction, normal, half_length):
+            if runs:
+                runs.sort(key=lambda seg: (InkstitchPoint(*seg[0]) - upper_left).length())
 
-        res = grating_line.intersection(shape)
+                if flip:
+                    runs.reverse()
+                    runs = [tuple(reversed(run)) for run in runs]
 
-        if res.geom_type in ["MultiLineString", "GeometryCollection"]:
-            runs = [line_string.coords for line_string in res.geoms if line_string.geom_type == "LineString"]
-        elif res.geom_type in ["Point", "MultiPoint"] or res.is_empty:
-            # ignore if we intersected at a single point or no points
-            runs = []
-        else:
-            runs = [res.coords]
+                rows.append(runs)
+
+    return rows
 
-        if runs:
-            runs.sort(key=lambda seg: (InkstitchPoint(*seg[0]) - upper_left).length())
 
-            if flip:
-                runs.reverse()
-                runs = [tuple(reversed(run)) for run in runs]
+# Number of grating lines intersected with the shape in one call.  Between
+# chunks we check whether the user cancelled.
+GRATING_CHUNK_SIZE = 1000
 
-            rows.append(runs)
+
+def _get_row_offsets(start, end, height, row_spacing, end_row_spacing):
+    current_row_y = start
+    row_offsets = []
+    while current_row_y < end:
+        row_offsets.append(current_row_y)
 
         if end_row_spacing:
             current_row_y += row_spacing + (end_row_spacing - row_spacing) * ((current_row_y - start) / height)
         else:
             current_row_y += row_spacing
 
-        check_stop_flag()
+    return np.array(row_offsets)
+
+
+def _intersect_rows(shape, row_offsets, center, direction, normal, half_length):
+    """Intersect a batch of grating lines with the shape.
+
+    Each grating line runs through the center of the shape shifted by its row
+    offset along the normal, extending half_length in both directions.  All
+    lines are built as one array of LineStrings and intersected with the
+    shape in a single vectorized call.
+
+    Returns a list with the runs (tuples of coordinates) for each row.
+    """
+
+    # same order of operations as Point arithmetic so that we get the same results
+    row_x = center.x + normal.x * row_offsets
+    row_y = center.y + normal.y * row_offsets
+    coordinates = np.empty((len(row_offsets), 2, 2))
+    coordinates[:, 0, 0] = row_x + direction.x * half_length
+    coordinates[:, 0, 1] = row_y + direction.y * half_length
+    coordinates[:, 1, 0] = row_x - direction.x * half_length
+    coordinates[:, 1, 1] = row_y - direction.y * half_length
+
+    grating_lines = shapely.linestrings(coordinates)
+    results = shapely.intersection(grating_lines, shape)
+
+    # We only want the line strings.  If a grating line only touched the shape
+    # in a single point (or not at all), there won't be any for that row.
+    parts, row_indices = shapely.get_parts(results, return_index=True)
+    is_run = (shapely.get_type_id(parts) == shapely.GeometryType.LINESTRING) & ~shapely.is_empty(parts)
+    parts = parts[is_run]
+    row_indices = row_indices[is_run].tolist()
+
+    run_coordinates = shapely.get_coordinates(parts).tolist()
+    run_lengths = shapely.get_num_coordinates(parts).tolist()
+
+    rows = [[] for i in range(len(row_offsets))]
+    position = 0
+    for row_index, run_length in zip(row_indices, run_lengths):
+        rows[row_index].append(tuple(map(tuple, run_coordinates[position:position + run_length])))
+        position += run_length
 
     return rows
 
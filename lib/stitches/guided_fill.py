@@ -16,7 +16,7 @@ from ..utils.geometry import (ensure_geometry_collection,
 from ..utils.threading import check_stop_flag
 from .auto_fill import (auto_fill, build_fill_stitch_graph, build_travel_graph,
                         collapse_sequential_outline_edges, find_stitch_path,
-                        graph_make_valid, travel)
+                        graph_make_valid, remove_travel_edges, travel)
 
 
 def guided_fill(shape,
@@ -93,7 +93,7 @@ def path_to_stitches(shape, path, travel_graph, fill_stitch_graph,
 
             stitches.extend(new_stitches)
 
-            travel_graph.remove_edges_from(fill_stitch_graph[edge[0]][edge[1]]['segment'].get('underpath_edges', []))
+            remove_travel_edges(travel_graph, fill_stitch_graph[edge[0]][edge[1]]['segment'].get('underpath_edges', []))
         else:
             stitches.extend(travel(shape, travel_graph, edge, running_stitch_length, running_stitch_tolerance, skip_last, underpath))
 
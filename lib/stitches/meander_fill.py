@@ -1,4 +1,5 @@
-from itertools import combinations
+from bisect import bisect_right
+from itertools import accumulate, combinations
 
 import networkx as nx
 from shapely.geometry import LineString, MultiPoint, Point
@@ -105,70 +106,269 @@ def find_initial_path(graph, start, end):
 @debug.time
 def generate_meander_path(graph, start, end, rng):
     path = find_initial_path(graph, start, end)
-    path_edges = list(zip(path[:-1], path[1:]))
-    graph.remove_edges_from(path_edges)
-    graph_nodes = set(graph) - set(path)
+    meander_path = MeanderPath(graph, path)
 
-    edges_to_consider = list(path_edges)
-    meander_path = path_edges
+    edges_to_consider = meander_path.edges()
     while edges_to_consider:
         while edges_to_consider:
             check_stop_flag()
 
             edge = poprandom(edges_to_consider, rng)
-            edges_to_consider.extend(replace_edge(meander_path, edge, graph, graph_nodes))
+            edges_to_consider.extend(meander_path.replace_edge(edge))
 
-        edge_pairs = list(zip(meander_path[:-1], meander_path[1:]))
+        edge_pairs = meander_path.edge_pairs()
         while edge_pairs:
             check_stop_flag()
 
             edge1, edge2 = poprandom(edge_pairs, rng)
-            new_edges = replace_edge_pair(meander_path, edge1, edge2, graph, graph_nodes)
+            new_edges = meander_path.replace_edge_pair(edge1, edge2)
             if new_edges:
                 edges_to_consider.extend(new_edges)
                 break
 
+    points = meander_path.points()
+    graph.remove_edges_from(zip(points[:-1], points[1:]))
     debug.log_graph(graph, "remaining graph", "#FF0000")
-    points = path_to_points(meander_path)
     debug.log_line_string(LineString(points), "meander path", "#00FF00")
 
     return points
 
 
-def replace_edge(path, edge, graph, graph_nodes):
-    subgraph = graph.subgraph(graph_nodes | set(edge))
-    new_path = None
-    for new_path in nx.all_simple_edge_paths(subgraph, edge[0], edge[1], 7):
-        if len(new_path) > 1:
-            break
-    if new_path is None or len(new_path) == 1:
-        return []
-    i = path.index(edge)
-    path[i:i + 1] = new_path
-    graph.remove_edges_from(new_path)
-    # do I need to remove the last one too?
-    graph_nodes.difference_update(start for start, end in new_path)
-    # debug.log(f"found new path of length {len(new_path)} at position {i}")
-
-    return new_path
-
-
-def replace_edge_pair(path, edge1, edge2, graph, graph_nodes):
-    subgraph = graph.subgraph(graph_nodes | {edge1[0], edge2[1]})
-    new_path = None
-    for new_path in nx.all_simple_edge_paths(subgraph, edge1[0], edge2[1], 10):
-        if len(new_path) > 2:
-            break
-    if new_path is None or len(new_path) <= 2:
-        return []
-    i = path.index(edge1)
-    path[i:i + 2] = new_path
-    graph.remove_edges_from(new_path)
-    # do I need to remove the last one too?
-    graph_nodes.difference_update(start for start, end in new_path)
-    # debug.log(f"found new pair path of length {len(new_path)} at position {i}")
+class MeanderPath:
+    """A path through a graph that grows by replacing its edges with detours.
+
+    Nodes are referred to by their index in the graph.  The path is a doubly
+    linked list over those indices: an edge (a, b) is part of the path if and
+    only if next_node[a] == b, so splicing in a detour doesn't depend on the
+    length of the path.  The nodes that the path hasn't visited yet are kept
+    in a bitmap.
+
+    To find the edge pair at a given position along the path, the path's
+    nodes are also kept in order in blocks of roughly BLOCK_SIZE nodes.
+
+    Edges passed in and returned are tuples of node indices.
+    """
+
+    BLOCK_SIZE = 256
+
+    def __init__(self, graph, path):
+        self.nodes = list(graph)
+        node_indices = {node: i for i, node in enumerate(self.nodes)}
+
+        # adjacency arrays: the neighbors of node i are
+        # neighbors[neighbors_start[i]:neighbors_start[i + 1]], in the same
+        # order as in the graph
+        self.neighbors = []
+        self.neighbors_start = [0]
+        for node in self.nodes:
+            self.neighbors.extend(node_indices[neighbor] for neighbor in graph.adj[node])
+            self.neighbors_start.append(len(self.neighbors))
 
-    return new_path
+        self.unused = bytearray(b'\x01') * len(self.nodes)
+        self.next_node = [None] * len(self.nodes)
+        self.previous_node = [None] * len(self.nodes)
+
+        path = [node_indices[node] for node in path]
+        self.start = path[0]
+        self._link(path)
+
+        self.blocks = [path[i:i + self.BLOCK_SIZE] for i in range(0, len(path), self.BLOCK_SIZE)]
+        self.block_of = [None] * len(self.nodes)
+        for block in self.blocks:
+            self._assign_block(block, block)
+        self.length = len(path)
+        self._block_starts = None
+
+        # Edge pairs that had no detour.  Nodes are never freed again, so
+        # they won't have one later either.
+        self.dead_pairs = set()
+
+    def edges(self):
+        edges = []
+        node = self.start
+        while self.next_node[node] is not None:
+            edges.append((node, self.next_node[node]))
+            node = self.next_node[node]
+
+        return edges
+
+    def edge_pairs(self):
+        """Return all pairs of consecutive edges, in order along the path.
+
+        The result behaves like a list for poprandom(), but it doesn't list
+        the pairs until they're used.  It's only valid until the path changes.
+        """
+        return EdgePairs(self)
+
+    def edge_pair_at(self, position):
+        node = self._node_at(position)
+        middle = self.next_node[node]
+
+        return (node, middle), (middle, self.next_node[middle])
+
+    def points(self):
+        points = [self.nodes[self.start]]
+        points.extend(self.nodes[end] for start, end in self.edges())
+
+        return points
+
+    def replace_edge(self, edge):
+        """Replace an edge with a detour through unused nodes.
+
+        Returns the edges of the detour, or an empty list if there is none.
+        """
+        start, end = edge
+        if self.next_node[start] != end:
+            return []
+
+        return self._replace(start, end, 2, 7)
+
+    def replace_edge_pair(self, edge1, edge2):
+        """Replace two consecutive edges with a longer detour.
+
+        The node between the two edges is dropped from the path.
+
+        Returns the edges of the detour, or an empty list if there is none.
+        """
+        start, middle = edge1
+        end = edge2[1]
+        if self.next_node[start] != middle or self.next_node[middle] != end:
+            return []
+
+        if (start, middle, end) in self.dead_pairs:
+            return []
+
+        new_edges = self._replace(start, end, 3, 10)
+        if new_edges:
+            self.next_node[middle] = self.previous_node[middle] = None
+            self._remove_from_block(middle)
+        else:
+            self.dead_pairs.add((start, middle, end))
+
+        return new_edges
+
+    def _replace(self, start, end, min_length, max_length):
+        detour = self._find_detour(start, end, min_length, max_length)
+        if detour is None:
+            return []
+
+        self._link(detour)
+        self._insert_after(start, detour[1:-1])
+
+        return list(zip(detour[:-1], detour[1:]))
+
+    def _link(self, path):
+        for start, end in zip(path[:-1], path[1:]):
+            self.next_node[start] = end
+            self.previous_node[end] = start
+        for node in path:
+            self.unused[node] = 0
+
+    def _assign_block(self, nodes, block):
+        for node in nodes:
+            self.block_of[node] = block
+
+    def _insert_after(self, node, new_nodes):
+        block = self.block_of[node]
+        position = block.index(node) + 1
+        block[position:position] = new_nodes
+        self._assign_block(new_nodes, block)
+        self.length += len(new_nodes)
+        self._block_starts = None
+
+        if len(block) > 2 * self.BLOCK_SIZE:
+            new_block = block[self.BLOCK_SIZE:]
+            del block[self.BLOCK_SIZE:]
+            self._assign_block(new_block, new_block)
+            block_index = next(i for i, other in enumerate(self.blocks) if other is block)
+            self.blocks.insert(block_index + 1, new_block)
+
+    def _remove_from_block(self, node):
+        self.block_of[node].remove(node)
+        self.block_of[node] = None
+        self.length -= 1
+        self._block_starts = None
+
+    def _node_at(self, position):
+        if self._block_starts is None:
+            self._block_starts = list(accumulate((len(block) for block in self.blocks[:-1]), initial=0))
+
+        # Emptied blocks start where the next block starts, so bisect_right()
+        # skips them.
+        block_index = bisect_right(self._block_starts, position) - 1
+
+        return self.blocks[block_index][position - self._block_starts[block_index]]
+
+    def _find_detour(self, start, end, min_length, max_length):
+        """Find a path from start to end through unused nodes.
+
+        This is a depth-first search bounded to max_length edges that visits
+        neighbors in the graph's order, so it finds the same detour as the
+        first suitable path from nx.all_simple_edge_paths() would be.  end is
+        only accepted once the path has at least min_length edges.
+
+        Returns a list of node indices from start to end, or None.
+        """
+        neighbors = self.neighbors
+        neighbors_start = self.neighbors_start
+
+        detour = [start]
+        stack = [iter(neighbors[neighbors_start[start]:neighbors_start[start + 1]])]
+        while stack:
+            for neighbor in stack[-1]:
+                if neighbor == end:
+                    if len(detour) >= min_length:
+                        for node in detour[1:]:
+                            self.unused[node] = 1
+                        detour.append(end)
+                        return detour
+                elif self.unused[neighbor] and len(detour) < max_length:
+                    # mark it as used while it's on the detour, so that it
+                    # isn't visited twice
+                    self.unused[neighbor] = 0
+                    detour.append(neighbor)
+                    stack.append(iter(neighbors[neighbors_start[neighbor]:neighbors_start[neighbor + 1]]))
+                    break
+            else:
+                # all neighbors of the last node have been explored
+                stack.pop()
+                node = detour.pop()
+                if stack:
+                    self.unused[node] = 1
+
+        return None
+
+
+class EdgePairs:
+    """The pairs of consecutive edges of a MeanderPath, as a lazy list.
+
+    Supports just what poprandom() needs.  Items that poprandom() moves
+    around are remembered, all others are looked up in the path.
+    """
+
+    def __init__(self, meander_path):
+        self.meander_path = meander_path
+        self.length = max(meander_path.length - 2, 0)
+        self.moved = {}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index in self.moved:
+            return self.moved[index]
+
+        return self.meander_path.edge_pair_at(index)
+
+    def __setitem__(self, index, item):
+        self.moved[index] = item
+
+    def pop(self):
+        item = self[self.length - 1]
+        self.moved.pop(self.length - 1, None)
+        self.length -= 1
+
+        return item
 
 
 @debug.time
@@ -199,11 +399,3 @@ def post_process(points, shape, original_shape, fill):
                 stitches.extend(stitches)
 
     return stitches
-
-
-def path_to_points(path):
-    points = [start for start, end in path]
-    if path:
-        points.append(path[-1][1])
-
-    return points
@@ -5,7 +5,9 @@
 
 import math
 import typing
+from bisect import bisect_right
 from copy import copy
+from itertools import accumulate
 from math import tau
 
 import numpy as np
@@ -176,54 +178,197 @@ def cut_segment_with_circle(origin: Point, r: float, a: Point, b: Point) -> Poin
     return a + d*t
 
 
-def take_stitch(start: Point, points: typing.Sequence[Point], idx: int, stitch_length: float, tolerance: float):
+def path_to_curve_indices(coords: np.ndarray, min_len: float) -> typing.List[typing.Tuple[int, int]]:
+    # split a path at obvious corner points so that they get stitched exactly
+    # min_len controls the minimum length after splitting for which it won't split again,
+    # which is used to avoid creating large numbers of corner points when encouintering micro-messes.
+    # Takes an Nx2 array of coordinates and returns (first index, last index) pairs of the curves.
+    if len(coords) < 3:
+        return [(0, len(coords) - 1)]
+
+    segments = np.diff(coords, axis=0)
+    squared_lengths = segments[:, 0] * segments[:, 0] + segments[:, 1] * segments[:, 1]
+    lengths = np.sqrt(squared_lengths)
+
+    # The incoming segment at each point is the last one that isn't zero length.
+    nonzero = np.where(squared_lengths > 0, np.arange(len(segments)), 0)
+    previous = np.maximum.accumulate(nonzero)[:-1]
+    a = segments[previous]
+    b = segments[1:]
+    aabb = squared_lengths[previous] * squared_lengths[1:]
+    ab = a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1]
+    corners = np.flatnonzero((aabb > 0) & (ab * np.abs(ab) <= 0.5 * aabb)) + 1
+
+    # Only split if the path since the last corner (split or not) is long enough.
+    distances = np.concatenate(([0], np.cumsum(lengths)))
+    previous_corners = np.concatenate(([0], corners[:-1]))
+    splits = corners[distances[corners] - distances[previous_corners] >= min_len].tolist()
+
+    boundaries = [0] + splits + [len(coords) - 1]
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# Windows of up to this many points are scanned in plain Python, which is faster than NumPy for
+# small inputs.
+MAX_SCALAR_WINDOW = 32
+
+
+class Sleeve:
+    # The set of directions from the start of a stitch that keep it within the tolerance of all
+    # points of the path it has passed so far.  This is the same thing as an AngleInterval, but
+    # angles are stored relative to the direction of the first point that
+    # narrowed the sleeve.  The sleeve is always less than half a circle wide, so its bounds
+    # are then plain numbers and can be intersected with min() and max().
+
+    def __init__(self):
+        self.reference_angle = None
+        self.low = -math.inf
+        self.high = math.inf
+
+    def to_angle_interval(self):
+        if self.reference_angle is None:
+            return AngleInterval.all()
+        return AngleInterval(self.reference_angle + self.low, self.reference_angle + self.high)
+
+    def scan(self, vectors: np.ndarray, stitch_length: float, tolerance: float):
+        # Narrow the sleeve by the points at vectors (relative to the start of the stitch) until
+        # we reach one that lies outside of the sleeve or too far away.  Returns the index of
+        # that point and whether it was outside of the sleeve, or (None, False).
+        distances = np.sqrt(vectors[:, 0] * vectors[:, 0] + vectors[:, 1] * vectors[:, 1])
+        angles = np.arctan2(vectors[:, 1], vectors[:, 0])
+        narrowing = distances > tolerance
+
+        if self.reference_angle is None:
+            if not narrowing.any():
+                too_far = np.flatnonzero(distances >= stitch_length)
+                return (int(too_far[0]), False) if len(too_far) else (None, False)
+            self.reference_angle = float(angles[narrowing.argmax()])
+
+        relative_angles = (angles - self.reference_angle + math.pi) % math.tau - math.pi
+        half_widths = np.arcsin(tolerance / np.where(narrowing, distances, tolerance))
+        lows = np.maximum.accumulate(np.where(narrowing, relative_angles - half_widths, -math.inf))
+        highs = np.minimum.accumulate(np.where(narrowing, relative_angles + half_widths, math.inf))
+
+        # a point is checked against the sleeve from all points before it
+        lows_before = np.concatenate(([self.low], np.maximum(lows[:-1], self.low)))
+        highs_before = np.concatenate(([self.high], np.minimum(highs[:-1], self.high)))
+        outside = (relative_angles < lows_before) | (relative_angles > highs_before)
+        stop = np.flatnonzero(outside | (distances >= stitch_length))
+
+        if len(stop):
+            index = int(stop[0])
+            self.low = float(lows_before[index])
+            self.high = float(highs_before[index])
+            return index, bool(outside[index])
+
+        self.low = max(self.low, float(lows[-1]))
+        self.high = min(self.high, float(highs[-1]))
+        return None, False
+
+    def scan_points(self, vectors: typing.List[typing.Tuple[float, float]], stitch_length: float, tolerance: float):
+        # Same as scan(), one point at a time.  That's faster for a handful of points.
+        for index, (x, y) in enumerate(vectors):
+            distance = math.sqrt(x * x + y * y)
+            angle = math.atan2(y, x)
+
+            if self.reference_angle is not None:
+                relative_angle = (angle - self.reference_angle + math.pi) % math.tau - math.pi
+                if relative_angle < self.low or relative_angle > self.high:
+                    return index, True
+
+            if distance >= stitch_length:
+                return index, False
+
+            if distance > tolerance:
+                if self.reference_angle is None:
+                    self.reference_angle = angle
+                    relative_angle = 0.0
+                half_width = math.asin(tolerance / distance)
+                self.low = max(self.low, relative_angle - half_width)
+                self.high = min(self.high, relative_angle + half_width)
+
+        return None, False
+
+
+def take_stitch_array(start: Point, coords: np.ndarray, points: typing.List[typing.List[float]], distances: typing.List[float], idx: int,
+                      stitch_length: float, tolerance: float):
     # Based on a single step of the Zhao-Saalfeld curve simplification algorithm.
     # https://cartogis.org/docs/proceedings/archive/auto-carto-13/pdf/linear-time-sleeve-fitting-polyline-simplification-algorithms.pdf
     # Adds early termination condition based on stitch length.
-    if idx >= len(points):
+    # points holds the same coordinates as coords, as a list, and distances holds the distance
+    # along the path to each point.
+    # The points that can be reached are scanned in windows: by the triangle inequality no point
+    # closer to the first one of the window than the remaining stitch length (measured along the
+    # path) can be out of reach.
+    if idx >= len(coords):
         return None, None
 
-    sleeve = AngleInterval.all()
+    sleeve = Sleeve()
     last = start
-    for i in range(idx, len(points)):
-        p = points[i]
-        if sleeve.containsPoint(p - start):
-            if start.distance(p) < stitch_length:
-                sleeve = sleeve.intersect(AngleInterval.fromBall(p - start, tolerance))
-                last = p
-                continue
-            else:
-                cut = cut_segment_with_circle(start, stitch_length, last, p)
-                return cut, i
+    while idx < len(coords):
+        first = Point(*points[idx])
+        reach = stitch_length - start.distance(first)
+        if reach <= 0:
+            if sleeve.reference_angle is None:
+                # a long segment: any direction is fine, so just cut it off at the stitch length
+                return cut_segment_with_circle(start, stitch_length, last, first), idx
+            window_end = idx + 1
         else:
-            cut = sleeve.cutSegment(start, last, p)
-            if start.distance(cut) > stitch_length:
-                cut = cut_segment_with_circle(start, stitch_length, last, p)
-            return cut, i
-    return points[-1], None
+            window_end = min(bisect_right(distances, distances[idx] + reach) + 1, len(coords))
+
+        if window_end - idx <= MAX_SCALAR_WINDOW:
+            vectors = [(x - start.x, y - start.y) for x, y in points[idx:window_end]]
+            index, outside = sleeve.scan_points(vectors, stitch_length, tolerance)
+        else:
+            index, outside = sleeve.scan(coords[idx:window_end] - (start.x, start.y), stitch_length, tolerance)
+
+        if index is None:
+            last = Point(*points[window_end - 1])
+            idx = window_end
+            continue
+
+        p = Point(*points[idx + index])
+        if index > 0:
+            last = Point(*points[idx + index - 1])
 
+        if not outside:
+            return cut_segment_with_circle(start, stitch_length, last, p), idx + index
 
-def stitch_curve_evenly(points: typing.Sequence[Point], stitch_length: float, tolerance: float):
+        cut = sleeve.to_angle_interval().cutSegment(start, last, p)
+        if start.distance(cut) > stitch_length:
+            cut = cut_segment_with_circle(start, stitch_length, last, p)
+        return cut, idx + index
+
+    return Point(*points[-1]), None
+
+
+def stitch_curve_evenly_array(coords: np.ndarray, stitch_length: float, tolerance: float):
     # Will split a straight line into even-length stitches while still handling curves correctly.
-    # Includes end point but not start point.
-    if len(points) < 2:
+    # Includes end point but not start point.  Takes an Nx2 array of coordinates.
+    if len(coords) < 2:
         return []
-    distLeft = [0] * len(points)
-    for i in reversed(range(0, len(points) - 1)):
-        distLeft[i] = distLeft[i + 1] + points[i].distance(points[i+1])
+
+    points = coords.tolist()
+    if len(points) > MAX_SCALAR_WINDOW:
+        segments = np.diff(coords, axis=0)
+        segment_lengths = np.sqrt(segments[:, 0] * segments[:, 0] + segments[:, 1] * segments[:, 1]).tolist()
+    else:
+        segment_lengths = [math.sqrt((x2 - x1) * (x2 - x1) + (y2 - y1) * (y2 - y1)) for (x1, y1), (x2, y2) in zip(points, points[1:])]
+    distances = list(accumulate(segment_lengths, initial=0))
+    distLeft = list(accumulate(reversed(segment_lengths), initial=0))[::-1]
 
     i = 1
-    last = points[0]
+    last = Point(*points[0])
     stitches = []
-    while i is not None and i < len(points):
+    while i is not None and i < len(coords):
         check_stop_flag()
 
-        d = last.distance(points[i]) + distLeft[i]
+        d = last.distance(Point(*points[i])) + distLeft[i]
         if d == 0:
             return stitches
         stitch_len = d / math.ceil(d / stitch_length) + 0.000001  # correction for rounding error
 
-        stitch, newidx = take_stitch(last, points, i, stitch_len, tolerance)
+        stitch, newidx = take_stitch_array(last, coords, points, distances, i, stitch_len, tolerance)
         i = newidx
         if stitch is not None:
             stitches.append(stitch)
@@ -231,48 +376,15 @@ def stitch_curve_evenly(points: typing.Sequence[Point], stitch_length: float, to
     return stitches
 
 
-def path_to_curves(points: typing.List[Point], min_len: float):
-    # split a path at obvious corner points so that they get stitched exactly
-    # min_len controls the minimum length after splitting for which it won't split again,
-    # which is used to avoid creating large numbers of corner points when encouintering micro-messes.
-    if len(points) < 3:
-        return [points]
-    curves = []
-
-    last = 0
-    last_seg = points[1] - points[0]
-    seg_len = last_seg.length()
-    for i in range(1, len(points) - 1):
-        # vectors of the last and next segments
-        a = last_seg
-        b = points[i + 1] - points[i]
-        aabb = (a * a) * (b * b)
-        abab = (a * b) * abs(a * b)
-
-        # Test if the turn angle from vectors a to b is more than 45 degrees.
-        # Optimized version of checking if cos(angle(a,b)) <= sqrt(0.5) and is defined
-        if aabb > 0 and abab <= 0.5 * aabb:
-            if seg_len >= min_len:
-                curves.append(points[last: i + 1])
-                last = i
-            seg_len = 0
-
-        if b * b > 0:
-            last_seg = b
-        seg_len += b.length()
-
-    curves.append(points[last:])
-    return curves
-
-
 def running_stitch(points, stitch_length, tolerance):
     # Turn a continuous path into a running stitch.
     if not points:
         return
+    coords = np.column_stack(([point.x for point in points], [point.y for point in points])).astype(float)
     stitches = [points[0]]
-    for curve in path_to_curves(points, 2 * tolerance):
-        # segments longer than twice the tollerance will usually be forced by it, so set that as the minimum for corner detection
-        stitches.extend(stitch_curve_evenly(curve, stitch_length, tolerance))
+    # segments longer than twice the tollerance will usually be forced by it, so set that as the minimum for corner detection
+    for first, last in path_to_curve_indices(coords, 2 * tolerance):
+        stitches.extend(stitch_curve_evenly_array(coords[first:last + 1], stitch_length, tolerance))
     return stitches
 
 
@@ -10,6 +10,7 @@ import networkx as nx
 from shapely.geometry import MultiPoint, Point
 from shapely.ops import nearest_points
 
+from ...commands import invalidate_command_index
 from ...elements import SatinColumn
 from ...svg import get_correction_transform
 from ...svg.tags import INKSCAPE_LABEL
@@ -214,6 +215,11 @@ def get_nodes_on_element(graph, element):
 
 
 def remove_original_elements(elements):
+    if not elements:
+        return
+
+    svg = elements[0].node.getroottree().getroot()
+
     for element in elements:
         for command in element.commands:
             command_group = command.use.getparent()
@@ -224,6 +230,8 @@ def remove_original_elements(elements):
                 remove_from_parent(command.use)
         remove_from_parent(element.node)
 
+    invalidate_command_index(svg)
+
 
 def remove_from_parent(node):
     if node.getparent() is not None:
@@ -0,0 +1,99 @@
+# Authors: see git history
+#
+# Copyright (c) 2024 Authors
+# Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
+
+import hashlib
+from weakref import WeakKeyDictionary
+
+import inkex
+
+from .tags import SVG_STYLE_TAG
+
+# Attributes in these namespaces are editor state (labels, node types, guides
+# and such) and don't change how an element is stitched.
+IGNORED_NAMESPACES = ('{%s}' % inkex.NSS['inkscape'], '{%s}' % inkex.NSS['sodipodi'])
+
+
+# node -> (revision, parent fingerprint, fingerprint)
+_fingerprints = WeakKeyDictionary()
+
+# root -> (svg:style elements, their text, digest)
+_stylesheets_fingerprints = WeakKeyDictionary()
+
+
+def get_node_fingerprint(node):
+    """Return a digest of everything in the SVG tree that shapes this node.
+
+    That is the node's own attributes (path data, style, transform and the
+    inkstitch params) and those of all of its ancestors up to and including
+    the root element, whose size and viewBox set the document scale.  The
+    text of the document's CSS stylesheets is included too.
+
+    This works directly on the raw attribute strings, so it's much cheaper
+    than parsing and transforming the path or computing the cascaded style.
+    Results are memoized per node and recomputed only when the attributes of
+    the node or one of its ancestors change.
+    """
+
+    revision = _get_revision(node)
+
+    parent = node.getparent()
+    if parent is None:
+        parent_fingerprint = _get_stylesheets_fingerprint(node)
+    else:
+        parent_fingerprint = get_node_fingerprint(parent)
+
+    memo = _fingerprints.get(node)
+    if memo is not None and memo[0] == revision and memo[1] == parent_fingerprint:
+        return memo[2]
+
+    hasher = hashlib.sha1(parent_fingerprint)
+    hasher.update(b'\0\0%s' % str(node.tag).encode())
+    for name, value in revision:
+        hasher.update(b'\0%s=%s' % (name.encode(), value.encode()))
+    fingerprint = hasher.digest()
+
+    _fingerprints[node] = (revision, parent_fingerprint, fingerprint)
+    return fingerprint
+
+
+def _get_revision(node):
+    return tuple(sorted((name, value) for name, value in node.attrib.items()
+                        if name != 'id' and not name.startswith(IGNORED_NAMESPACES)))
+
+
+def _get_stylesheets_fingerprint(root):
+    """Return a digest of the text of the document's svg:style elements.
+
+    The document is only searched for svg:style elements once.  After that,
+    we just check that the ones we found are unchanged, which is cheap
+    enough to do for every node.  svg:style elements added later aren't
+    noticed, but Ink/Stitch never adds any.
+    """
+
+    memo = _stylesheets_fingerprints.get(root)
+    if memo is not None:
+        styles, texts, digest = memo
+        if all(_is_in_document(style, root) for style in styles) and texts == [style.text for style in styles]:
+            return digest
+        styles = [style for style in styles if _is_in_document(style, root)]
+    else:
+        styles = list(root.iter(SVG_STYLE_TAG))
+
+    texts = [style.text for style in styles]
+    hasher = hashlib.sha1()
+    for text in texts:
+        hasher.update(b'\0%s' % (text or "").encode())
+    digest = hasher.digest()
+
+    _stylesheets_fingerprints[root] = (styles, texts, digest)
+    return digest
+
+
+def _is_in_document(node, root):
+    for ancestor in node.iterancestors():
+        if ancestor is root:
+            return True
+
+    return False
@@ -3,6 +3,8 @@
 # Copyright (c) 2010 Authors
 # Licensed under the GNU GPL version 3.0 or later.  See the file LICENSE for details.
 
+from weakref import WeakKeyDictionary
+
 import inkex
 
 from .tags import SVG_GROUP_TAG, SVG_LINK_TAG
@@ -18,17 +20,48 @@ def apply_transforms(path, node):
     return path
 
 
-def compose_parent_transforms(node, mat):
-    # This is adapted from Inkscape's simpletransform.py's composeParents()
-    # function.  That one can't handle nodes that are detached from a DOM.
+# node -> (transform attribute, parent, parent's composed transform, composed transform)
+_composed_transforms = WeakKeyDictionary()
+
+
+def get_composed_transform(node):
+    """Combine the node's transform with those of all parent groups.
+
+    The result is memoized per node.  Siblings share their parent's composed
+    transform, so every group's transform is parsed and composed only once.  Memoized transforms are recomputed if the
+    transform attribute of the node or one of its ancestors changes, or if
+    the node is moved.
+
+    The returned Transform is shared and must not be modified.
+    """
+
+    parent = node.getparent()
+    if parent is not None and parent.tag in [SVG_GROUP_TAG, SVG_LINK_TAG]:
+        parent_transform = get_composed_transform(parent)
+    else:
+        parent_transform = None
+
+    # inkex's node.get('transform') parses and reformats the attribute, so
+    # look at the raw attribute to see if it changed.
+    raw_transform = node.attrib.get('transform')
+
+    # The memo holds on to the parent, which keeps the parent's memo alive
+    # as long as we're around.
+    memo = _composed_transforms.get(node)
+    if memo is not None and memo[0] == raw_transform and memo[1] is parent and memo[2] is parent_transform:
+        return memo[3]
 
     trans = node.get('transform')
     if trans:
-        mat = inkex.transforms.Transform(trans) @ mat
-    if node.getparent() is not None:
-        if node.getparent().tag in [SVG_GROUP_TAG, SVG_LINK_TAG]:
-            mat = compose_parent_transforms(node.getparent(), mat)
-    return mat
+        transform = inkex.transforms.Transform(trans)
+    else:
+        transform = inkex.transforms.Transform()
+
+    if parent_transform is not None:
+        transform = parent_transform @ transform
+
+    _composed_transforms[node] = (raw_transform, parent, parent_transform, transform)
+    return transform
 
 
 def get_node_transform(node):
@@ -43,7 +76,7 @@ def get_node_transform(node):
     # this if is because sometimes inkscape likes to create paths outside of a layer?!
     if node.getparent() is not None:
         # combine this node's transform with all parent groups' transforms
-        transform = compose_parent_transforms(node, transform)
+        transform = get_composed_transform(node)
 
     # add in the transform implied by the viewBox
     viewbox_transform = get_viewbox_transform(node.getroottree().getroot())
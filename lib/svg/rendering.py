@@ -7,6 +7,7 @@ import math
 from math import pi
 
 import inkex
+import numpy as np
 
 from ..i18n import _
 from ..utils import Point, cache
@@ -131,6 +132,83 @@ def realistic_stitch(start, end):
     return str(path)
 
 
+# The points of stitch_path in absolute coordinates, in the order they appear
+# in the path, for a stitch of length 0.  The x coordinate of the points
+# marked in STITCH_TEMPLATE_SHIFT is reduced by the stitch length.
+STITCH_TEMPLATE = np.array([
+    (0, 0),  # start point
+    (0.55, -0.1), (0, 0),  # bottom-right whisker
+    (0.613, 0), (0.613, 1.4), (0, 1.4),  # right endcap
+    (0.55, 1.5), (0, 1.4),  # top-right whisker
+    (0, 1.4),  # stitch length
+    (-0.55, 1.5), (0, 1.4),  # top-left whisker
+    (-0.613, 1.4), (-0.613, 0), (0, 0),  # left endcap
+    (-0.55, -0.1), (0, 0),  # bottom-left whisker
+])
+STITCH_TEMPLATE_SHIFT = np.array([0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1])
+
+# The path commands of stitch_path (as inkex writes it after transforming
+# it) and the indices of their points in STITCH_TEMPLATE.
+STITCH_TEMPLATE_COMMANDS = [
+    ('M', [0]), ('l', [1]), ('l', [2]), ('c', [3, 4, 5]), ('l', [6]), ('l', [7]),
+    ('L', [8]), ('l', [9]), ('l', [10]), ('c', [11, 12, 13]), ('l', [14]), ('l', [15])
+]
+STITCH_PATH_FORMAT = " ".join(
+    "%s %s" % (letter, " ".join(["%.6g %.6g"] * len(indices))) for letter, indices in STITCH_TEMPLATE_COMMANDS
+) + " z"
+
+
+def realistic_stitches(point_list):
+    """Generate the stitch vector paths for all stitches of a point list.
+
+    This is equivalent to calling realistic_stitch() for each pair of
+    consecutive points, but it places one stitch template with NumPy instead
+    of building and parsing an inkex path for every stitch.  The results may
+    differ from realistic_stitch() by rounding errors.
+    """
+
+    points = np.asarray(point_list, dtype=float)
+    if len(points) < 2:
+        return []
+
+    start = points[:-1]
+    end = points[1:]
+
+    direction = end - start
+    stitch_length = (direction[:, 0] ** 2 + direction[:, 1] ** 2) ** 0.5
+    stitch_center = (end + start) / 2.0
+    stitch_angle = np.radians(np.arctan2(direction[:, 1], direction[:, 0]) * (180 / pi))
+
+    stitch_length = np.maximum(0, stitch_length - 0.2 * PIXELS_PER_MM)
+
+    # place the template around the rotation center, rotate it and move it
+    # to the center of the stitch
+    template = np.broadcast_to(STITCH_TEMPLATE, (len(start),) + STITCH_TEMPLATE.shape).copy()
+    template[:, :, 0] -= stitch_length[:, None] * STITCH_TEMPLATE_SHIFT
+    template[:, :, 0] += stitch_length[:, None] / 2.0
+    template[:, :, 1] -= stitch_height / 2.0
+
+    cos = np.cos(stitch_angle)[:, None]
+    sin = np.sin(stitch_angle)[:, None]
+    absolute = np.empty_like(template)
+    absolute[:, :, 0] = stitch_center[:, 0, None] + cos * template[:, :, 0] - sin * template[:, :, 1]
+    absolute[:, :, 1] = stitch_center[:, 1, None] + sin * template[:, :, 0] + cos * template[:, :, 1]
+
+    # make lower-case commands relative to the end of the previous command,
+    # just like inkex does
+    coords = np.empty_like(absolute)
+    previous = absolute[:, 0]
+    for letter, indices in STITCH_TEMPLATE_COMMANDS:
+        if letter.islower():
+            coords[:, indices] = absolute[:, indices] - previous[:, None]
+            previous = previous + coords[:, indices[-1]]
+        else:
+            coords[:, indices] = absolute[:, indices]
+            previous = absolute[:, indices[-1]]
+
+    return [STITCH_PATH_FORMAT % tuple(stitch) for stitch in coords.reshape(len(coords), -1).tolist()]
+
+
 def color_block_to_point_lists(color_block):
     point_lists = [[]]
 
@@ -159,17 +237,30 @@ def get_correction_transform(svg):
     return str(transform)
 
 
-def color_block_to_realistic_stitches(color_block, svg, destination):
+def color_block_to_realistic_stitches(color_block, svg, destination, merge=False):
+    """Render each stitch of the color block as a realistic stitch shape.
+
+    If merge is True, all stitches of the color block are emitted as a
+    single path.  That's much smaller and faster to render, but overlapping
+    stitches are lit as one shape.
+    """
+
+    color = color_block.color.visible_on_white.darker.to_hex_str()
+    style = "fill: %s; stroke: none; filter: url(#realistic-stitch-filter);" % color
+
+    paths = []
     for point_list in color_block_to_point_lists(color_block):
-        color = color_block.color.visible_on_white.darker.to_hex_str()
-        start = point_list[0]
-        for point in point_list[1:]:
-            destination.append(inkex.PathElement(attrib={
-                'style': "fill: %s; stroke: none; filter: url(#realistic-stitch-filter);" % color,
-                'd': realistic_stitch(start, point),
-                'transform': get_correction_transform(svg)
-            }))
-            start = point
+        paths.extend(realistic_stitches(point_list))
+
+    if merge and paths:
+        paths = [" ".join(paths)]
+
+    for path in paths:
+        destination.append(inkex.PathElement(attrib={
+            'style': style,
+            'd': path,
+            'transform': get_correction_transform(svg)
+        }))
 
 
 def color_block_to_paths(color_block, svg, destination, visual_commands):
@@ -213,7 +304,7 @@ def color_block_to_paths(color_block, svg, destination, visual_commands):
             path.set(INKSTITCH_ATTRIBS['stop_after'], 'true')
 
 
-def render_stitch_plan(svg, stitch_plan, realistic=False, visual_commands=True) -> inkex.Group:
+def render_stitch_plan(svg, stitch_plan, realistic=False, visual_commands=True, merge_realistic_stitches=False) -> inkex.Group:
     layer = svg.findone(".//*[@id='__inkstitch_stitch_plan__']")
     if layer is None:
         layer = inkex.Group(attrib={
@@ -237,7 +328,7 @@ def render_stitch_plan(svg, stitch_plan, realistic=False, visual_commands=True)
         })
         layer.append(group)
         if realistic:
-            color_block_to_realistic_stitches(color_block, svg, group)
+            color_block_to_realistic_stitches(color_block, svg, group, merge_realistic_stitches)
         else:
             color_block_to_paths(color_block, svg, group, visual_commands)
 
@@ -26,6 +26,7 @@ SVG_USE_TAG = inkex.addNS('use', 'svg')
 SVG_IMAGE_TAG = inkex.addNS('image', 'svg')
 SVG_CLIPPATH_TAG = inkex.addNS('clipPath', 'svg')
 SVG_MASK_TAG = inkex.addNS('mask', 'svg')
+SVG_STYLE_TAG = inkex.addNS('style', 'svg')
 
 SVG_METADATA_TAG = inkex.addNS("metadata", "svg")
 INKSCAPE_LABEL = inkex.addNS('label', 'inkscape')
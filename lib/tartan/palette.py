@@ -5,13 +5,15 @@
 # Additional credits to: https://github.com/clsn/pyTartan
 
 import re
-from typing import List
+from typing import TYPE_CHECKING, List
 
-import wx
 from inkex import Color
 
 from .colors import string_to_color
 
+if TYPE_CHECKING:
+    import wx
+
 
 class Palette:
     """Holds information about the tartan palette"""
@@ -43,7 +45,7 @@ class Palette:
         self.symmetry = symmetry
         self.update_code()
 
-    def update_from_stripe_sizer(self, sizers: List[wx.BoxSizer], symmetry: bool = True, equal_warp_weft: bool = True) -> None:
+    def update_from_stripe_sizer(self, sizers: List['wx.BoxSizer'], symmetry: bool = True, equal_warp_weft: bool = True) -> None:
         """
         Update palette code from stripes (customize panel)
 
@@ -51,6 +53,8 @@ class Palette:
         :param symmetry: reflective sett (True) / repeating sett (False)
         :param equal_warp_weft: wether warp and weft are equal or not
         """
+        import wx
+
         self.symmetry = symmetry
         self.equal_warp_weft = equal_warp_weft
 
@@ -160,6 +164,8 @@ class Palette:
 
         :param code_str: the tartan pattern code to apply
         """
+        import wx
+
         code = code_str.split('|')
         for i, direction in enumerate(code):
             stripes = []
@@ -5,13 +5,22 @@
 
 import os
 import sys
+from collections import Counter
 from collections.abc import Sequence
 from glob import glob
 from os.path import dirname, realpath
 
+import appdirs
+import diskcache
+
 from ..utils import guess_inkscape_config_path
+from ..utils.cache import is_cache_disabled
 from .palette import ThreadPalette
 
+# Bump this whenever ThreadPalette changes in a way that makes previously
+# pickled palettes unusable.
+CATALOG_CACHE_VERSION = 1
+
 
 class _ThreadCatalog(Sequence):
     """Holds a set of ThreadPalettes."""
@@ -36,17 +45,79 @@ class _ThreadCatalog(Sequence):
 
         return path
 
-    def load_palettes(self, paths):
-        palettes = []
+    def get_palette_files(self, paths):
+        palette_files = []
+        palette_basenames = set()
         for path in paths:
             for palette_file in glob(os.path.join(path, 'InkStitch*.gpl')):
                 palette_basename = os.path.basename(palette_file)
-                if palette_basename not in palettes:
-                    palette = ThreadPalette(palette_file)
-                    if not palette.is_gimp_palette:
-                        continue
-                    self.palettes.append(ThreadPalette(palette_file))
-                    palettes.append(palette_basename)
+                if palette_basename not in palette_basenames:
+                    palette_files.append(palette_file)
+                    palette_basenames.add(palette_basename)
+
+        return palette_files
+
+    def load_palettes(self, paths):
+        palette_files = self.get_palette_files(paths)
+
+        # Parsing the palettes and converting all thread colors to Lab takes
+        # a while, so we keep the result around until a palette file changes.
+        cache_key = self._get_cache_key(palette_files)
+        palettes = self._load_cached_palettes(cache_key)
+
+        if palettes is None:
+            palettes = []
+            for palette_file in palette_files:
+                palette = ThreadPalette(palette_file)
+                if palette.is_gimp_palette:
+                    palettes.append(palette)
+            self._save_cached_palettes(cache_key, palettes)
+
+        self.palettes.extend(palettes)
+
+    def _get_cache_key(self, palette_files):
+        if is_cache_disabled():
+            return None
+
+        cache_key = [CATALOG_CACHE_VERSION]
+        for palette_file in palette_files:
+            try:
+                stat = os.stat(palette_file)
+            except OSError:
+                return None
+            cache_key.append((palette_file, stat.st_mtime_ns, stat.st_size))
+
+        return cache_key
+
+    def _get_disk_cache(self):
+        return diskcache.Cache(os.path.join(appdirs.user_config_dir('inkstitch'), 'cache', 'thread_catalog'))
+
+    def _load_cached_palettes(self, cache_key):
+        if cache_key is None:
+            return None
+
+        try:
+            with self._get_disk_cache() as disk_cache:
+                cached_key, palettes = disk_cache.get('palettes', (None, None))
+        except Exception:
+            # The cache is just an optimization.  If it's unreadable (e.g.
+            # written by a different version), we'll parse the palettes.
+            return None
+
+        if cached_key != cache_key:
+            return None
+
+        return palettes
+
+    def _save_cached_palettes(self, cache_key, palettes):
+        if cache_key is None:
+            return
+
+        try:
+            with self._get_disk_cache() as disk_cache:
+                disk_cache.set('palettes', (cache_key, palettes))
+        except Exception:
+            pass
 
     def palette_names(self):
         return list(sorted(palette.name for palette in self))
@@ -57,10 +128,13 @@ class _ThreadCatalog(Sequence):
     def __len__(self):
         return len(self.palettes)
 
-    def _num_exact_color_matches(self, palette, threads):
-        """Number of colors in stitch plan with an exact match in this palette."""
+    def _num_exact_color_matches(self, palette, colors):
+        """Number of colors in stitch plan with an exact match in this palette.
+
+        colors is a Counter of the RGB tuples of the colors in the stitch plan.
+        """
 
-        return sum(1 for thread in threads if thread in palette)
+        return sum(count for rgb, count in colors.items() if rgb in palette.rgbs)
 
     def match_and_apply_palette(self, stitch_plan, palette=None):
         if palette is None:
@@ -84,8 +158,8 @@ class _ThreadCatalog(Sequence):
         if not self.palettes:
             return None
 
-        threads = [color_block.color for color_block in stitch_plan]
-        palettes_and_matches = [(palette, self._num_exact_color_matches(palette, threads))
+        colors = Counter(color_block.color.rgb for color_block in stitch_plan)
+        palettes_and_matches = [(palette, self._num_exact_color_matches(palette, colors))
                                 for palette in self]
         palette, matches = max(palettes_and_matches, key=lambda item: item[1])
 
@@ -5,16 +5,40 @@
 
 from collections.abc import Set
 
+import numpy as np
 from colormath.color_conversions import convert_color
-from colormath.color_diff import delta_e_cie1994
 from colormath.color_objects import LabColor, sRGBColor
 
 from .color import ThreadColor
 
 
-def compare_thread_colors(color1, color2):
-    # K_L=2 indicates textiles
-    return delta_e_cie1994(color1, color2, K_L=2)
+def rgb_to_lab(color):
+    return convert_color(sRGBColor(*color, is_upscaled=True), LabColor).get_value_tuple()
+
+
+def delta_e_cie1994_textiles(lab, chroma, color):
+    """Compute the CIE94 color difference for many colors at once.
+
+    lab is an array of Lab colors with their chroma precomputed in chroma.
+    The result is the same as colormath's delta_e_cie1994(..., K_L=2)
+    (K_L=2 indicates textiles) for each of them and the Lab color tuple in
+    color.
+    """
+
+    color = np.array(color, dtype=float)
+    color_chroma = np.sqrt(np.sum(np.power(color[1:], 2)))
+
+    delta_lab = lab - color
+    delta_L = delta_lab[:, 0]
+    delta_C = chroma - color_chroma
+    delta_H_sq = -np.power(delta_C, 2) + np.power(delta_lab[:, 1], 2) + np.power(delta_lab[:, 2], 2)
+    delta_H = np.sqrt(delta_H_sq.clip(min=0))
+
+    # K_L=2 indicates textiles, K_C=K_H=1, K_1=0.045 and K_2=0.015
+    S_C = 1 + 0.045 * chroma
+    S_H = 1 + 0.015 * chroma
+
+    return np.sqrt(np.power(delta_L / 2, 2) + np.power(delta_C / S_C, 2) + np.power(delta_H / S_H, 2))
 
 
 class ThreadPalette(Set):
@@ -24,6 +48,12 @@ class ThreadPalette(Set):
         self.threads = dict()
         self.parse_palette_file(palette_file)
 
+        # Lab colors of the threads (in the same order) for nearest_color()
+        self._thread_list = list(self.threads)
+        self.lab = np.array(list(self.threads.values()), dtype=float).reshape(-1, 3)
+        self.chroma = np.sqrt(np.sum(np.power(self.lab[:, 1:], 2), axis=1))
+        self.rgbs = frozenset(thread.rgb for thread in self.threads)
+
     def parse_palette_file(self, palette_file):
         """Read a GIMP palette file and load thread colors.
 
@@ -64,7 +94,7 @@ class ThreadPalette(Set):
                     thread_name = thread_name.strip()
 
                     thread = ThreadColor(thread_color, thread_name, thread_number, manufacturer=self.name)
-                    self.threads[thread] = convert_color(sRGBColor(*thread_color, is_upscaled=True), LabColor)
+                    self.threads[thread] = rgb_to_lab(thread_color)
                 except (ValueError, IndexError):
                     continue
 
@@ -83,6 +113,5 @@ class ThreadPalette(Set):
         if isinstance(color, ThreadColor):
             color = color.rgb
 
-        color = convert_color(sRGBColor(*color, is_upscaled=True), LabColor)
-
-        return min(self, key=lambda thread: compare_thread_colors(self.threads[thread], color))
+        distances = delta_e_cie1994_textiles(self.lab, self.chroma, rgb_to_lab(color))
+        return self._thread_list[int(np.argmin(distances))]
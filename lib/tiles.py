@@ -5,8 +5,9 @@ import inkex
 import json
 import lxml
 import networkx as nx
-from shapely.geometry import LineString, MultiLineString
-from shapely.prepared import prep
+import numpy as np
+import shapely
+from shapely.geometry import MultiLineString
 
 from .debug import debug
 from .i18n import _
@@ -14,6 +15,9 @@ from .svg import apply_transforms
 from .utils import Point, cache, get_bundled_dir, guess_inkscape_config_path
 from .utils.threading import check_stop_flag
 
+# how many tile lines _generate_graph() tests against the shape at once
+LINES_PER_CHUNK = 10000
+
 
 class Tile:
     def __init__(self, path):
@@ -53,6 +57,10 @@ class Tile:
         return os.path.splitext(os.path.basename(tile_path))[0]
 
     def _load(self):
+        if self.tile is not None:
+            # the parsed tile only depends on the tile's SVG, so keep it around
+            return
+
         self._load_paths(self.tile_svg)
         self._load_dimensions(self.tile_svg)
         self._load_parallelogram(self.tile_svg)
@@ -101,16 +109,6 @@ class Tile:
 
         return center, width, height
 
-    def _translate_tile(self, tile, shift):
-        translated_tile = []
-
-        for start, end in tile:
-            start += shift
-            end += shift
-            translated_tile.append((start.as_int().as_tuple(), end.as_int().as_tuple()))
-
-        return translated_tile
-
     def _scale_and_rotate(self, x_scale, y_scale, angle):
         transformed_shift0 = self.shift0.scale(x_scale, y_scale).rotate(angle)
         transformed_shift1 = self.shift1.scale(x_scale, y_scale).rotate(angle)
@@ -137,9 +135,13 @@ class Tile:
         shift0, shift1, tile = self._scale_and_rotate(x_scale, y_scale, angle)
 
         shape_center, shape_width, shape_height = self._get_center_and_dimensions(shape)
-        prepared_shape = prep(shape)
 
-        return self._generate_graph(prepared_shape, shape_center, shape_width, shape_height, shift0, shift1, tile)
+        # shapely.prepare() modifies the geometry in place, so prepare a copy
+        # and leave the caller's shape alone.
+        shape = shapely.from_wkb(shapely.to_wkb(shape))
+        shapely.prepare(shape)
+
+        return self._generate_graph(shape, shape_center, shape_width, shape_height, shift0, shift1, tile)
 
     @debug.time
     def _generate_graph(self, shape, shape_center, shape_width, shape_height, shift0, shift1, tile):
@@ -153,27 +155,46 @@ class Tile:
         x_cutoff = shape_width / 2 + tile_diagonal
         y_cutoff = shape_height / 2 + tile_diagonal
 
-        for repeat0 in range(-num_tiles, num_tiles):
-            for repeat1 in range(-num_tiles, num_tiles):
-                check_stop_flag()
+        offsets = self._tile_offsets(num_tiles, shift0, shift1, x_cutoff, y_cutoff)
+        offsets += shape_center.as_tuple()
 
-                offset0 = repeat0 * shift0
-                offset1 = repeat1 * shift1
-                offset = offset0 + offset1
+        tile = np.array([(start.as_tuple(), end.as_tuple()) for start, end in tile], dtype=float)
 
-                if abs(offset.x) > x_cutoff or abs(offset.y) > y_cutoff:
-                    continue
+        # Work through the repeats in chunks, so that memory use stays bounded
+        # for huge shapes and the user can cancel in between.
+        chunk_size = max(1, LINES_PER_CHUNK // max(1, len(tile)))
+        for chunk_start in range(0, len(offsets), chunk_size):
+            check_stop_flag()
 
-                this_tile = self._translate_tile(tile, offset + shape_center)
-                for line in this_tile:
-                    line_string = LineString(line)
-                    if shape.contains(line_string):
-                        graph.add_edge(line[0], line[1])
+            # every line of every repeat of the tile in this chunk, as an array
+            # of shape (num_lines, 2, 2), in the same order as a loop over the
+            # offsets would produce them
+            chunk = offsets[chunk_start:chunk_start + chunk_size]
+            lines = tile[np.newaxis, :, :, :] + chunk[:, np.newaxis, np.newaxis, :]
+            lines = np.round(lines.reshape(-1, 2, 2)).astype(int)
+
+            inside = shapely.contains(shape, shapely.linestrings(lines))
+            graph.add_edges_from((tuple(start), tuple(end)) for start, end in lines[inside].tolist())
 
         self._remove_dead_ends(graph)
 
         return graph
 
+    def _tile_offsets(self, num_tiles, shift0, shift1, x_cutoff, y_cutoff):
+        """Return the offsets of all tile repeats that could touch the shape.
+
+        Return value:
+            numpy array of shape (N, 2), ordered by the first and then the
+              second shift's repeat count
+        """
+        repeats = np.arange(-num_tiles, num_tiles)
+        repeat0, repeat1 = np.meshgrid(repeats, repeats, indexing='ij')
+        offsets = (repeat0.reshape(-1, 1) * np.array(shift0.as_tuple()) +
+                   repeat1.reshape(-1, 1) * np.array(shift1.as_tuple()))
+
+        within_cutoff = (np.abs(offsets[:, 0]) <= x_cutoff) & (np.abs(offsets[:, 1]) <= y_cutoff)
+        return offsets[within_cutoff]
+
     @debug.time
     def _remove_dead_ends(self, graph):
         graph.remove_edges_from(nx.selfloop_edges(graph))
@@ -6,6 +6,9 @@ import os
 import atexit
 import hashlib
 import pickle
+import threading
+import zlib
+from collections import OrderedDict
 
 import appdirs
 import diskcache
@@ -23,6 +26,10 @@ def cache(*args, **kwargs):
     return lru_cache(maxsize=None)(*args, **kwargs)
 
 
+# The in-memory tier holds at most this many megabytes (or cache_size, if
+# that is smaller).
+MEMORY_CACHE_SIZE = 32
+
 __stitch_plan_cache = None
 
 
@@ -32,13 +39,201 @@ def get_stitch_plan_cache():
     if __stitch_plan_cache is None:
         cache_dir = os.path.join(appdirs.user_config_dir('inkstitch'), 'cache', 'stitch_plan')
         size_limit = global_settings['cache_size'] * 1024 * 1024
-        __stitch_plan_cache = diskcache.Cache(cache_dir, size=size_limit)
-        __stitch_plan_cache.size_limit = size_limit
+        disk_cache = diskcache.Cache(cache_dir, size=size_limit)
+        disk_cache.size_limit = size_limit
+        __stitch_plan_cache = StitchPlanCache(disk_cache, min(size_limit, MEMORY_CACHE_SIZE * 1024 * 1024))
         atexit.register(__stitch_plan_cache.close)
 
     return __stitch_plan_cache
 
 
+def reset_stitch_plan_cache():
+    """Forget the stitch plan cache without closing it.
+
+    A forked process must not share its parent's SQLite connection.  After
+    calling this, get_stitch_plan_cache() opens a new one.
+    """
+    global __stitch_plan_cache
+
+    __stitch_plan_cache = None
+
+
+class StitchPlanCache(object):
+    """A two-level cache for generated stitch groups.
+
+    Lookups go to an in-process LRU first and only hit diskcache (SQLite) on
+    a miss there.  That makes a big difference for long-running processes like
+    the params preview, which re-render the same elements over and over.
+
+    Values are stored as compressed binary payloads under a content key, the
+    hash of the payload.  The keys callers use are aliases that point to a
+    content key.  This way the same stitch groups stored under several keys
+    (e.g. with and without a previous stitch) are only stored once.
+
+    Counters in stats can help to decide on a good cache_size.
+    """
+
+    PAYLOAD_PREFIX = "payload:"
+
+    def __init__(self, disk_cache, memory_size_limit):
+        self.disk_cache = disk_cache
+        self.memory_size_limit = memory_size_limit
+
+        # content key -> payload, least recently used first
+        self._payloads = OrderedDict()
+        self._payloads_size = 0
+        # alias -> content key
+        self._aliases = {}
+        # content key -> set of aliases pointing to it
+        self._aliases_by_content_key = {}
+        self._lock = threading.Lock()
+
+        self.stats = dict(memory_hits=0, disk_hits=0, misses=0, evictions=0)
+
+    def get(self, key, default=None):
+        payload = self._get_payload(key)
+        if payload is None:
+            return default
+
+        return self.decode(payload)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._aliases:
+                return True
+
+        return self._get_content_key(key) is not None
+
+    def __getitem__(self, key):
+        payload = self._get_payload(key)
+        if payload is None:
+            raise KeyError(key)
+
+        return self.decode(payload)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, aliases=()):
+        """Store value under key and any number of additional aliases.
+
+        Keys that already have a value are left alone.
+        """
+
+        new_aliases = [alias for alias in (key, *aliases) if alias not in self]
+        if not new_aliases:
+            return
+
+        payload = self.encode(value)
+        content_key = hashlib.sha1(payload).hexdigest()
+
+        if self.PAYLOAD_PREFIX + content_key not in self.disk_cache:
+            self.disk_cache[self.PAYLOAD_PREFIX + content_key] = payload
+        for alias in new_aliases:
+            self.disk_cache[alias] = content_key
+
+        with self._lock:
+            self._remember(content_key, payload, new_aliases)
+
+    @staticmethod
+    def encode(value):
+        return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+    @staticmethod
+    def decode(payload):
+        return pickle.loads(zlib.decompress(payload))
+
+    def _get_payload(self, key):
+        with self._lock:
+            content_key = self._aliases.get(key)
+            if content_key is not None:
+                self._payloads.move_to_end(content_key)
+                self.stats['memory_hits'] += 1
+                return self._payloads[content_key]
+
+        content_key = self._get_content_key(key)
+        if content_key is None:
+            payload = None
+        else:
+            payload = self.disk_cache.get(self.PAYLOAD_PREFIX + content_key)
+
+        with self._lock:
+            if payload is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['disk_hits'] += 1
+                self._remember(content_key, payload, (key,))
+
+        return payload
+
+    def _get_content_key(self, key):
+        content_key = self.disk_cache.get(key)
+
+        # Entries written by older versions of Ink/Stitch aren't aliases, and
+        # diskcache may have culled the payload an alias points to.
+        if isinstance(content_key, str) and self.PAYLOAD_PREFIX + content_key in self.disk_cache:
+            return content_key
+        else:
+            return None
+
+    def _remember(self, content_key, payload, aliases):
+        if len(payload) > self.memory_size_limit:
+            return
+
+        if content_key in self._payloads:
+            self._payloads.move_to_end(content_key)
+        else:
+            self._payloads[content_key] = payload
+            self._payloads_size += len(payload)
+            self._aliases_by_content_key[content_key] = set()
+
+        for alias in aliases:
+            previous_content_key = self._aliases.get(alias)
+            if previous_content_key is not None and previous_content_key != content_key:
+                self._aliases_by_content_key[previous_content_key].discard(alias)
+            self._aliases[alias] = content_key
+            self._aliases_by_content_key[content_key].add(alias)
+
+        self._evict()
+
+    def _evict(self):
+        # Drop least recently used payloads until we're within the limit.
+        while self._payloads and self._payloads_size > self.memory_size_limit:
+            evicted_key, evicted_payload = self._payloads.popitem(last=False)
+            self._payloads_size -= len(evicted_payload)
+            for alias in self._aliases_by_content_key.pop(evicted_key):
+                del self._aliases[alias]
+            self.stats['evictions'] += 1
+
+    def _clear_memory(self):
+        with self._lock:
+            self._payloads.clear()
+            self._payloads_size = 0
+            self._aliases.clear()
+            self._aliases_by_content_key.clear()
+
+    @property
+    def size_limit(self):
+        return self.disk_cache.size_limit
+
+    @size_limit.setter
+    def size_limit(self, size_limit):
+        self.disk_cache.size_limit = size_limit
+        self.memory_size_limit = min(size_limit, MEMORY_CACHE_SIZE * 1024 * 1024)
+
+    def cull(self):
+        with self._lock:
+            self._evict()
+        return self.disk_cache.cull()
+
+    def clear(self, *args, **kwargs):
+        self._clear_memory()
+        return self.disk_cache.clear(*args, **kwargs)
+
+    def close(self):
+        self.disk_cache.close()
+
+
 def is_cache_disabled():
     return not global_settings['cache_size']
 
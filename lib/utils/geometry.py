@@ -9,7 +9,6 @@ import typing
 import numpy
 from shapely.geometry import (GeometryCollection, LinearRing, LineString,
                               MultiLineString, MultiPoint, MultiPolygon)
-from shapely.geometry import Point as ShapelyPoint
 
 
 def cut(line, distance, normalized=False):
@@ -25,21 +24,8 @@ def cut(line, distance, normalized=False):
     elif distance >= line.length:
         return [line, None]
 
-    coords = list(ShapelyPoint(p) for p in line.coords)
-    traveled = 0
-    last_point = coords[0]
-    for i, p in enumerate(coords[1:], 1):
-        traveled += p.distance(last_point)
-        last_point = p
-        if traveled == distance:
-            return [
-                LineString(coords[:i + 1]),
-                LineString(coords[i:])]
-        if traveled > distance:
-            cp = line.interpolate(distance)
-            return [
-                LineString(coords[:i] + [(cp.x, cp.y)]),
-                LineString([(cp.x, cp.y)] + coords[i:])]
+    before, after = split_line_coords(line, [distance])
+    return [LineString(before), LineString(after)]
 
 
 def cut_multiple(line, distances, normalized=False):
@@ -53,27 +39,54 @@ def cut_multiple(line, distances, normalized=False):
     Returns:
         a list of LineStrings or None values"""
 
-    distances = list(sorted(distances))
+    if normalized:
+        distances = [distance * line.length for distance in distances]
+
+    return [None if coords is None else LineString(coords) for coords in split_line_coords(line, distances)]
+
 
-    segments = [line]
-    distance_so_far = 0
-    nones = []
+def split_line_coords(line, distances):
+    """Split the coordinates of a LineString at multiple distances along it.
 
-    for distance in distances:
-        segment = segments.pop()
-        before, after = cut(segment, distance - distance_so_far, normalized)
+    This works in a single pass over the line, no matter how many distances
+    there are.  Distances are clamped to the length of the line and sorted.
 
-        segments.append(before)
+    Returns:
+        a list of N + 1 coordinate arrays, where N is the number of distances,
+        in order along the line.  Pieces of zero length are None.
+    """
 
-        if after is None:
-            nones.append(after)
+    coords = numpy.asarray(line.coords, dtype=float)
+    segment_lengths = numpy.sqrt(numpy.sum(numpy.diff(coords, axis=0) ** 2, axis=1))
+    cumulative_lengths = numpy.concatenate(([0.0], numpy.cumsum(segment_lengths)))
+    length = cumulative_lengths[-1]
+
+    distances = numpy.clip(numpy.sort(numpy.asarray(distances, dtype=float)), 0.0, length)
+    bounds = numpy.concatenate(([0.0], distances, [length]))
+
+    # the points at the bounds: existing vertices where possible, otherwise
+    # interpolated like shapely's interpolate() does it
+    vertex_indices = numpy.searchsorted(cumulative_lengths, bounds, side='left')
+    on_vertex = cumulative_lengths[vertex_indices] == bounds
+    segment_indices = numpy.maximum(vertex_indices - 1, 0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        fractions = (bounds - cumulative_lengths[segment_indices]) / segment_lengths[numpy.minimum(segment_indices, len(segment_lengths) - 1)]
+    starts = coords[segment_indices]
+    ends = coords[numpy.minimum(segment_indices + 1, len(coords) - 1)]
+    bound_points = numpy.where(on_vertex[:, numpy.newaxis], coords[vertex_indices], (ends - starts) * fractions[:, numpy.newaxis] + starts)
+
+    # vertices strictly inside of each piece
+    first_inner = numpy.searchsorted(cumulative_lengths, bounds[:-1], side='right')
+    last_inner = numpy.searchsorted(cumulative_lengths, bounds[1:], side='left')
+
+    pieces = []
+    for i in range(len(bounds) - 1):
+        if bounds[i + 1] <= bounds[i]:
+            pieces.append(None)
         else:
-            if before is not None:
-                distance_so_far += before.length
-            segments.append(after)
+            pieces.append(numpy.concatenate((bound_points[i:i + 1], coords[first_inner[i]:last_inner[i]], bound_points[i + 1:i + 2])))
 
-    segments.extend(nones)
-    return segments
+    return pieces
 
 
 def roll_linear_ring(ring, distance, normalized=False):
@@ -1,6 +1,6 @@
 from hashlib import blake2s
 from math import ceil
-from itertools import count, chain
+from itertools import chain
 import numpy as np
 
 # Framework for reproducible pseudo-random number generation.
@@ -21,6 +21,22 @@ def join_args(*args):
 
 MAX_UNIFORM_INT = 2 ** 32 - 1
 
+# Maximum number of drawings iter_uniform_float_blocks() generates at once.
+MAX_ITER_BLOCKS = 64
+
+
+def _hash_blocks(seed, start, stop):
+    # Returns the blake2s digests of seed/start ... seed/stop-1 as a (stop - start, 8) array of uint32.
+    # This is the same as calling uniform_ints(seed, x) for each x, but only parses the seed once and
+    # reads the digests as big endian numbers instead of going through a hex string.
+    prefix = blake2s(join_args(seed, "").encode())
+    digests = []
+    for x in range(start, stop):
+        h = prefix.copy()
+        h.update(str(x).encode())
+        digests.append(h.digest())
+    return np.frombuffer(b"".join(digests), dtype=">u4").reshape(-1, 8)
+
 
 def uniform_ints(*args):
     # Single pseudo-random drawing determined by the joined parameters.
@@ -29,11 +45,8 @@ def uniform_ints(*args):
 
     s = join_args(*args)
     # blake2s is python's fastest hash algorithm for small inputs and is designed to be usable as a PRNG.
-    h = blake2s(s.encode()).hexdigest()
-    nums = []
-    for i in range(0, 64, 8):
-        nums.append(int(h[i:i + 8], 16))
-    return np.array(nums)
+    h = blake2s(s.encode()).digest()
+    return np.frombuffer(h, dtype=">u4").astype(np.int64)
 
 
 def uniform_floats(*args):
@@ -43,16 +56,45 @@ def uniform_floats(*args):
     return uniform_ints(*args) / MAX_UNIFORM_INT
 
 
+def uniform_float_blocks(start: int, stop: int, *args):
+    # returns the drawings uniform_floats(*args, x) for x in range(start, stop) as a (stop - start, 8) array
+    return _hash_blocks(join_args(*args), start, stop) / MAX_UNIFORM_INT
+
+
 def n_uniform_floats(n: int, *args):
     # returns a fixed number (which may exceed 8) of floats in the range [0,1]
+    return batch_uniform_floats(n, *args, compatible=True)
+
+
+def iter_uniform_float_blocks(*args):
+    # returns the infinite sequence of drawings uniform_floats(*args, 0), uniform_floats(*args, 1), ...
+    # They're generated in batches that grow up to MAX_ITER_BLOCKS, so that taking just a few is still cheap.
     seed = join_args(*args)
-    nBlocks = ceil(n / 8)
-    blocks = [uniform_floats(seed, x) for x in range(nBlocks)]
-    return np.concatenate(blocks)[0:n]
+    start = 0
+    size = 1
+    while True:
+        yield from uniform_float_blocks(start, start + size, seed)
+        start += size
+        size = min(2 * size, MAX_ITER_BLOCKS)
 
 
 def iter_uniform_floats(*args):
     # returns an infinite sequence of floats in the range [0,1]
+    return chain.from_iterable(block.tolist() for block in iter_uniform_float_blocks(*args))
+
+
+def batch_uniform_floats(n: int, *args, compatible: bool = False):
+    # returns any number of floats determined by the joined parameters in one call
+    #
+    # By default, the parameters are hashed once and the hash is used as the key of NumPy's Philox
+    # generator, a counter-based PRNG that produces the floats (in the range [0,1)) in bulk.
+    #
+    # With compatible=True, the result is exactly what n_uniform_floats() always returned, one
+    # hash per 8 floats.  Use that wherever a change in the numbers would change existing designs.
     seed = join_args(*args)
-    blocks = map(lambda x: list(uniform_floats(seed, x)), count(0))
-    return chain.from_iterable(blocks)
+
+    if compatible:
+        return uniform_float_blocks(0, ceil(n / 8), seed).ravel()[0:n]
+
+    key = int.from_bytes(blake2s(seed.encode()).digest()[:16], "little")
+    return np.random.Generator(np.random.Philox(key=key)).random(n)
@@ -0,0 +1,136 @@
+import random
+
+from inkex.tester import TestCase
+
+from lib.stitch_plan import ColorBlock, Stitch
+from lib.svg import PIXELS_PER_MM
+
+
+def reference_filter_duplicate_stitches(stitches, min_stitch_len=0.1):
+    """The list based implementation ColorBlock used to have."""
+
+    if not stitches:
+        return []
+
+    if min_stitch_len is None:
+        min_stitch_len = 0.1
+    min_stitch_len *= PIXELS_PER_MM
+
+    filtered = [stitches[0]]
+    for stitch in stitches[1:]:
+        if filtered[-1].jump or stitch.stop or stitch.trim or stitch.color_change:
+            pass
+        elif 'lock_stitch' in stitch.tags:
+            pass
+        else:
+            length = (stitch - filtered[-1]).length()
+            min_length = stitch.min_stitch_length or min_stitch_len
+            if length <= min_length:
+                continue
+
+        filtered.append(stitch)
+
+    return filtered
+
+
+def random_stitches(seed, count=500):
+    rng = random.Random(seed)
+    stitches = []
+    x = y = 0.0
+    for i in range(count):
+        # mostly short steps, so that there's plenty to filter
+        x += rng.choice([0.0, 0.05, 0.2, 1.0, 5.0]) * rng.choice([-1, 1])
+        y += rng.choice([0.0, 0.05, 0.2, 1.0]) * rng.choice([-1, 1])
+        stitches.append(Stitch(x, y,
+                               jump=rng.random() < 0.05,
+                               trim=rng.random() < 0.03,
+                               stop=rng.random() < 0.01,
+                               color_change=rng.random() < 0.01,
+                               min_stitch_length=rng.choice([None, None, 0, 0.5, 2.0]),
+                               tags=rng.choice([None, ['lock_stitch'], ['satin_column', 'satin_split_stitch']])))
+    return stitches
+
+
+def stitch_state(stitch):
+    return (stitch.x, stitch.y, stitch.jump, stitch.trim, stitch.stop, stitch.color_change,
+            stitch.min_stitch_length, stitch.tags)
+
+
+class ColorBlockTest(TestCase):
+    def assertSameStitches(self, actual, expected):
+        self.assertEqual([stitch_state(stitch) for stitch in actual],
+                         [stitch_state(stitch) for stitch in expected])
+
+    def test_flags_round_trip(self):
+        stitches = [
+            Stitch(0, 0),
+            Stitch(1, 0, jump=True),
+            Stitch(2, 0, trim=True),
+            Stitch(3, 0, stop=True),
+            Stitch(4, 0, color_change=True),
+            Stitch(5, 0, jump=True, trim=True, stop=True, color_change=True),
+        ]
+        color_block = ColorBlock(stitches=stitches)
+
+        self.assertSameStitches(color_block, stitches)
+        self.assertSameStitches(color_block.stitches, stitches)
+        self.assertSameStitches(reversed(color_block), stitches[::-1])
+        self.assertEqual(color_block.num_jumps, 2)
+        self.assertEqual(color_block.num_trims, 2)
+        self.assertTrue(color_block.stop_after)
+
+    def test_trim_after(self):
+        color_block = ColorBlock(stitches=[Stitch(0, 0), Stitch(1, 0, trim=True), Stitch(1, 0, stop=True)])
+        self.assertTrue(color_block.trim_after)
+
+        color_block.add_stitch(2, 0)
+        self.assertFalse(color_block.trim_after)
+
+    def test_add_command(self):
+        color_block = ColorBlock(stitches=[Stitch(3, 4)])
+        color_block.add_stitch(trim=True)
+
+        self.assertSameStitches(color_block, [Stitch(3, 4), Stitch(3, 4, trim=True)])
+
+        with self.assertRaises(ValueError):
+            ColorBlock().add_stitch(stop=True)
+
+    def test_filter_duplicate_stitches(self):
+        for seed in range(20):
+            for min_stitch_len in (None, 0.1, 0.3, 1.0):
+                stitches = random_stitches(seed)
+                color_block = ColorBlock(stitches=stitches)
+                color_block.filter_duplicate_stitches(min_stitch_len)
+
+                self.assertSameStitches(color_block, reference_filter_duplicate_stitches(stitches, min_stitch_len))
+
+    def test_add_no_stitches(self):
+        color_block = ColorBlock(stitches=[Stitch(0, 0)])
+        color_block.add_stitches([])
+
+        self.assertSameStitches(color_block, [Stitch(0, 0)])
+
+    def test_stitches_are_copies(self):
+        color_block = ColorBlock(stitches=[Stitch(0, 0, tags=['lock_stitch']), Stitch(1, 1)])
+
+        stitch = color_block[0]
+        stitch.x = 10
+        stitch.jump = True
+        stitch.tags.add('satin_column')
+        next(iter(color_block)).tags.add('fill_row_start')
+
+        self.assertSameStitches(color_block, [Stitch(0, 0, tags=['lock_stitch']), Stitch(1, 1)])
+
+    def test_delete_and_slice(self):
+        stitches = [Stitch(i, 0, jump=(i % 2 == 0)) for i in range(10)]
+        color_block = ColorBlock(stitches=stitches)
+
+        self.assertSameStitches(color_block[2:8:2], stitches[2:8:2])
+        self.assertSameStitches([color_block[-1]], [stitches[-1]])
+
+        del color_block[3]
+        del stitches[3]
+        del color_block[::3]
+        del stitches[::3]
+
+        self.assertSameStitches(color_block, stitches)
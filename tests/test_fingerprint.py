@@ -0,0 +1,52 @@
+from inkex import Group, PathElement
+from inkex.tester import TestCase
+from inkex.tester.svg import svg
+from lxml import etree
+
+from lib.svg.fingerprint import get_node_fingerprint
+from lib.svg.tags import INKSCAPE_LABEL, SVG_STYLE_TAG
+
+
+class NodeFingerprintTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = svg()
+        self.layer = self.root.add(Group(attrib={"transform": "translate(10, 20)"}))
+        self.group = self.layer.add(Group())
+        self.path = self.group.add(PathElement(attrib={
+            "d": "M 0,0 L 10,0 L 10,10 Z",
+            "style": "fill:#ff0000",
+        }))
+
+    def assertFingerprintChanges(self, edit):
+        before = get_node_fingerprint(self.path)
+        edit()
+        self.assertNotEqual(get_node_fingerprint(self.path), before)
+
+    def test_stable(self):
+        self.assertEqual(get_node_fingerprint(self.path), get_node_fingerprint(self.path))
+
+    def test_attribute_edit(self):
+        self.assertFingerprintChanges(lambda: self.path.set("d", "M 0,0 L 20,0 L 20,20 Z"))
+        self.assertFingerprintChanges(lambda: self.path.set("style", "fill:#00ff00"))
+        self.assertFingerprintChanges(lambda: self.path.set("inkstitch:row_spacing_mm", "0.4"))
+
+    def test_ancestor_transform_edit(self):
+        self.assertFingerprintChanges(lambda: self.group.set("transform", "rotate(30)"))
+        self.assertFingerprintChanges(lambda: self.layer.set("transform", "translate(10, 21)"))
+
+    def test_css_edit(self):
+        style = etree.SubElement(self.root, SVG_STYLE_TAG)
+        self.assertFingerprintChanges(lambda: setattr(style, "text", "path { fill: blue; }"))
+        self.assertFingerprintChanges(lambda: setattr(style, "text", "path { fill: green; }"))
+        self.assertFingerprintChanges(lambda: self.root.remove(style))
+
+    def test_moved_to_other_group(self):
+        other_group = self.layer.add(Group(attrib={"transform": "scale(2)"}))
+        self.assertFingerprintChanges(lambda: other_group.append(self.path))
+
+    def test_editor_state_is_ignored(self):
+        before = get_node_fingerprint(self.path)
+        self.path.set(INKSCAPE_LABEL, "my path")
+        self.path.set("id", "path1234")
+        self.assertEqual(get_node_fingerprint(self.path), before)
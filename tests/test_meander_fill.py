@@ -0,0 +1,94 @@
+import random
+
+import networkx as nx
+from inkex.tester import TestCase
+
+from lib.stitches.meander_fill import find_initial_path, generate_meander_path
+from lib.utils.list import poprandom
+from lib.utils.prng import iter_uniform_floats
+
+
+def reference_generate_meander_path(graph, start, end, rng):
+    """How generate_meander_path() used to work, with networkx."""
+
+    path = find_initial_path(graph, start, end)
+    path_edges = list(zip(path[:-1], path[1:]))
+    graph.remove_edges_from(path_edges)
+    graph_nodes = set(graph) - set(path)
+
+    edges_to_consider = list(path_edges)
+    meander_path = path_edges
+    while edges_to_consider:
+        while edges_to_consider:
+            edge = poprandom(edges_to_consider, rng)
+            edges_to_consider.extend(replace_edge(meander_path, edge, graph, graph_nodes))
+
+        edge_pairs = list(zip(meander_path[:-1], meander_path[1:]))
+        while edge_pairs:
+            edge1, edge2 = poprandom(edge_pairs, rng)
+            new_edges = replace_edge_pair(meander_path, edge1, edge2, graph, graph_nodes)
+            if new_edges:
+                edges_to_consider.extend(new_edges)
+                break
+
+    return [start for start, end in meander_path] + [meander_path[-1][1]]
+
+
+def replace_edge(path, edge, graph, graph_nodes):
+    subgraph = graph.subgraph(graph_nodes | set(edge))
+    new_path = None
+    for new_path in nx.all_simple_edge_paths(subgraph, edge[0], edge[1], 7):
+        if len(new_path) > 1:
+            break
+    if new_path is None or len(new_path) == 1:
+        return []
+    i = path.index(edge)
+    path[i:i + 1] = new_path
+    graph.remove_edges_from(new_path)
+    graph_nodes.difference_update(start for start, end in new_path)
+
+    return new_path
+
+
+def replace_edge_pair(path, edge1, edge2, graph, graph_nodes):
+    subgraph = graph.subgraph(graph_nodes | {edge1[0], edge2[1]})
+    new_path = None
+    for new_path in nx.all_simple_edge_paths(subgraph, edge1[0], edge2[1], 10):
+        if len(new_path) > 2:
+            break
+    if new_path is None or len(new_path) <= 2:
+        return []
+    i = path.index(edge1)
+    path[i:i + 2] = new_path
+    graph.remove_edges_from(new_path)
+    graph_nodes.difference_update(start for start, end in new_path)
+
+    return new_path
+
+
+def random_graph(seed, width, height):
+    """A grid with some diagonals, like the graph of a meander tile."""
+
+    rng = random.Random(seed)
+    graph = nx.Graph()
+    for x in range(width):
+        for y in range(height):
+            for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                if 0 <= x + dx < width and 0 <= y + dy < height and rng.random() < 0.6:
+                    graph.add_edge((x, y), (x + dx, y + dy))
+
+    # keep the biggest connected part, like ensure_connected() would
+    return graph.subgraph(max(nx.connected_components(graph), key=len)).copy()
+
+
+class MeanderPathTest(TestCase):
+    def test_same_path_as_reference(self):
+        for seed in range(10):
+            graph = random_graph(seed, 40, 30)
+            start, end = random.Random(seed).sample(sorted(graph), 2)
+
+            points = generate_meander_path(graph.copy(), start, end, iter_uniform_floats(seed, "meander-fill"))
+            expected = reference_generate_meander_path(graph.copy(), start, end, iter_uniform_floats(seed, "meander-fill"))
+
+            self.assertEqual(points, expected)
+            self.assertEqual(len(points), len(set(points)))
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+from unittest import skipUnless
+
+from inkex.tester import TestCase
+
+from lib.elements.parallel import (ParallelEmbroiderer, WorkerDied,
+                                   embroider_serially)
+
+
+class FakeElement:
+    """Stands in for an EmbroideryElement.
+
+    Its "stitch groups" are tuples recording the element and the last stitch
+    group it was started from, so the order of embroidering shows up in the
+    results.
+    """
+
+    def __init__(self, index, num_groups, uses_previous_stitch, fail=False):
+        self.index = index
+        self.num_groups = num_groups
+        self._uses_previous_stitch = uses_previous_stitch
+        self.fail = fail
+        self.crash_in_worker = False
+        self.main_pid = os.getpid()
+
+    def uses_previous_stitch(self):
+        return self._uses_previous_stitch
+
+    def embroider(self, last_stitch_group):
+        if self.fail:
+            raise ValueError(f"element {self.index} failed")
+
+        if self.crash_in_worker and os.getpid() != self.main_pid:
+            # like a worker killed for running out of memory
+            os._exit(1)
+
+        if self._uses_previous_stitch:
+            previous = last_stitch_group
+        else:
+            previous = None
+
+        return [(self.index, group, previous) for group in range(self.num_groups)]
+
+
+def make_elements(failing=()):
+    elements = []
+    for index in range(40):
+        num_groups = index % 3
+        uses_previous_stitch = index % 4 != 1
+        elements.append(FakeElement(index, num_groups, uses_previous_stitch, index in failing))
+
+    return elements
+
+
+@skipUnless('fork' in multiprocessing.get_all_start_methods(), "needs fork()")
+class ParallelEmbroidererTest(TestCase):
+    def test_same_result_as_serial(self):
+        elements = make_elements()
+
+        serial = embroider_serially(elements)
+        parallel = ParallelEmbroiderer(elements, processes=4).embroider()
+
+        self.assertEqual(parallel, serial)
+
+    def test_first_error_in_document_order(self):
+        elements = make_elements(failing={7, 30})
+        # independent, so it may well fail before element 7 does
+        elements[30]._uses_previous_stitch = False
+
+        with self.assertRaisesRegex(ValueError, "element 7 failed"):
+            ParallelEmbroiderer(elements, processes=4).embroider()
+
+    def test_worker_died(self):
+        elements = make_elements()
+        elements[12].crash_in_worker = True
+
+        with self.assertRaises(WorkerDied):
+            ParallelEmbroiderer(elements, processes=4).embroider()
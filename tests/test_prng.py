@@ -0,0 +1,68 @@
+from hashlib import blake2s
+from itertools import islice
+from math import ceil
+
+import numpy as np
+from inkex.tester import TestCase
+
+from lib.utils import prng
+
+KEYS = [
+    ("",),
+    ("satin-column", 0),
+    ("random_seed", "satin-split", 17),
+    (12345, "meander-fill", 3, 2.5),
+]
+
+# around multiples of 8 (one hash) and of MAX_ITER_BLOCKS
+COUNTS = [0, 1, 7, 8, 9, 15, 16, 17, 100, 8 * prng.MAX_ITER_BLOCKS - 1, 8 * prng.MAX_ITER_BLOCKS + 1]
+
+
+def reference_uniform_floats(*args):
+    # how uniform_floats() used to read the hash
+    h = blake2s(prng.join_args(*args).encode()).hexdigest()
+    return np.array([int(h[i:i + 8], 16) for i in range(0, 64, 8)]) / prng.MAX_UNIFORM_INT
+
+
+def reference_n_uniform_floats(n, *args):
+    seed = prng.join_args(*args)
+    blocks = [reference_uniform_floats(seed, x) for x in range(ceil(n / 8))]
+    return np.concatenate(blocks)[0:n] if blocks else np.array([])
+
+
+class PrngTest(TestCase):
+    def assertBitIdentical(self, actual, expected):
+        actual = np.asarray(actual, dtype=np.float64)
+        expected = np.asarray(expected, dtype=np.float64)
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertEqual(actual.tobytes(), expected.tobytes())
+
+    def test_uniform_floats(self):
+        for key in KEYS:
+            for x in (0, 1, 63, 64, 1000):
+                self.assertBitIdentical(prng.uniform_floats(*key, x), reference_uniform_floats(*key, x))
+
+    def test_batch_compatible(self):
+        for key in KEYS:
+            for n in COUNTS:
+                with self.subTest(key=key, n=n):
+                    expected = reference_n_uniform_floats(n, *key)
+                    self.assertBitIdentical(prng.batch_uniform_floats(n, *key, compatible=True), expected)
+                    self.assertBitIdentical(prng.n_uniform_floats(n, *key), expected)
+
+    def test_blocks(self):
+        for key in KEYS:
+            for start, stop in ((0, 1), (0, 9), (5, 70), (63, 65)):
+                expected = [reference_uniform_floats(*key, x) for x in range(start, stop)]
+                self.assertBitIdentical(prng.uniform_float_blocks(start, stop, *key), expected)
+
+    def test_iter_uniform_floats(self):
+        n = 8 * (1 + 2 + 4 + prng.MAX_ITER_BLOCKS) + 3
+        for key in KEYS:
+            self.assertBitIdentical(list(islice(prng.iter_uniform_floats(*key), n)), reference_n_uniform_floats(n, *key))
+
+    def test_batch_is_reproducible(self):
+        for key in KEYS:
+            floats = prng.batch_uniform_floats(1000, *key)
+            self.assertBitIdentical(prng.batch_uniform_floats(1000, *key), floats)
+            self.assertTrue(np.all((floats >= 0) & (floats < 1)))
@@ -0,0 +1,166 @@
+import math
+import typing
+from math import pi
+
+import numpy as np
+from inkex.tester import TestCase
+
+from lib.stitches.running_stitch import (AngleInterval,
+                                         cut_segment_with_circle,
+                                         running_stitch)
+from lib.svg import PIXELS_PER_MM
+from lib.utils.geometry import Point
+
+# The stitches may differ by rounding errors, because NumPy's trigonometric
+# functions aren't exactly the same as Python's.
+MAX_DEVIATION = 1e-6
+
+# The pure Python running stitch that the NumPy implementation replaced.  It
+# is also used by bin/benchmark-running-stitch.
+
+
+def path_to_curves(points: typing.List[Point], min_len: float):
+    # split a path at obvious corner points so that they get stitched exactly
+    # min_len controls the minimum length after splitting for which it won't split again,
+    # which is used to avoid creating large numbers of corner points when encouintering micro-messes.
+    if len(points) < 3:
+        return [points]
+    curves = []
+
+    last = 0
+    last_seg = points[1] - points[0]
+    seg_len = last_seg.length()
+    for i in range(1, len(points) - 1):
+        # vectors of the last and next segments
+        a = last_seg
+        b = points[i + 1] - points[i]
+        aabb = (a * a) * (b * b)
+        abab = (a * b) * abs(a * b)
+
+        # Test if the turn angle from vectors a to b is more than 45 degrees.
+        # Optimized version of checking if cos(angle(a,b)) <= sqrt(0.5) and is defined
+        if aabb > 0 and abab <= 0.5 * aabb:
+            if seg_len >= min_len:
+                curves.append(points[last: i + 1])
+                last = i
+            seg_len = 0
+
+        if b * b > 0:
+            last_seg = b
+        seg_len += b.length()
+
+    curves.append(points[last:])
+    return curves
+
+
+def take_stitch(start: Point, points: typing.Sequence[Point], idx: int, stitch_length: float, tolerance: float):
+    # Based on a single step of the Zhao-Saalfeld curve simplification algorithm.
+    # https://cartogis.org/docs/proceedings/archive/auto-carto-13/pdf/linear-time-sleeve-fitting-polyline-simplification-algorithms.pdf
+    # Adds early termination condition based on stitch length.
+    if idx >= len(points):
+        return None, None
+
+    sleeve = AngleInterval.all()
+    last = start
+    for i in range(idx, len(points)):
+        p = points[i]
+        if sleeve.containsPoint(p - start):
+            if start.distance(p) < stitch_length:
+                sleeve = sleeve.intersect(AngleInterval.fromBall(p - start, tolerance))
+                last = p
+                continue
+            else:
+                cut = cut_segment_with_circle(start, stitch_length, last, p)
+                return cut, i
+        else:
+            cut = sleeve.cutSegment(start, last, p)
+            if start.distance(cut) > stitch_length:
+                cut = cut_segment_with_circle(start, stitch_length, last, p)
+            return cut, i
+    return points[-1], None
+
+
+def stitch_curve_evenly(points: typing.Sequence[Point], stitch_length: float, tolerance: float):
+    # Will split a straight line into even-length stitches while still handling curves correctly.
+    # Includes end point but not start point.
+    if len(points) < 2:
+        return []
+    distLeft = [0] * len(points)
+    for i in reversed(range(0, len(points) - 1)):
+        distLeft[i] = distLeft[i + 1] + points[i].distance(points[i+1])
+
+    i = 1
+    last = points[0]
+    stitches = []
+    while i is not None and i < len(points):
+        d = last.distance(points[i]) + distLeft[i]
+        if d == 0:
+            return stitches
+        stitch_len = d / math.ceil(d / stitch_length) + 0.000001  # correction for rounding error
+
+        stitch, newidx = take_stitch(last, points, i, stitch_len, tolerance)
+        i = newidx
+        if stitch is not None:
+            stitches.append(stitch)
+            last = stitch
+    return stitches
+
+
+def reference_running_stitch(points, stitch_length, tolerance):
+    if not points:
+        return
+    stitches = [points[0]]
+    for curve in path_to_curves(points, 2 * tolerance):
+        stitches.extend(stitch_curve_evenly(curve, stitch_length, tolerance))
+    return stitches
+
+
+def make_paths(scale=1):
+    """Representative paths, with scale times as many points for benchmarks."""
+
+    rng = np.random.default_rng(42)
+    paths = {}
+
+    # a flattened circle, like Inkscape produces for an ellipse
+    angles = np.linspace(0, 2 * pi, 500 * scale)
+    paths["circle"] = np.column_stack((100 * np.cos(angles), 100 * np.sin(angles)))
+
+    # long straight lines with sharp corners
+    paths["zigzag"] = np.array([(i * 50.0, (i % 2) * 200.0) for i in range(20 * scale)])
+
+    # a densely sampled wavy line
+    x = np.linspace(0, 500 * scale, 2000 * scale)
+    paths["wave"] = np.column_stack((x, 30 * np.sin(x / 40) + 5 * np.sin(x / 7)))
+
+    # a random walk with lots of tiny corners
+    paths["random walk"] = np.cumsum(rng.normal(size=(500 * scale, 2)), axis=0)
+
+    # a spiral, with points getting further apart towards the outside
+    turns = np.linspace(0, 10 * pi * scale, 1500 * scale)
+    paths["spiral"] = np.column_stack((3 * turns * np.cos(turns), 3 * turns * np.sin(turns)))
+
+    # duplicate points
+    paths["duplicates"] = np.array([(0, 0), (0, 0), (10, 0), (10, 0), (10, 0), (20, 5), (20, 5)], dtype=float)
+
+    return {name: [Point(x, y) for x, y in coords.tolist()] for name, coords in paths.items()}
+
+
+class RunningStitchTest(TestCase):
+    def test_same_as_reference(self):
+        settings = [(2.5 * PIXELS_PER_MM, 0.2 * PIXELS_PER_MM),
+                    (1 * PIXELS_PER_MM, 0.05 * PIXELS_PER_MM),
+                    (5 * PIXELS_PER_MM, 0.5 * PIXELS_PER_MM)]
+
+        for name, points in make_paths().items():
+            for stitch_length, tolerance in settings:
+                with self.subTest(path=name, stitch_length=stitch_length, tolerance=tolerance):
+                    expected = reference_running_stitch(points, stitch_length, tolerance)
+                    actual = running_stitch(points, stitch_length, tolerance)
+
+                    self.assertEqual(len(actual), len(expected))
+                    for stitch, expected_stitch in zip(actual, expected):
+                        self.assertLessEqual(stitch.distance(expected_stitch), MAX_DEVIATION)
+
+    def test_short_paths(self):
+        self.assertIsNone(running_stitch([], 10, 1))
+        self.assertEqual(running_stitch([Point(1, 2)], 10, 1), [Point(1, 2)])
@@ -0,0 +1,127 @@
+from inkex import PathElement
+from inkex.tester import TestCase
+from inkex.tester.svg import svg
+from shapely import geometry as shgeo
+
+from lib.elements import SatinColumn
+from lib.elements.satin_column import SatinProcessor
+from lib.svg import PIXELS_PER_MM
+from lib.svg.tags import INKSTITCH_ATTRIBS
+from lib.utils import Point
+
+# The points may differ by rounding errors, because NumPy's square root isn't
+# always exactly the same as Python's x ** 0.5.
+MAX_DEVIATION = 1e-6
+
+# spacing factor (applied to the zigzag spacing), offset_px, offset_proportional, use_random
+SETTINGS = [(1, (0, 0), (0, 0), False),
+            (1, (0.5, 0.5), (0.1, 0.1), False),
+            (2, (-1, -1), (-0.2, -0.2), False),
+            (1, (0, 0), (-0.5, -0.5), False),
+            (1, (1, 0), (0.2, 0), True)]
+
+SATINS = {
+    'straight': "M 0,0 L 100,0 M 0,10 L 100,10",
+    'v shape': "M 0,0 L 50,80 L 100,0 M 20,0 L 50,50 L 80,0",
+    'curves': "M 0,0 C 30,-40 70,40 100,0 M 0,15 C 30,-25 70,55 100,15",
+    'rungs': "M 0,0 L 60,0 L 60,60 M 0,10 L 50,10 L 50,60 M 55,-5 L 55,15 M 45,55 L 65,55",
+}
+
+
+def stitch_distance(pos0, pos1, previous_pos0, previous_pos1):
+    previous_stitch = previous_pos1 - previous_pos0
+    if previous_stitch.length() < 0.01:
+        return shgeo.LineString((pos0, pos1)).distance(shgeo.Point(previous_pos0))
+    else:
+        normal = previous_stitch.unit().rotate_left()
+        d0 = pos0 - previous_pos0
+        d1 = pos1 - previous_pos1
+        return max(abs(d0 * normal), abs(d1 * normal))
+
+
+def reference_plot_points_on_rails(satin, spacing, offset_px=(0, 0), offset_proportional=(0, 0), use_random=False):
+    """How SatinColumn.plot_points_on_rails() used to work, with shapely."""
+
+    processor = SatinProcessor(satin, offset_px, offset_proportional, use_random)
+
+    def process_points(pos0, pos1):
+        return satin.offset_points(pos0, pos1, offset_px, processor.get_offset_proportional())
+
+    pairs = []
+
+    for i, (section0, section1) in enumerate(satin.flattened_sections):
+        if i == 0:
+            old_pos0 = section0[0]
+            old_pos1 = section1[0]
+            pairs.append(process_points(old_pos0, old_pos1))
+
+        path0 = shgeo.LineString(section0)
+        path1 = shgeo.LineString(section1)
+
+        num_points = max(path0.length, path1.length, 0.01) / spacing
+        section_stitch_spacing = 1.0 / num_points
+
+        spacing_multiple = processor.get_stitch_spacing_multiple()
+        current_spacing = spacing * spacing_multiple
+
+        distance = stitch_distance(section0[0], section1[0], old_pos0, old_pos1)
+        to_travel = (1 - min(distance / spacing, 1.0)) * section_stitch_spacing * spacing_multiple
+
+        cursor = 0
+        iterations = 0
+        while cursor + to_travel <= 1:
+            iterations += 1
+            pos0 = Point.from_shapely_point(path0.interpolate(cursor + to_travel, normalized=True))
+            pos1 = Point.from_shapely_point(path1.interpolate(cursor + to_travel, normalized=True))
+
+            if iterations <= 2:
+                distance = stitch_distance(pos0, pos1, old_pos0, old_pos1)
+                if distance > 0.01 and abs((current_spacing - distance) / current_spacing) > 0.05:
+                    to_travel = (current_spacing / distance) * to_travel
+                    if iterations == 1:
+                        to_travel = min(to_travel, 1 - cursor)
+                    continue
+
+            cursor += to_travel
+            spacing_multiple = processor.get_stitch_spacing_multiple()
+            to_travel = section_stitch_spacing * spacing_multiple
+            current_spacing = spacing * spacing_multiple
+
+            old_pos0 = pos0
+            old_pos1 = pos1
+            pairs.append(process_points(pos0, pos1))
+            iterations = 0
+
+    if pairs and section0 and section1:
+        if stitch_distance(section0[-1], section1[-1], old_pos0, old_pos1) > 0.1 * PIXELS_PER_MM:
+            pairs.append(process_points(section0[-1], section1[-1]))
+
+    return pairs
+
+
+class SatinRailsTest(TestCase):
+    def make_satin(self, path):
+        root = svg()
+        node = root.add(PathElement(attrib={
+            "id": "satin",
+            "d": path,
+            "style": "stroke:#000000;stroke-width:1px;fill:none",
+            INKSTITCH_ATTRIBS['satin_column']: "true",
+            INKSTITCH_ATTRIBS['random_zigzag_spacing_percent']: "30",
+            INKSTITCH_ATTRIBS['random_width_increase_percent']: "20",
+        }))
+        return SatinColumn(node)
+
+    def test_same_points_as_reference(self):
+        for name, path in SATINS.items():
+            satin = self.make_satin(path)
+            for spacing_factor, offset_px, offset_proportional, use_random in SETTINGS:
+                with self.subTest(satin=name, offset_px=offset_px, offset_proportional=offset_proportional, use_random=use_random):
+                    spacing = satin.zigzag_spacing * spacing_factor
+                    expected = reference_plot_points_on_rails(satin, spacing, offset_px, offset_proportional, use_random)
+                    actual = satin.plot_points_on_rails(spacing, offset_px, offset_proportional, use_random)
+
+                    self.assertGreater(len(actual), 2)
+                    self.assertEqual(len(actual), len(expected))
+                    for (a1, b1), (a2, b2) in zip(actual, expected):
+                        self.assertLess(max(a1.distance(a2), b1.distance(b2)), MAX_DEVIATION)
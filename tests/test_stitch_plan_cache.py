@@ -0,0 +1,89 @@
+import os
+import tempfile
+
+import diskcache
+from inkex.tester import TestCase
+
+from lib.utils.cache import StitchPlanCache
+
+
+class StitchPlanCacheTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.disk_cache = diskcache.Cache(self.cache_dir.name)
+
+        # random bytes don't compress, so every payload is a bit over 1000
+        # bytes and two of them fit in memory
+        self.values = [os.urandom(1000) for i in range(3)]
+        self.cache = StitchPlanCache(self.disk_cache, 2500)
+
+    def tearDown(self):
+        self.cache.close()
+        self.cache_dir.cleanup()
+        super().tearDown()
+
+    def test_round_trip(self):
+        value = [{'stitches': [(1.0, 2.0), (3.0, 4.0)]}, "tags", None]
+        self.assertEqual(StitchPlanCache.decode(StitchPlanCache.encode(value)), value)
+
+        self.cache['key'] = value
+        self.assertEqual(self.cache['key'], value)
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+        with self.assertRaises(KeyError):
+            self.cache['missing']
+
+    def test_aliases_share_payload(self):
+        self.cache.set('key', self.values[0], aliases=('alias1', 'alias2'))
+
+        payload_keys = [key for key in self.disk_cache if key.startswith(StitchPlanCache.PAYLOAD_PREFIX)]
+        self.assertEqual(len(payload_keys), 1)
+        for key in ('key', 'alias1', 'alias2'):
+            self.assertIn(key, self.cache)
+            self.assertEqual(self.cache[key], self.values[0])
+
+        # the same value under another key is stored only once, too
+        self.cache['other key'] = self.values[0]
+        payload_keys = [key for key in self.disk_cache if key.startswith(StitchPlanCache.PAYLOAD_PREFIX)]
+        self.assertEqual(len(payload_keys), 1)
+
+    def test_existing_keys_are_kept(self):
+        self.cache['key'] = self.values[0]
+        self.cache['key'] = self.values[1]
+
+        self.assertEqual(self.cache['key'], self.values[0])
+
+    def test_eviction_order(self):
+        self.cache['a'] = self.values[0]
+        self.cache['b'] = self.values[1]
+
+        # use a, so that b is the least recently used
+        self.cache['a']
+        self.cache['c'] = self.values[2]
+
+        self.assertEqual(self.cache.stats['evictions'], 1)
+        self.assertIn('a', self.cache._aliases)
+        self.assertNotIn('b', self.cache._aliases)
+        self.assertIn('c', self.cache._aliases)
+
+        # evicted entries are still on disk
+        self.assertEqual(self.cache['b'], self.values[1])
+
+    def test_stats(self):
+        self.cache['a'] = self.values[0]
+
+        self.cache.get('missing')
+        self.cache.get('a')
+        self.assertEqual(self.cache.stats, dict(memory_hits=1, disk_hits=0, misses=1, evictions=0))
+
+        self.cache._clear_memory()
+        self.cache.get('a')
+        self.cache.get('a')
+        self.assertEqual(self.cache.stats, dict(memory_hits=2, disk_hits=1, misses=1, evictions=0))
+
+    def test_oversized_payloads_stay_on_disk(self):
+        self.cache['big'] = os.urandom(3000)
+
+        self.assertNotIn('big', self.cache._aliases)
+        self.assertEqual(len(self.cache['big']), 3000)
+        self.assertEqual(self.cache.stats['disk_hits'], 1)